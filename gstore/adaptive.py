@@ -0,0 +1,194 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Adaptive limit on the number of repositories synced at once."""
+
+import logging
+import statistics
+import threading
+import time
+from collections.abc import Iterable, Iterator
+
+from .models import Repository
+
+JOBS_AUTO = 'auto'
+
+# Upper bound of the limit in the adaptive mode.
+MAX_JOBS = 64
+
+# Share of failed repositories in a window that halves the limit.
+ERROR_THRESHOLD = 0.1
+
+# Factor applied to the limit on congestion.
+DECREASE_FACTOR = 0.5
+
+# How much the median duration may grow over the best one seen before
+# a drop in throughput is taken as congestion.
+LATENCY_TOLERANCE = 1.5
+
+
+def parse_jobs(value: str) -> int | str:
+    """Parse a number of jobs, or :data:`JOBS_AUTO`.
+
+    :raises ValueError: If the value is neither
+    """
+    if value == JOBS_AUTO:
+        return JOBS_AUTO
+
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = -1
+
+    if jobs < 0:
+        raise ValueError(
+            f'Invalid number of jobs "{value}", '
+            f'expected a number or "{JOBS_AUTO}"'
+        )
+
+    return jobs
+
+
+def _key(repo: Repository) -> tuple[str, str]:
+    # Results of worker processes are copies, so repositories are matched
+    # by name rather than identity.
+    return repo.org.login, repo.name
+
+
+class AdaptiveLimit:
+    """Number of repositories in flight, tuned by additive increase and
+    multiplicative decrease (AIMD).
+
+    Once as many repositories as the current limit have finished, the
+    window is evaluated:
+
+    * too many failures halve the limit;
+    * throughput dropping while repositories take longer to sync means the
+      network, the disk or the server is saturated, and halves the limit;
+    * otherwise the limit grows by one.
+
+    Throughput is measured in kilobytes synced per second, using the growth
+    of the object database measured by the bandwidth and disk budget, or
+    the size reported by GitHub when no budget is active.
+
+    :param int initial: Limit to start with
+    :param int maximum: Highest limit
+    :param int minimum: Lowest limit
+    :param clock: Function returning the current time in seconds
+    """
+
+    def __init__(self, initial: int, maximum=MAX_JOBS, minimum=1,
+                 clock=time.monotonic):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.logger = logging.getLogger(__name__)
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._closed = False
+        self._started = {}
+        self._window = []
+        self._window_start = clock()
+        self._rate = None
+        self._best_latency = None
+
+    @property
+    def in_flight(self) -> int:
+        """Number of repositories being synced."""
+        return len(self._started)
+
+    def acquire(self, repo: Repository) -> bool:
+        """Wait until the repository may be synced.
+
+        :return: False if the limit was closed while waiting
+        :rtype: bool
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self.in_flight < self.limit)
+            if self._closed:
+                return False
+            self._started[_key(repo)] = self._clock()
+            return True
+
+    def release(self, repo: Repository, ok: bool, growth: int | None = None):
+        """Record that a repository finished syncing.
+
+        :param int growth: Bytes the sync added to the repository, if
+            measured
+        """
+        with self._condition:
+            started = self._started.pop(_key(repo), None)
+            if started is None:
+                return
+
+            now = self._clock()
+            size = repo.size if growth is None else growth / 1024
+            # Plus one, so that repositories of unknown size still count.
+            self._window.append((now - started, size + 1, ok))
+            if len(self._window) >= self.limit:
+                self._adjust(now)
+
+            self._condition.notify_all()
+
+    def close(self):
+        """Stop handing out repositories and wake up waiting threads."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def gate(self, repos: Iterable[Repository]) -> Iterator[Repository]:
+        """Yield repositories as the limit allows."""
+        for repo in repos:
+            if not self.acquire(repo):
+                return
+            yield repo
+
+    def _adjust(self, now: float):
+        elapsed = max(now - self._window_start, 1e-6)
+        rate = sum(size for _, size, _ in self._window) / elapsed
+        latency = statistics.median(item[0] for item in self._window)
+        failures = sum(1 for _, _, ok in self._window if not ok)
+        error_rate = failures / len(self._window)
+
+        congested = (
+            self._rate is not None
+            and rate < self._rate
+            and latency > self._best_latency * LATENCY_TOLERANCE
+        )
+
+        previous = self.limit
+        if error_rate > ERROR_THRESHOLD or congested:
+            self.limit = max(
+                self.minimum, int(self.limit * DECREASE_FACTOR))
+        else:
+            self.limit = min(self.maximum, self.limit + 1)
+
+        if self.limit != previous:
+            self.logger.debug(
+                'Concurrency limit %s -> %s '
+                '(%.0f KB/s, %.1fs median, %.0f%% failed)',
+                previous,
+                self.limit,
+                rate,
+                latency,
+                error_rate * 100,
+            )
+
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        self._rate = rate
+        self._window = []
+        self._window_start = now
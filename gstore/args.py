@@ -18,9 +18,24 @@
 import os
 import sys
 import textwrap as _textwrap
-from argparse import SUPPRESS, ArgumentParser, HelpFormatter, Namespace
+from argparse import (
+    SUPPRESS,
+    ArgumentParser,
+    ArgumentTypeError,
+    HelpFormatter,
+    Namespace,
+)
 
 from gstore import __copyright__, __version__, env
+from gstore.adaptive import parse_jobs
+from gstore.backend import BACKEND_GIT, BACKENDS
+from gstore.cache import DEFAULT_TTL
+from gstore.client import DEFAULT_CONCURRENCY
+from gstore.engine import DEFAULT_DISK_JOBS
+from gstore.repo import EXECUTOR_PROCESS, EXECUTORS, MODE_PULL, MODES
+from gstore.strategy import parse_rule, validate_depth, validate_filter
+from gstore.throttle import parse_rate
+from gstore.transport import TRANSPORT_SSH, TRANSPORTS
 
 
 class LineBreaksFormatter(HelpFormatter):
@@ -58,6 +73,19 @@ class LineBreaksFormatter(HelpFormatter):
         return multiline_text
 
 
+def _argument_type(func):
+    """Turn a validator raising ValueError into an argparse type."""
+
+    def wrapper(value):
+        try:
+            return func(value)
+        except ValueError as error:
+            raise ArgumentTypeError(str(error)) from error
+
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
 def get_version_str() -> str:
     """A helper function to format version info."""
     # pylint: disable=consider-using-f-string
@@ -119,6 +147,41 @@ def parser_add_options(parser: ArgumentParser) -> ArgumentParser:
         help="The GitHub API hostname",
     )
 
+    cache_help = (
+        "Directory to cache GitHub API responses in "
+        + "(caching is disabled if not provided)"
+    )
+    ogroup.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        default=env.get_cache_dir(),
+        type=str,
+        help=cache_help,
+    )
+
+    cache_ttl_help = (
+        "Number of seconds to use cached API responses "
+        + "without revalidation"
+    )
+    ogroup.add_argument(
+        "--cache-ttl",
+        dest="cache_ttl",
+        default=DEFAULT_TTL,
+        type=int,
+        help=cache_ttl_help,
+    )
+
+    graphql_help = (
+        "Use GitHub GraphQL API to resolve repositories "
+        + "with fewer requests"
+    )
+    ogroup.add_argument(
+        "--graphql",
+        dest="graphql",
+        action="store_true",
+        help=graphql_help,
+    )
+
     ogroup.add_argument(
         "-o",
         "--org",
@@ -146,19 +209,275 @@ def parser_add_options(parser: ArgumentParser) -> ArgumentParser:
 
     jobs_help = (
         "specifies the number of jobs (sync processes) "
-        + "to run simultaneously"
+        + 'to run simultaneously, or "auto" to adapt it to the observed '
+        + "throughput, latency and failures"
     )
     ogroup.add_argument(
         "-j",
         "--jobs",
         dest="jobs",
         default=None,
-        type=int,
+        type=_argument_type(parse_jobs),
         action="store",
         nargs="?",
         help=jobs_help,
     )
 
+    executor_help = (
+        'How to run jobs: "process" runs every job in a separate process, '
+        + '"thread" runs them as threads of a single process, which suits '
+        + 'a large number of jobs, "async" runs git commands as asyncio '
+        + "subprocesses, with --jobs limiting network-bound and --disk-jobs "
+        + "disk-bound commands"
+    )
+    ogroup.add_argument(
+        "--executor",
+        dest="executor",
+        default=EXECUTOR_PROCESS,
+        choices=EXECUTORS,
+        help=executor_help,
+    )
+
+    disk_jobs_help = (
+        "specifies the number of disk-bound git commands (checkout, merge) "
+        + 'to run simultaneously with the "async" executor'
+    )
+    ogroup.add_argument(
+        "--disk-jobs",
+        dest="disk_jobs",
+        default=DEFAULT_DISK_JOBS,
+        type=int,
+        action="store",
+        help=disk_jobs_help,
+    )
+
+    bandwidth_limit_help = (
+        "Limit the bytes per second downloaded by all jobs together, "
+        + "e.g. 512k or 10M"
+    )
+    ogroup.add_argument(
+        "--bandwidth-limit",
+        dest="bandwidth_limit",
+        metavar="RATE",
+        default=None,
+        type=_argument_type(parse_rate),
+        help=bandwidth_limit_help,
+    )
+
+    disk_limit_help = (
+        "Limit the bytes per second written by all jobs together, "
+        + "e.g. 512k or 10M"
+    )
+    ogroup.add_argument(
+        "--disk-limit",
+        dest="disk_limit",
+        metavar="RATE",
+        default=None,
+        type=_argument_type(parse_rate),
+        help=disk_limit_help,
+    )
+
+    api_jobs_help = (
+        "specifies the number of GitHub API requests "
+        + "to run simultaneously during discovery"
+    )
+    ogroup.add_argument(
+        "--api-jobs",
+        dest="api_jobs",
+        default=DEFAULT_CONCURRENCY,
+        type=int,
+        action="store",
+        help=api_jobs_help,
+    )
+
+    report_help = (
+        "Save a report with timings and bytes received per repository: "
+        + "a JSON document for a .json file, JSON lines otherwise"
+    )
+    ogroup.add_argument(
+        "--report",
+        dest="report",
+        metavar="PATH",
+        default=None,
+        help=report_help,
+    )
+
+    metrics_textfile_help = (
+        "Write metrics of the run to a file at the end, in the Prometheus "
+        + "text format for the node exporter textfile collector"
+    )
+    ogroup.add_argument(
+        "--metrics-textfile",
+        dest="metrics_textfile",
+        metavar="PATH",
+        default=None,
+        help=metrics_textfile_help,
+    )
+
+    metrics_port_help = (
+        "Serve metrics on http://127.0.0.1:PORT/metrics while the run is "
+        + "active"
+    )
+    ogroup.add_argument(
+        "--metrics-port",
+        dest="metrics_port",
+        metavar="PORT",
+        default=None,
+        type=int,
+        help=metrics_port_help,
+    )
+
+    profile_help = (
+        "Profile the run: a Chrome trace with wall and CPU time per phase "
+        + "and repository for a .json file, merged cProfile stats otherwise"
+    )
+    ogroup.add_argument(
+        "--profile",
+        dest="profile",
+        metavar="PATH",
+        default=None,
+        help=profile_help,
+    )
+
+    incremental_help = (
+        "Skip repositories which were not pushed since the last "
+        + "successful sync"
+    )
+    ogroup.add_argument(
+        "-i",
+        "--incremental",
+        dest="incremental",
+        action="store_true",
+        help=incremental_help,
+    )
+
+    skip_unchanged_help = (
+        "Compare refs advertised by remotes with local ones and skip "
+        + "repositories which did not change"
+    )
+    ogroup.add_argument(
+        "--skip-unchanged",
+        dest="skip_unchanged",
+        action="store_true",
+        help=skip_unchanged_help,
+    )
+
+    mode_help = (
+        'How to update existing repositories: "pull" fetches and merges '
+        + 'remote changes into the working tree, "fetch-only" only '
+        + "fetches all refs"
+    )
+    ogroup.add_argument(
+        "--mode",
+        dest="mode",
+        default=MODE_PULL,
+        choices=MODES,
+        help=mode_help,
+    )
+
+    mirror_help = (
+        "Clone repositories as bare mirrors without a working tree and "
+        + "update them with \"git remote update --prune\""
+    )
+    ogroup.add_argument(
+        "--mirror",
+        "--bare",
+        dest="mirror",
+        action="store_true",
+        help=mirror_help,
+    )
+
+    filter_help = (
+        "Make partial clones using the given filter, e.g. blob:none or "
+        + "blob:limit=1m"
+    )
+    ogroup.add_argument(
+        "--filter",
+        dest="filter",
+        type=_argument_type(validate_filter),
+        metavar="SPEC",
+        help=filter_help,
+    )
+
+    depth_help = "Make shallow clones truncated to the given number of commits"
+    ogroup.add_argument(
+        "--depth",
+        dest="depth",
+        type=_argument_type(validate_depth),
+        metavar="N",
+        help=depth_help,
+    )
+
+    single_branch_help = "Clone only the default branch of repositories"
+    ogroup.add_argument(
+        "--single-branch",
+        dest="single_branch",
+        action="store_true",
+        help=single_branch_help,
+    )
+
+    clone_rule_help = (
+        "Clone strategy for repositories matching a pattern, e.g. "
+        + '"myorg/assets-*=filter=blob:none,depth=1". Can be used multiple '
+        + "times, the first matching rule wins"
+    )
+    ogroup.add_argument(
+        "--clone-rule",
+        dest="clone_rules",
+        action="append",
+        default=[],
+        type=_argument_type(parse_rule),
+        metavar="PATTERN=OPTIONS",
+        help=clone_rule_help,
+    )
+
+    object_pool_help = (
+        "Share objects of forks and related repositories through pools "
+        + "stored in the .objects directory of the target"
+    )
+    ogroup.add_argument(
+        "--object-pool",
+        dest="object_pool",
+        action="store_true",
+        help=object_pool_help,
+    )
+
+    transport_help = (
+        'How git connects to repositories: "ssh" uses SSH keys, "https" '
+        + "authenticates with the token"
+    )
+    ogroup.add_argument(
+        "--transport",
+        dest="transport",
+        default=TRANSPORT_SSH,
+        choices=TRANSPORTS,
+        help=transport_help,
+    )
+
+    ssh_multiplex_help = (
+        "Reuse a few shared SSH connections for all git operations instead "
+        + "of connecting for each of them"
+    )
+    ogroup.add_argument(
+        "--ssh-multiplex",
+        dest="ssh_multiplex",
+        action="store_true",
+        help=ssh_multiplex_help,
+    )
+
+    backend_help = (
+        'Git implementation to update repositories with: "git" runs git '
+        + 'commands, "libgit2" checks refs and fetches in-process (requires '
+        + "pygit2)"
+    )
+    ogroup.add_argument(
+        "--backend",
+        dest="backend",
+        default=BACKEND_GIT,
+        choices=BACKENDS,
+        help=backend_help,
+    )
+
     quiet_help = "Silence any informational messages, but not error ones"
     ogroup.add_argument(
         "-q", "--quiet", dest="quiet", action="store_true", help=quiet_help
@@ -0,0 +1,279 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Backends used to update local repositories."""
+
+import os
+
+import git
+
+from .exceptions import Error
+from .transport import TOKEN_VARIABLE, git_environ
+
+try:
+    import pygit2
+except ImportError:  # pragma: no cover
+    pygit2 = None
+
+BACKEND_GIT = 'git'
+BACKEND_LIBGIT2 = 'libgit2'
+BACKENDS = (BACKEND_GIT, BACKEND_LIBGIT2)
+
+
+class BackendUnavailableError(Error):
+    """Raised when a backend cannot be used in this environment."""
+
+
+def _parse_refs(output: str, separator: str) -> dict:
+    """Parse ``<object> <ref>`` lines into a mapping of refs."""
+    refs = {}
+    for line in output.splitlines():
+        sha, _, name = line.partition(separator)
+        if name:
+            refs[name.strip()] = sha.strip()
+    return refs
+
+
+def _git_repo(path: str) -> git.Repo:
+    """Open a repository whose git commands run in the worker environment."""
+    repo = git.Repo(path)
+    repo.git.update_environment(**git_environ())
+    return repo
+
+
+class GitRepository:
+    """A local repository updated by running ``git`` commands.
+
+    Every fetch or pull spawns a ``git`` process.
+
+    :param str path: Path to the local repository
+    :raises git.InvalidGitRepositoryError: If the path is not a repository
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._repo = _git_repo(path)
+
+    @property
+    def repo(self) -> git.Repo:
+        """The underlying GitPython repository, opened once."""
+        if self._repo is None:
+            self._repo = _git_repo(self.path)
+        return self._repo
+
+    def has_heads(self) -> bool:
+        """Check whether the repository has local branches."""
+        return bool(self.repo.heads)
+
+    def set_origin(self, url: str):
+        """Point the default remote to a URL, if it does not already."""
+        try:
+            origin = self.repo.remote('origin')
+        except ValueError:
+            self.repo.create_remote('origin', url)
+            return
+
+        if origin.url != url:
+            origin.set_url(url)
+
+    def local_refs(self) -> dict:
+        """Get local refs mapped to the objects they point to."""
+        output = self.repo.git.for_each_ref(
+            ['--format=%(objectname) %(refname)'])
+        return _parse_refs(output, ' ')
+
+    def remote_refs(self) -> dict:
+        """Get refs advertised by the remote repository."""
+        return _parse_refs(self.repo.git.ls_remote(['origin']), '\t')
+
+    def fetch_refspecs(self) -> list:
+        """Get refspecs the default remote is fetched with."""
+        try:
+            output = self.repo.git.config(['--get-all', 'remote.origin.fetch'])
+        except git.GitCommandError:
+            # The key is not set.
+            return []
+        return output.split()
+
+    def head_matches_upstream(self) -> bool:
+        """Check whether the current branch is level with its upstream."""
+        try:
+            upstream = self.repo.active_branch.tracking_branch()
+            return upstream is not None and \
+                upstream.commit == self.repo.head.commit
+        except (TypeError, ValueError):
+            # Detached HEAD or missing upstream branch
+            return False
+
+    def fetch(self, options: list, all_remotes=False):
+        """Download objects and refs from the remote repository.
+
+        :param list options: Extra ``git fetch`` options
+        :param bool all_remotes: Fetch all remotes instead of the default one
+        """
+        args = ['--all'] if all_remotes else []
+        self.repo.git.fetch([*args, '--prune', '--quiet', *options])
+
+    def pull(self, options: list):
+        """Merge remote changes into the working tree."""
+        self.repo.git.pull(['--all', '--quiet', *options])
+
+    def update_mirror(self, options: list):
+        """Update refs of a bare mirror."""
+        if options:
+            self.repo.git.fetch(['--prune', '--quiet', *options])
+        else:
+            self.repo.git.remote(['update', '--prune'])
+
+
+def _credentials(url, username_from_url, allowed_types):
+    """Get credentials libgit2 asks for.
+
+    libgit2 ignores git credential helpers, so the token exported for the
+    HTTPS transport is handed over directly.
+    """
+    # pylint: disable=unused-argument
+    token = os.environ.get(TOKEN_VARIABLE)
+    userpass = pygit2.enums.CredentialType.USERPASS_PLAINTEXT
+    if token and allowed_types & userpass:
+        return pygit2.UserPass('x-access-token', token)
+
+    return pygit2.KeypairFromAgent(username_from_url or 'git')
+
+
+class LibGit2Repository(GitRepository):
+    """A local repository updated in-process through libgit2.
+
+    Ref checks and plain fetches do not spawn any process. Operations
+    libgit2 does not cover, such as merging or shallow fetches, are left to
+    the ``git`` command.
+
+    :param str path: Path to the local repository
+    :raises git.InvalidGitRepositoryError: If the path is not a repository
+    """
+
+    def __init__(self, path: str):  # pylint: disable=super-init-not-called
+        self.path = path
+        self._repo = None
+
+        try:
+            self._native = pygit2.Repository(path)
+        except pygit2.GitError as error:
+            raise git.InvalidGitRepositoryError(path) from error
+
+    def has_heads(self) -> bool:
+        return any(True for _ in self._native.branches.local)
+
+    def set_origin(self, url: str):
+        remotes = self._native.remotes
+        try:
+            origin = remotes['origin']
+        except KeyError:
+            remotes.create('origin', url)
+            return
+
+        if origin.url != url:
+            remotes.set_url('origin', url)
+
+    def local_refs(self) -> dict:
+        refs = {}
+        for name in self._native.references:
+            target = self._native.references[name].target
+            if isinstance(target, pygit2.Oid):
+                refs[name] = str(target)
+        return refs
+
+    def remote_refs(self) -> dict:
+        remote = self._native.remotes['origin']
+        try:
+            heads = remote.list_heads(callbacks=self._callbacks())
+        except pygit2.GitError as error:
+            raise git.GitCommandError(
+                ['libgit2', 'ls-remote', 'origin'], 1, str(error)
+            ) from error
+        return {head.name: str(head.oid) for head in heads}
+
+    def fetch_refspecs(self) -> list:
+        return list(self._native.remotes['origin'].fetch_refspecs)
+
+    def head_matches_upstream(self) -> bool:
+        if self._native.head_is_detached:
+            return False
+        branch = self._native.branches.local.get(self._native.head.shorthand)
+        upstream = branch.upstream if branch is not None else None
+        return upstream is not None and upstream.target == branch.target
+
+    @staticmethod
+    def _callbacks():
+        return pygit2.RemoteCallbacks(credentials=_credentials)
+
+    def _fetch(self, remotes, command: str):
+        callbacks = self._callbacks()
+
+        for remote in remotes:
+            try:
+                remote.fetch(
+                    callbacks=callbacks, prune=pygit2.enums.FetchPrune.PRUNE)
+            except pygit2.GitError as error:
+                raise git.GitCommandError(
+                    ['libgit2', command, remote.name], 1, str(error)
+                ) from error
+
+    def fetch(self, options: list, all_remotes=False):
+        if options:
+            super().fetch(options, all_remotes)
+            return
+
+        remotes = self._native.remotes
+        self._fetch(
+            list(remotes) if all_remotes else [remotes['origin']], 'fetch')
+
+    def update_mirror(self, options: list):
+        if options:
+            super().update_mirror(options)
+            return
+
+        self._fetch(list(self._native.remotes), 'remote update')
+
+
+class Backend:
+    """Opens local repositories with the chosen implementation.
+
+    :param str name: Backend name, one of :data:`BACKENDS`
+    :raises BackendUnavailableError: If the backend is not available
+    """
+
+    def __init__(self, name=BACKEND_GIT):
+        if name not in BACKENDS:
+            raise BackendUnavailableError(f'Unknown git backend "{name}"')
+
+        if name == BACKEND_LIBGIT2 and pygit2 is None:
+            raise BackendUnavailableError(
+                'The libgit2 backend requires pygit2, '
+                'install it with "pip install gstore[libgit2]"')
+
+        self.name = name
+
+    def open(self, path: str) -> GitRepository:
+        """Open a local repository.
+
+        :param str path: Path to the local repository
+        :raises git.InvalidGitRepositoryError: If the path is not a repository
+        :rtype: GitRepository
+        """
+        if self.name == BACKEND_LIBGIT2:
+            return LibGit2Repository(path)
+
+        return GitRepository(path)
@@ -0,0 +1,110 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Persistent on-disk cache of GitHub API responses."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+DEFAULT_TTL = 0
+
+
+class ResponseCache:
+    """A cache of GitHub API responses keyed by request URL.
+
+    Every entry keeps the response body along with its headers. Entries
+    younger than ``ttl`` seconds are used as is, older ones are revalidated
+    with a conditional request using ``ETag`` and ``Last-Modified`` headers.
+    GitHub does not charge rate limit for ``304 Not Modified`` responses.
+
+    :param str directory: Path to the cache directory
+    :param int ttl: Number of seconds an entry is used without revalidation
+    """
+
+    def __init__(self, directory: str, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = max(0, ttl or 0)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Build a cache key from request parts."""
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def get(self, key: str):
+        """Get a cache entry.
+
+        :param str key: The cache key
+        :return: The entry or None if there is no valid entry
+        :rtype: dict or None
+        """
+        try:
+            with open(self._path(key), encoding='utf-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            self.logger.debug('Ignore broken cache entry %s: %s', key, error)
+            return None
+
+        if not isinstance(entry, dict) or 'body' not in entry:
+            return None
+
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Check whether an entry can be used without revalidation."""
+        return time.time() - entry.get('stored_at', 0) < self.ttl
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """Get conditional request headers for an entry."""
+        headers = {}
+        response_headers = entry.get('headers', {})
+
+        if response_headers.get('etag'):
+            headers['If-None-Match'] = response_headers['etag']
+        if response_headers.get('last-modified'):
+            headers['If-Modified-Since'] = response_headers['last-modified']
+
+        return headers
+
+    def put(self, key: str, headers: dict, body: str):
+        """Store a response in the cache.
+
+        :param str key: The cache key
+        :param dict headers: Response headers
+        :param str body: Response body
+        """
+        entry = {'stored_at': time.time(), 'headers': headers, 'body': body}
+        path = self._path(key)
+
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(entry, file)
+            os.replace(tmp_path, path)
+        except OSError as error:
+            self.logger.debug('Unable to store cache entry %s: %s', key, error)
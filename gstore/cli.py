@@ -15,16 +15,35 @@
 
 """The CLI entry point. Invoke as `gstore' or `python -m gstore'."""
 
+import asyncio
+import contextlib
 import logging
 import os
 import signal
 import sys
 
 from .args import argparse
-from .client import Client
+from .backend import Backend
+from .cache import ResponseCache
+from .client import AsyncClient, Client
 from .exceptions import Error
 from .logger import setup_logger
+from .metrics import Metrics, MetricsServer
+from .profiling import Profiler, span
 from .repo import sync
+from .strategy import CloneStrategy
+from .throttle import Budget
+from .transport import Transport, git_host
+
+
+def _finish(args, metrics, profiler):
+    """Save the profile and the metrics of a finished run."""
+    if profiler is not None:
+        profiler.stop()
+    if metrics is not None:
+        metrics.finish()
+    if args.metrics_textfile:
+        metrics.write_textfile(os.path.expanduser(args.metrics_textfile))
 
 
 def main():
@@ -40,29 +59,74 @@ def main():
         setup_logger(verbose=args.verbose, quiet=args.quiet)
         logger = logging.getLogger(__name__)
 
+        metrics = None
+        if args.metrics_textfile or args.metrics_port is not None:
+            metrics = Metrics()
+
+        profiler = None
+        if args.profile:
+            profiler = Profiler(os.path.expanduser(args.profile))
+            profiler.start()
+
         try:
-            client = Client(token=args.token, api_host=args.host)
+            cache = None
+            if args.cache_dir:
+                cache = ResponseCache(
+                    os.path.expanduser(args.cache_dir), ttl=args.cache_ttl)
 
-            if args.org is None:
-                orgs = client.get_orgs()
+            client = Client(
+                token=args.token,
+                api_host=args.host,
+                graphql=args.graphql,
+                cache=cache,
+                metrics=metrics,
+            )
+            discovery = AsyncClient(client, concurrency=args.api_jobs)
+            if args.repo:
+                # Only a few repositories are requested, so they are
+                # resolved upfront to be synced largest first with no more
+                # workers than needed.
+                repos = asyncio.run(discovery.discover(args.org, args.repo))
             else:
-                orgs = client.resolve_orgs(args.org)
+                repos = discovery.stream(args.org)
 
             base_path = os.path.expanduser(args.target).rstrip('/\\')
 
-            for org in orgs:
-                if args.repo is None:
-                    repos = client.get_repos(org)
-                else:
-                    repos = client.resolve_repos(args.repo, org)
+            budget = None
+            if args.bandwidth_limit or args.disk_limit:
+                budget = Budget(args.bandwidth_limit, args.disk_limit)
+
+            server = contextlib.nullcontext()
+            if args.metrics_port is not None:
+                server = MetricsServer(metrics, args.metrics_port)
 
+            with server, span('sync'):
                 sync(
-                    org=org,
                     repos=repos,
                     base_path=base_path,
                     verbose=args.verbose,
                     quiet=args.quiet,
                     jobs=args.jobs,
+                    executor=args.executor,
+                    disk_jobs=args.disk_jobs,
+                    incremental=args.incremental,
+                    skip_unchanged=args.skip_unchanged,
+                    mode=args.mode,
+                    mirror=args.mirror,
+                    strategy=CloneStrategy(
+                        filter=args.filter,
+                        depth=args.depth,
+                        single_branch=args.single_branch,
+                    ),
+                    rules=args.clone_rules,
+                    object_pool=args.object_pool,
+                    backend=Backend(args.backend),
+                    transport=Transport(
+                        args.transport, git_host(args.host), args.token),
+                    ssh_multiplex=args.ssh_multiplex,
+                    budget=budget,
+                    report=args.report,
+                    metrics=metrics,
                 )
         except KeyboardInterrupt:  # the user hit control-C
             sys.stderr.write('Received keyboard interrupt, terminating.\n')
@@ -73,5 +137,7 @@ def main():
         except Error as gstore_error:
             logger.error(gstore_error)
             retval = 1
+        finally:
+            _finish(args, metrics, profiler)
 
     return retval
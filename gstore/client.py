@@ -18,23 +18,70 @@ A simple wrapper for github.GitHub to provide convenient way to clone and
 sync repositories from the GitHub.
 """
 
+import asyncio
+import functools
+import hashlib
 import logging
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 from github import Auth, Github
 from github.GithubException import (
     BadCredentialsException,
+    GithubException,
     UnknownObjectException,
 )
 
 from gstore import __version__
 
+from .cache import ResponseCache
 from .exceptions import Error
+from .metrics import Metrics
 from .models import Organization, Repository
+from .profiling import span
+from .ratelimit import RateLimiter
 
 USER_AGENT = f'gstore/{__version__}'
 
 DEFAULT_HOST = 'api.github.com'
 DEFAULT_TIMEOUT = 15
+CONNECTION_RETRIES = 3
+DEFAULT_CONCURRENCY = 8
+STREAM_BUFFER = 100
+STREAM_POLL_INTERVAL = 0.1
+
+GRAPHQL_BATCH_SIZE = 50
+GRAPHQL_PAGE_SIZE = 100
+GRAPHQL_REPO_FRAGMENT = '''
+fragment repo on Repository {
+  name
+  diskUsage
+  pushedAt
+  updatedAt
+  isArchived
+  defaultBranchRef { name }
+  parent { nameWithOwner }
+}
+'''
+GRAPHQL_LIST_REPOS = '''
+query($login: String!, $first: Int!, $cursor: String) {
+  organization(login: $login) {
+    repositories(
+      first: $first,
+      after: $cursor,
+      orderBy: {field: NAME, direction: ASC}
+    ) {
+      totalCount
+      pageInfo { hasNextPage endCursor }
+      nodes { ...repo }
+    }
+  }
+}
+''' + GRAPHQL_REPO_FRAGMENT
 
 
 class ValidationError(Error):
@@ -49,6 +96,45 @@ class InvalidCredentialsError(Error):
         super().__init__(message)
 
 
+def _repository(repo, org: Organization) -> Repository:
+    """Create a :class:`gstore.models.Repository` from an API object."""
+    pushed_at = repo.pushed_at or repo.updated_at
+
+    return Repository(
+        repo.name,
+        org,
+        size=repo.size,
+        pushed_at=pushed_at.isoformat() if pushed_at else None,
+        default_branch=repo.default_branch,
+        archived=repo.archived,
+    )
+
+
+def _timestamp(value: str | None) -> str | None:
+    """Normalize a GraphQL timestamp to the form used for REST data."""
+    if not value:
+        return None
+
+    # datetime.fromisoformat() does not accept 'Z' suffix before 3.11
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+
+
+def _graphql_repository(node: dict, org: Organization) -> Repository:
+    """Create a :class:`gstore.models.Repository` from a GraphQL node."""
+    branch = node.get('defaultBranchRef') or {}
+    parent = node.get('parent') or {}
+
+    return Repository(
+        node['name'],
+        org,
+        size=node.get('diskUsage') or 0,
+        pushed_at=_timestamp(node.get('pushedAt') or node.get('updatedAt')),
+        default_branch=branch.get('name'),
+        archived=node.get('isArchived') or False,
+        parent=parent.get('nameWithOwner'),
+    )
+
+
 class Client:
     """A wrapper class around :class:`github.Github` to interact with
     GitHub API.
@@ -56,6 +142,11 @@ class Client:
     :param str token: Authentication token for github.com API requests
     :param str api_host: Default base URL for github.com API requests
     :param int timeout: Timeout for HTTP requests
+    :param bool graphql: Use GraphQL API where it saves requests
+    :param ResponseCache cache: Cache of API responses, if any
+    :param RateLimiter rate_limiter: Rate limit governor to share with
+        other clients, a new one is created if not provided
+    :param Metrics metrics: Metrics to account API requests in, if any
     :raises ValidationError: in case of GitHub token is not provided.
     """
 
@@ -64,8 +155,16 @@ class Client:
             token: str,
             api_host=DEFAULT_HOST,
             timeout=DEFAULT_TIMEOUT,
+            graphql=False,
+            cache: ResponseCache | None = None,
+            rate_limiter: RateLimiter | None = None,
+            metrics: Metrics | None = None,
     ):
         self.logger = logging.getLogger(f'{__name__}')
+        self.graphql = graphql
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics
 
         # The use case with Client(token='...', api_host=None)
         if not api_host:
@@ -79,12 +178,130 @@ class Client:
         api_url = f'https://{api_host}'
         self.logger.debug('Setting API URL to %s', api_url)
 
-        self.github = Github(
-            auth=Auth.Token(token),
-            base_url=api_url,
-            timeout=timeout,
-            user_agent=USER_AGENT
-        )
+        self._options = {
+            'auth': Auth.Token(token),
+            'base_url': api_url,
+            'timeout': timeout,
+            'user_agent': USER_AGENT,
+            # Rate limits are handled by gstore.ratelimit.RateLimiter, so
+            # PyGithub retries only connection errors and does not delay
+            # requests on its own.
+            'retry': CONNECTION_RETRIES,
+            'seconds_between_requests': None,
+        }
+        self._local = threading.local()
+        self._local.github = self._connect()
+
+        # Responses visible to a token are cached separately from the
+        # responses visible to other tokens.
+        self._cache_scope = (
+            api_url, hashlib.sha256(token.encode('utf-8')).hexdigest())
+
+    @property
+    def github(self) -> Github:
+        """The :class:`github.Github` instance of the calling thread.
+
+        PyGithub keeps a request on its connection between sending it and
+        reading the response, so threads must not share it. Every thread
+        gets its own instance, while the rate limit governor, the cache
+        and the metrics are shared.
+        """
+        github = getattr(self._local, 'github', None)
+        if github is None:
+            github = self._local.github = self._connect()
+
+        return github
+
+    def _connect(self) -> Github:
+        """Create a :class:`github.Github` instance for this client."""
+        github = Github(**self._options)
+
+        # Every API request made by PyGithub goes through this hook.
+        requester = github.requester
+        requester.requestJson = functools.partial(
+            self._request, requester.requestJson)
+
+        return github
+
+    def _request(
+            self,
+            send,
+            verb: str,
+            url: str,
+            parameters=None,
+            headers=None,
+            *args,
+            **kwargs,
+    ):
+        """Perform an API request on behalf of PyGithub.
+
+        :param send: The original PyGithub request function
+        :return: A tuple of status, response headers and response body
+        :rtype: tuple
+        """
+        if self.cache is None or verb != 'GET':
+            return self._send(
+                send, verb, url, parameters, headers, *args, **kwargs)
+
+        key = self.cache.key(self._cache_scope, url, parameters)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.logger.debug('Use cached response for %s', url)
+                return 200, entry['headers'], entry['body']
+
+            headers = {**(headers or {}), **self.cache.validators(entry)}
+
+        status, response_headers, body = self._send(
+            send, verb, url, parameters, headers, *args, **kwargs)
+
+        if status == 304 and entry is not None:
+            self.logger.debug('Cached response for %s is not modified', url)
+            # Keep pagination and validators of the cached response.
+            response_headers = {**entry['headers'], **response_headers}
+            self.cache.put(key, response_headers, entry['body'])
+            return 200, response_headers, entry['body']
+
+        if status == 200:
+            self.cache.put(key, response_headers, body)
+
+        return status, response_headers, body
+
+    def _send(self, send, *args, **kwargs):
+        """Send an API request within the rate limit budget.
+
+        Requests rejected due to rate limiting are retried after the pause
+        calculated by the rate limit governor.
+        """
+        attempt = 0
+
+        while True:
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            with span(f'{args[0]} {args[1]}', 'api'):
+                status, headers, body = send(*args, **kwargs)
+            self.rate_limiter.update(headers)
+
+            if self.metrics is not None:
+                self.metrics.observe_request(
+                    args[0],
+                    status,
+                    time.perf_counter() - start,
+                    self.rate_limiter.limit,
+                    self.rate_limiter.remaining,
+                )
+
+            delay = self.rate_limiter.backoff(status, headers, body, attempt)
+            if delay is None:
+                return status, headers, body
+
+            attempt += 1
+            self.logger.warning(
+                'GitHub API rate limit exceeded, retry %s in %.1fs',
+                attempt,
+                delay
+            )
 
     def get_repos(self, org: Organization):
         """Get organization repositories.
@@ -93,8 +310,37 @@ class Client:
         :return: A collection with repositories
         :rtype: list of :class:`gstore.models.Repository`
         """
+        return list(self.iter_repos(org))
+
+    def iter_repos(self, org: Organization):
+        """Iterate over organization repositories.
+
+        Unlike :meth:`get_repos` this method yields repositories as soon as
+        each page of the listing is received. When the client is configured
+        to use GraphQL, only the fields gstore needs are requested. Should
+        the first GraphQL request fail, the REST API is used instead.
+
+        :param Organization org: User's organization
+        :return: An iterator over repositories
+        :rtype: iterator of :class:`gstore.models.Repository`
+        """
         self.logger.info('Getting repositories for organization')
 
+        if self.graphql:
+            try:
+                page = self._list_repos_graphql(org)
+            except BadCredentialsException as bad_credentials:
+                raise InvalidCredentialsError() from bad_credentials
+            except GithubException as exception:
+                self.logger.warning(
+                    'Unable to list repositories via GraphQL, '
+                    'falling back to REST API: %s',
+                    exception
+                )
+            else:
+                yield from self._iter_repos_graphql(org, page)
+                return
+
         github_org = self.github.get_organization(org.login)
         repos = github_org.get_repos(
             type='all',
@@ -107,15 +353,46 @@ class Client:
             repos.totalCount
         )
 
-        retval = []
         for repo in repos:
-            retval.append(Repository(repo.name, org))
+            yield _repository(repo, org)
 
-        return retval
+    def _iter_repos_graphql(self, org: Organization, page: dict):
+        """Iterate over GraphQL listing starting from the given page."""
+        self.logger.info(
+            'Number of available repositories for %s organization: %s',
+            org.login,
+            page['totalCount']
+        )
+
+        while True:
+            for node in page['nodes']:
+                yield _graphql_repository(node, org)
+
+            if not page['pageInfo']['hasNextPage']:
+                return
+
+            page = self._list_repos_graphql(
+                org, page['pageInfo']['endCursor'])
+
+    def _list_repos_graphql(self, org: Organization, cursor=None):
+        """Get a page of organization repositories using GraphQL API."""
+        data = self._graphql(
+            GRAPHQL_LIST_REPOS,
+            {'login': org.login, 'first': GRAPHQL_PAGE_SIZE, 'cursor': cursor},
+        )
+
+        if data.get('organization') is None:
+            raise UnknownObjectException(404, data, {})
+
+        return data['organization']['repositories']
 
     def resolve_repos(self, repos: list, org: Organization):
         """Resolve repositories from provided list.
 
+        When the client is configured to use GraphQL, all repositories of
+        the organization are validated with a few batched queries. Should
+        GraphQL fail, the REST API is used instead.
+
         :param list repos: A list of repositories in form 'org:repo'
         :param Organization org: User's organization
         :return: A collection with repositories
@@ -123,7 +400,7 @@ class Client:
         """
         self.logger.info('Resolve repositories from provided configuration')
 
-        retval = []
+        names = []
 
         for name in repos:
             parts = name.split(':')
@@ -138,14 +415,38 @@ class Client:
             if parts[0].lower() != org.login.lower():
                 continue
 
-            repo_name = parts[-1]
+            names.append(parts[-1])
+
+        if not names:
+            return []
+
+        if self.graphql:
+            try:
+                return self._resolve_repos_graphql(names, org)
+            except BadCredentialsException as bad_credentials:
+                raise InvalidCredentialsError() from bad_credentials
+            except GithubException as exception:
+                self.logger.warning(
+                    'Unable to resolve repositories via GraphQL, '
+                    'falling back to REST API: %s',
+                    exception
+                )
+
+        return self._resolve_repos_rest(names, org)
+
+    def _resolve_repos_rest(self, names: list, org: Organization):
+        """Resolve repositories one by one using REST API."""
+        retval = []
+        github_org = None
 
+        for repo_name in names:
             try:
                 # This will do API request, so we'll validate the repo.
-                github_org = self.github.get_organization(org.login)
+                if github_org is None:
+                    github_org = self.github.get_organization(org.login)
                 repo = github_org.get_repo(repo_name)
 
-                retval.append(Repository(repo.name, org))
+                retval.append(_repository(repo, org))
             except UnknownObjectException:
                 self.logger.error('Invalid repository name "%s"', repo_name)
                 continue
@@ -154,6 +455,68 @@ class Client:
 
         return retval
 
+    def _resolve_repos_graphql(self, names: list, org: Organization):
+        """Resolve repositories in batches using GraphQL API."""
+        retval = []
+
+        for start in range(0, len(names), GRAPHQL_BATCH_SIZE):
+            batch = names[start:start + GRAPHQL_BATCH_SIZE]
+            aliases = [f'r{i}' for i in range(len(batch))]
+
+            variables = dict(zip(aliases, batch, strict=True))
+            variables['owner'] = org.login
+
+            declarations = ''.join(f', ${alias}: String!' for alias in aliases)
+            fields = ' '.join(
+                f'{alias}: repository(owner: $owner, name: ${alias}) '
+                '{ ...repo }'
+                for alias in aliases
+            )
+            query = (
+                f'query($owner: String!{declarations}) {{ {fields} }}'
+                + GRAPHQL_REPO_FRAGMENT
+            )
+
+            data = self._graphql(query, variables, allow=('NOT_FOUND',))
+
+            for alias, repo_name in zip(aliases, batch, strict=True):
+                node = data.get(alias)
+                if node is None:
+                    self.logger.error(
+                        'Invalid repository name "%s"', repo_name)
+                    continue
+
+                retval.append(_graphql_repository(node, org))
+
+        return retval
+
+    def _graphql(self, query: str, variables: dict, allow=()):
+        """Perform a GraphQL query and return its data.
+
+        :param str query: GraphQL query
+        :param dict variables: GraphQL variables
+        :param tuple allow: Types of errors which do not fail the query
+            (e.g. ``NOT_FOUND`` for partially resolved aliases)
+        :raises GithubException: if the query failed
+        :rtype: dict
+        """
+        requester = self.github.requester
+        headers, response = requester.requestJsonAndCheck(
+            'POST',
+            requester.graphql_url,
+            input={'query': query, 'variables': variables},
+        )
+
+        errors = [
+            error for error in response.get('errors', [])
+            if error.get('type') not in allow
+        ]
+
+        if errors or response.get('data') is None:
+            raise GithubException(400, response, headers)
+
+        return response['data']
+
     def get_orgs(self):
         """Get organizations for a user.
 
@@ -195,14 +558,190 @@ class Client:
         retval = []
 
         for name in orgs:
-            try:
-                # This will do API request, so we'll validate the org.
-                org = self.github.get_organization(name)
-                retval.append(Organization(org.login))
-            except UnknownObjectException:
-                self.logger.error('Invalid organization name "%s"', name)
-                continue
-            except BadCredentialsException as bad_credentials:
-                raise InvalidCredentialsError() from bad_credentials
+            org = self.resolve_org(name)
+            if org is not None:
+                retval.append(org)
 
         return retval
+
+    def resolve_org(self, name: str):
+        """Resolve a single organization by its name.
+
+        :param str name: The organization name
+        :raises InvalidCredentialsError: in case of bad credentials.
+        :return: The organization or None if it does not exist
+        :rtype: :class:`gstore.models.Organization` or None
+        """
+        try:
+            # This will do API request, so we'll validate the org.
+            org = self.github.get_organization(name)
+            return Organization(org.login)
+        except UnknownObjectException:
+            self.logger.error('Invalid organization name "%s"', name)
+        except BadCredentialsException as bad_credentials:
+            raise InvalidCredentialsError() from bad_credentials
+
+        return None
+
+
+class AsyncClient:
+    """An asyncio facade over :class:`Client` for parallel discovery.
+
+    PyGithub performs blocking HTTP requests, so every call is run in a
+    worker thread, while a semaphore bounds the number of requests in
+    flight. Organizations are resolved and their repositories are listed
+    concurrently.
+
+    :param Client client: The client to perform API requests with
+    :param int concurrency: The maximum number of concurrent API calls
+    """
+
+    def __init__(self, client: Client, concurrency=DEFAULT_CONCURRENCY):
+        self.client = client
+        self.concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def _call(self, func, *args):
+        """Run a blocking client call in a thread."""
+        # A semaphore is bound to the event loop it is used in, and each
+        # asyncio.run() call creates a new one.
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphores[loop]:
+            return await asyncio.to_thread(func, *args)
+
+    async def get_orgs(self):
+        """Get organizations for a user.
+
+        :rtype: list of :class:`gstore.models.Organization`
+        """
+        return await self._call(self.client.get_orgs)
+
+    async def resolve_orgs(self, orgs: list):
+        """Resolve organizations from provided list concurrently.
+
+        :param list orgs: A list of organizations names
+        :rtype: list of :class:`gstore.models.Organization`
+        """
+        self.client.logger.info(
+            'Resolve organizations from provided configuration')
+
+        resolved = await asyncio.gather(
+            *(self._call(self.client.resolve_org, name) for name in orgs)
+        )
+
+        return [org for org in resolved if org is not None]
+
+    async def get_repos(self, org: Organization):
+        """Get organization repositories.
+
+        :rtype: list of :class:`gstore.models.Repository`
+        """
+        return await self._call(self.client.get_repos, org)
+
+    async def resolve_repos(self, repos: list, org: Organization):
+        """Resolve repositories from provided list.
+
+        :rtype: list of :class:`gstore.models.Repository`
+        """
+        return await self._call(self.client.resolve_repos, repos, org)
+
+    async def discover(self, orgs=None, repos=None):
+        """Discover repositories to sync across organizations.
+
+        :param list orgs: Organizations names (all if not provided)
+        :param list repos: Repositories in form 'org:repo' (all if not
+            provided)
+        :return: Repositories of all organizations
+        :rtype: list of :class:`gstore.models.Repository`
+        """
+        if orgs is None:
+            resolved = await self.get_orgs()
+        else:
+            resolved = await self.resolve_orgs(orgs)
+
+        if repos is None:
+            tasks = (self.get_repos(org) for org in resolved)
+        else:
+            tasks = (self.resolve_repos(repos, org) for org in resolved)
+
+        groups = await asyncio.gather(*tasks)
+
+        return [repo for group in groups for repo in group]
+
+    async def _produce(self, orgs, repos, put_all, stopped):
+        """List repositories of every organization through ``put_all``."""
+        if orgs is None:
+            resolved = await self.get_orgs()
+        else:
+            resolved = await self.resolve_orgs(orgs)
+
+        if stopped.is_set():
+            return
+
+        if repos is None:
+            tasks = (
+                self._call(put_all, self.client.iter_repos, org)
+                for org in resolved
+            )
+        else:
+            tasks = (
+                self._call(put_all, self.client.resolve_repos, repos, org)
+                for org in resolved
+            )
+
+        await asyncio.gather(*tasks)
+
+    def stream(self, orgs=None, repos=None):
+        """Discover repositories yielding them as soon as they are listed.
+
+        Discovery runs in a background thread with its own event loop, so
+        the caller can start working on the first repositories while the
+        listing of the others is still being paginated. At most
+        ``STREAM_BUFFER`` repositories are listed ahead of the caller, and
+        closing the iterator stops the discovery.
+
+        :param list orgs: Organizations names (all if not provided)
+        :param list repos: Repositories in form 'org:repo' (all if not
+            provided)
+        :return: An iterator over repositories of all organizations
+        :rtype: iterator of :class:`gstore.models.Repository`
+        """
+        results = queue.Queue(maxsize=STREAM_BUFFER)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            # Wait for the caller to catch up, but give up as soon as the
+            # stream is closed, so the producer never blocks forever on a
+            # full queue nobody reads from.
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=STREAM_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+
+        def put_all(func, *args):
+            # Repositories are paginated lazily, so leaving the loop early
+            # also stops requesting further pages.
+            for repo in func(*args):
+                if stopped.is_set():
+                    break
+                put(repo)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                asyncio.run, self._produce(orgs, repos, put_all, stopped))
+            future.add_done_callback(lambda _: put(done))
+
+            try:
+                while (repo := results.get()) is not done:
+                    yield repo
+            finally:
+                stopped.set()
+
+            # Re-raise discovery errors, if any, in the caller's thread.
+            future.result()
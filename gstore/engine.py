@@ -0,0 +1,348 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Asyncio engine running git commands as subprocesses."""
+
+import asyncio
+import contextlib
+import os
+import time
+from collections.abc import Callable, Iterable
+
+import git
+
+# This module is built on top of gstore.repo, which runs it in turn, so
+# both refer to each other through module objects.
+from . import repo as sync
+from .adaptive import AdaptiveLimit
+from .exceptions import parse_git_errors
+from .local import CORRUPTION_RE, has_alternates, is_bare
+from .models import Repository
+from .pool import ObjectPool
+from .report import SyncResult, activate, deactivate, object_stats, phase
+from .throttle import estimate
+from .transport import SSHMultiplexer, git_environ
+
+DEFAULT_DISK_JOBS = 4
+
+
+class AsyncEngine:
+    """Syncs repositories from a single process with asyncio.
+
+    Every git command runs as a subprocess of the event loop, so hundreds
+    of them can be in flight without a worker per repository. Commands
+    waiting for the network (clone, fetch) and commands writing the working
+    tree (checkout, merge) are limited separately, so that many downloads
+    do not make the disk thrash.
+
+    :param gstore.repo.Context ctx: Sync context
+    :param int network_jobs: Number of network-bound commands at once
+    :param int disk_jobs: Number of disk-bound commands at once
+    :param SSHMultiplexer multiplexer: Shared SSH connections, if any
+    """
+
+    def __init__(self, ctx, network_jobs: int,
+                 disk_jobs=DEFAULT_DISK_JOBS,
+                 multiplexer: SSHMultiplexer | None = None):
+        self.ctx = ctx
+        self.multiplexer = multiplexer
+        self.network_jobs = max(1, network_jobs)
+        self.disk_jobs = max(1, disk_jobs)
+        self._network = None
+        self._disk = None
+
+    async def _git(self, semaphore: asyncio.Semaphore, *args, cwd=None):
+        """Run a git command.
+
+        :raises git.GitCommandError: If the command fails
+        """
+        command = ['git', *args]
+        name = 'network' if semaphore is self._network else 'disk'
+
+        async with semaphore:
+            with phase(name):
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    cwd=cwd,
+                    env={**os.environ, **git_environ()},
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stdout, stderr = await process.communicate()
+
+        if process.returncode:
+            raise git.GitCommandError(
+                command,
+                process.returncode,
+                stderr.decode(errors='replace'),
+                stdout.decode(errors='replace'),
+            )
+
+    def _path(self, repo: Repository) -> str:
+        return os.path.join(self.ctx.base_path, repo.org.login, repo.name)
+
+    def _failed(self, message: str, repo: Repository, exception) -> bool:
+        self.ctx.logger.error(message, repo.org.login, repo.name)
+        for msg in parse_git_errors(exception):
+            self.ctx.logger.error(msg)
+        return False
+
+    async def clone(self, repo: Repository) -> bool:
+        """Clone a repository to the target directory."""
+        ctx = self.ctx
+        ctx.logger.info(
+            'Clone repository to %s/%s', repo.org.login, repo.name)
+        repo_path = self._path(repo)
+        url = ctx.transport.url(repo)
+
+        strategy = ctx.strategy_for(repo)
+        args = ['clone', '--quiet']
+        # The working tree is written in a separate disk-bound step.
+        args.append('--mirror' if ctx.mirror else '--no-checkout')
+        args.extend(strategy.clone_options())
+
+        # See gstore.repo.clone() on partial clones and object pools.
+        if ctx.object_pool and not strategy.partial:
+            async with self._network:
+                with phase('pool'):
+                    pool_path = await asyncio.to_thread(
+                        ObjectPool(ctx.base_path).update, repo, url)
+            if pool_path:
+                args.extend(['--reference', pool_path])
+
+        try:
+            await self._git(self._network, *args, '--', url, repo_path)
+            if not ctx.mirror:
+                await self._git(
+                    self._disk, 'reset', '--hard', '--quiet', cwd=repo_path)
+        except git.GitCommandError as exception:
+            return self._failed('Failed to clone %s/%s', repo, exception)
+
+        return True
+
+    def _open(self, repo_path: str, url: str) -> bool:
+        """Open a local repository and point its origin to the URL.
+
+        :return: Whether the repository has any branch to update
+        :rtype: bool
+        """
+        local_repo = self.ctx.backend.open(repo_path)
+        if not local_repo.has_heads():
+            return False
+
+        local_repo.set_origin(url)
+        return True
+
+    async def update(self, repo: Repository) -> bool:
+        """Update a repository in the target directory."""
+        ctx = self.ctx
+        ctx.logger.info('Update %s/%s repository', repo.org.login, repo.name)
+        repo_path = self._path(repo)
+        url = ctx.transport.url(repo)
+        options = ctx.strategy_for(repo).fetch_options()
+
+        try:
+            with phase('open'):
+                has_heads = await asyncio.to_thread(
+                    self._open, repo_path, url)
+            if not has_heads:
+                ctx.logger.info(
+                    'No remote branches for %s/%s, skip fetching',
+                    repo.org.login,
+                    repo.name,
+                )
+                return True
+        except git.InvalidGitRepositoryError:
+            return await self.repair(repo)
+        except git.GitCommandError as exception:
+            return self._failed('Failed to update %s/%s', repo, exception)
+
+        if ctx.object_pool and has_alternates(repo_path):
+            async with self._network:
+                with phase('pool'):
+                    await asyncio.to_thread(
+                        ObjectPool(ctx.base_path).update, repo, url)
+
+        try:
+            if is_bare(repo_path) and not options:
+                await self._git(
+                    self._network, 'remote', 'update', '--prune',
+                    cwd=repo_path)
+                return True
+
+            all_remotes = ctx.mode == sync.MODE_FETCH_ONLY and \
+                not is_bare(repo_path)
+            await self._git(
+                self._network,
+                'fetch',
+                *(['--all'] if all_remotes else []),
+                '--prune',
+                '--quiet',
+                *options,
+                cwd=repo_path,
+            )
+
+            if ctx.mode == sync.MODE_FETCH_ONLY or is_bare(repo_path):
+                return True
+
+            await self._git(
+                self._disk, 'merge', '--ff-only', '--quiet', '@{upstream}',
+                cwd=repo_path)
+        except git.GitCommandError as exception:
+            if CORRUPTION_RE.search(str(exception.stderr)):
+                return await self.repair(repo)
+            return self._failed('Failed to update %s/%s', repo, exception)
+
+        return True
+
+    async def repair(self, repo: Repository) -> bool:
+        """Repair a damaged repository, see :func:`gstore.repo.repair`."""
+        async with self._network:
+            return await asyncio.to_thread(sync.repair, repo, self.ctx)
+
+    async def sync_repo(self, repo: Repository) -> SyncResult:
+        """Sync a single repository.
+
+        :return: What happened to the repository
+        :rtype: :class:`gstore.report.SyncResult`
+        """
+        actions = {
+            'clone': self.clone,
+            'fetch': self.update,
+            'repair': self.repair,
+        }
+        repo_path = self._path(repo)
+
+        # Every task runs in its own context, so results of concurrent
+        # repositories do not mix.
+        result = SyncResult(repo, thread=id(asyncio.current_task()))
+        token = activate(result)
+        if self.multiplexer is not None:
+            # Commands of the task share a connection slot.
+            self.multiplexer.assign()
+        before = None
+        if self.ctx.count_objects:
+            before = await asyncio.to_thread(object_stats, repo_path)
+        start = time.perf_counter()
+
+        try:
+            with phase('plan'):
+                result.action = await asyncio.to_thread(
+                    sync.plan, repo, self.ctx)
+
+            if result.action is not None:
+                async with self._throttle(repo_path, result):
+                    result.ok = await actions[result.action](repo)
+        finally:
+            result.duration = time.perf_counter() - start
+            if before is not None:
+                result.received(
+                    before, await asyncio.to_thread(object_stats, repo_path))
+            deactivate(token)
+
+        return result
+
+    @contextlib.asynccontextmanager
+    async def _throttle(self, repo_path: str, result: SyncResult):
+        """Asynchronous counterpart of :meth:`gstore.repo.Context.throttle`."""
+        budget = self.ctx.budget
+        if budget is None:
+            yield
+            return
+
+        with phase('throttle'):
+            delay = budget.delay()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = budget.delay()
+
+        reserved = estimate(result.repo, result.action)
+        budget.reserve(reserved)
+        before = await asyncio.to_thread(budget.usage, repo_path)
+        try:
+            yield
+        finally:
+            result.growth = budget.settle(
+                reserved,
+                before,
+                await asyncio.to_thread(budget.usage, repo_path))
+
+    async def run(self, repos: Iterable[Repository], callback: Callable,
+                  limit: AdaptiveLimit | None = None):
+        """Sync repositories and report every result to a callback.
+
+        Repositories are taken from the iterable as slots free up, and the
+        iterable is consumed in a separate thread, so a stream being
+        discovered does not block the event loop.
+
+        :param repos: Repositories to sync
+        :param callback: Called with the
+            :class:`gstore.report.SyncResult` of every repository
+        :param AdaptiveLimit limit: Limit gating the repositories, closed
+            when the run ends
+        """
+        def stop():
+            # The thread consuming the repositories may be waiting for the
+            # limit, and the loop waits for it on shutdown.
+            if limit is not None:
+                limit.close()
+
+        try:
+            await self._run(repos, callback, stop)
+        finally:
+            stop()
+
+    async def _run(self, repos: Iterable[Repository], callback: Callable,
+                   stop: Callable):
+        self._network = asyncio.Semaphore(self.network_jobs)
+        self._disk = asyncio.Semaphore(self.disk_jobs)
+
+        # Keeps enough repositories in flight to saturate both limits.
+        slots = asyncio.Semaphore(self.network_jobs + self.disk_jobs)
+        iterator = iter(repos)
+        pending = set()
+        errors = []
+
+        async def sync_one(repo):
+            try:
+                callback(await self.sync_repo(repo))
+            except Exception as error:  # noqa: BLE001
+                # Finished tasks are not awaited, so errors are kept to be
+                # raised once the run stops, as the other executors do.
+                errors.append(error)
+                stop()
+            finally:
+                slots.release()
+
+        while not errors:
+            await slots.acquire()
+            repo = await asyncio.to_thread(next, iterator, None)
+            if repo is None:
+                break
+            task = asyncio.create_task(sync_one(repo))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+        if errors:
+            raise errors[0]
+
+    def sync(self, repos: Iterable[Repository], callback: Callable,
+             limit: AdaptiveLimit | None = None):
+        """Run :meth:`run` in a new event loop."""
+        asyncio.run(self.run(repos, callback, limit))
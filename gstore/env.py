@@ -73,3 +73,15 @@ def get_target() -> str | None:
     :rtype: str or None
     """
     return os.environ.get("GSTORE_DIR") or None
+
+
+def get_cache_dir() -> str | None:
+    """Get directory to cache GitHub API responses in.
+
+    This function may return None if there is no environment
+    variable, or it is empty.
+
+    :returns: The path to cache directory if any or None
+    :rtype: str or None
+    """
+    return os.environ.get("GSTORE_CACHE_DIR") or None
@@ -0,0 +1,49 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Checks of local repositories shared by the sync executors."""
+
+import os
+import re
+
+# Git errors which mean the local repository is damaged rather than
+# the remote one is unavailable.
+CORRUPTION_RE = re.compile(
+    r"corrupt|bad object|bad signature|index file"
+    r"|unable to read (?:tree|sha1 file|[0-9a-f]{40})"
+    r"|missing (?:blob|tree|commit|tag)|not a git repository"
+    r"|invalid sha1 pointer|broken link|loose object",
+    re.IGNORECASE,
+)
+
+
+def is_bare(path: str) -> bool:
+    """Check whether a path holds a bare repository."""
+    return (
+        os.path.isfile(os.path.join(path, "HEAD"))
+        and os.path.isdir(os.path.join(path, "objects"))
+        and os.path.isdir(os.path.join(path, "refs"))
+    )
+
+
+def has_alternates(repo_path: str) -> bool:
+    """Check whether a local repository borrows objects from a pool."""
+    git_path = os.path.join(repo_path, ".git")
+    if not os.path.isdir(git_path):
+        git_path = repo_path
+
+    return os.path.isfile(
+        os.path.join(git_path, "objects", "info", "alternates")
+    )
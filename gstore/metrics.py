@@ -0,0 +1,338 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Prometheus and OpenMetrics instrumentation of sync runs."""
+
+import bisect
+import http.server
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .exceptions import Error
+from .report import SyncResult
+
+CONTENT_TYPE_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+CONTENT_TYPE_OPENMETRICS = \
+    'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Upper bounds in seconds of the histogram buckets.
+SYNC_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n') \
+        .replace('"', r'\"')
+
+
+def _labels(names: tuple, values: tuple, extra='') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in
+             zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def family(self, openmetrics: bool) -> str:
+        return self.name
+
+    def samples(self, openmetrics: bool):
+        for key, value in sorted(self.values.items()):
+            yield self.family(openmetrics), key, '', value
+
+
+class _Counter(_Metric):
+    kind = 'counter'
+
+    def family(self, openmetrics: bool) -> str:
+        # OpenMetrics names the family without the suffix of its samples.
+        return self.name if openmetrics else f'{self.name}_total'
+
+    def samples(self, openmetrics: bool):
+        for key, value in sorted(self.values.items()):
+            yield f'{self.name}_total', key, '', value
+
+    def inc(self, labels=(), amount=1):
+        key = tuple(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class _Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, labels=()):
+        self.values[tuple(labels)] = value
+
+
+class _Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels=(),
+                 buckets=SYNC_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = (*sorted(buckets), float('inf'))
+
+    def observe(self, value: float, labels=()):
+        key = tuple(labels)
+        counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[key] = (counts, total + value)
+
+    def samples(self, openmetrics: bool):
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=True):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket',
+                    key,
+                    f'le="{_number(bound)}"',
+                    cumulative,
+                )
+            yield f'{self.name}_count', key, '', cumulative
+            yield f'{self.name}_sum', key, '', total
+
+
+class Metrics:
+    """Counters, gauges and histograms of a sync run.
+
+    Fed by the result of every repository, see
+    :class:`gstore.report.SyncResult`, and by every GitHub API request sent
+    by :class:`gstore.client.Client`. Rendered in the Prometheus text format
+    or in OpenMetrics, for a textfile collector or an HTTP scrape.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        self.run_started = _Gauge(
+            'gstore_run_start_timestamp_seconds',
+            'Time the sync run started')
+        self.run_duration = _Gauge(
+            'gstore_run_duration_seconds',
+            'Duration of the finished sync run')
+        self.repos = _Counter(
+            'gstore_repos_synced',
+            'Repositories synced successfully',
+            ('action',))
+        self.failures = _Counter(
+            'gstore_repos_failed',
+            'Repositories which failed to sync',
+            ('action',))
+        self.sync_duration = _Histogram(
+            'gstore_sync_duration_seconds',
+            'Time to clone, fetch or repair a repository',
+            ('action',))
+        self.phases = _Counter(
+            'gstore_phase_seconds',
+            'Time spent in each phase of syncing repositories',
+            ('phase',))
+        self.bytes = _Counter(
+            'gstore_received_bytes',
+            'Bytes of objects added to local repositories')
+        self.objects = _Counter(
+            'gstore_received_objects',
+            'Objects added to local repositories')
+        self.requests = _Counter(
+            'gstore_api_requests',
+            'GitHub API requests sent',
+            ('method', 'status'))
+        self.request_duration = _Histogram(
+            'gstore_api_request_duration_seconds',
+            'Latency of GitHub API requests',
+            buckets=REQUEST_BUCKETS)
+        self.rate_limit = _Gauge(
+            'gstore_api_rate_limit',
+            'GitHub API requests allowed per rate limit window')
+        self.rate_limit_remaining = _Gauge(
+            'gstore_api_rate_limit_remaining',
+            'GitHub API requests left in the rate limit window')
+
+        self._metrics = (
+            self.run_started,
+            self.run_duration,
+            self.repos,
+            self.failures,
+            self.sync_duration,
+            self.phases,
+            self.bytes,
+            self.objects,
+            self.requests,
+            self.request_duration,
+            self.rate_limit,
+            self.rate_limit_remaining,
+        )
+
+        self._started = time.time()
+        self.run_started.set(self._started)
+
+    def observe_result(self, result: SyncResult):
+        """Account for the result of a repository."""
+        action = result.action or 'none'
+
+        with self._lock:
+            (self.repos if result.ok else self.failures).inc((action,))
+            self.sync_duration.observe(result.duration, (action,))
+            for name, seconds in result.phases.items():
+                self.phases.inc((name,), seconds)
+            self.bytes.inc(amount=result.bytes_received)
+            self.objects.inc(amount=result.objects_received)
+
+    def observe_request(self, method: str, status: int, duration: float,
+                        limit=None, remaining=None):
+        """Account for a GitHub API request.
+
+        :param str method: HTTP method
+        :param int status: Response status
+        :param float duration: Seconds until the response was received
+        :param int limit: Rate limit reported by GitHub, if known
+        :param int remaining: Remaining requests reported by GitHub, if known
+        """
+        with self._lock:
+            self.requests.inc((method, status))
+            self.request_duration.observe(duration)
+            if limit is not None:
+                self.rate_limit.set(limit)
+            if remaining is not None:
+                self.rate_limit_remaining.set(remaining)
+
+    def finish(self):
+        """Record the end of the sync run."""
+        with self._lock:
+            self.run_duration.set(time.time() - self._started)
+
+    def render(self, openmetrics=False) -> str:
+        """Render all metrics in the Prometheus text format or in
+        OpenMetrics."""
+        lines = []
+
+        with self._lock:
+            for metric in self._metrics:
+                family = metric.family(openmetrics)
+                lines.append(f'# HELP {family} {metric.documentation}')
+                lines.append(f'# TYPE {family} {metric.kind}')
+                for name, key, extra, value in metric.samples(openmetrics):
+                    labels = _labels(metric.labels, key, extra)
+                    lines.append(f'{name}{labels} {_number(value)}')
+
+        if openmetrics:
+            lines.append('# EOF')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Write metrics for the node exporter textfile collector.
+
+        The file is replaced atomically, so the collector never reads
+        a partial file.
+        """
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as error:
+            self.logger.error(
+                'Unable to write metrics to %s: %s', path, error)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    metrics: Metrics
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        openmetrics = 'application/openmetrics-text' in \
+            self.headers.get('Accept', '')
+        body = self.metrics.render(openmetrics).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header(
+            'Content-Type',
+            CONTENT_TYPE_OPENMETRICS if openmetrics
+            else CONTENT_TYPE_PROMETHEUS,
+        )
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.getLogger(__name__).debug(format, *args)
+
+
+class MetricsServer:
+    """An HTTP endpoint serving metrics while a sync run is active.
+
+    :param Metrics metrics: Metrics to serve
+    :param int port: Port to listen on, 0 picks a free one
+    :param str host: Address to listen on
+    :raises Error: If the address cannot be bound
+    """
+
+    def __init__(self, metrics: Metrics, port: int, host='127.0.0.1'):
+        handler = type('Handler', (_Handler,), {'metrics': metrics})
+        try:
+            self.server = http.server.ThreadingHTTPServer(
+                (host, port), handler)
+        except OSError as error:
+            raise Error(
+                f'Unable to serve metrics on {host}:{port}: {error}'
+            ) from error
+        self.server.daemon_threads = True
+        self.logger = logging.getLogger(__name__)
+        self._thread = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Host and port the server listens on."""
+        return self.server.server_address[:2]
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info(
+            'Serving metrics on http://%s:%s/metrics', *self.address)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
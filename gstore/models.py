@@ -31,3 +31,8 @@ class Repository:
 
     name: str
     org: Organization
+    size: int = 0
+    pushed_at: str | None = None
+    default_branch: str | None = None
+    archived: bool = False
+    parent: str | None = None
@@ -0,0 +1,91 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Object pools shared by related repositories."""
+
+import logging
+import os
+
+import git
+
+from .exceptions import parse_git_errors
+from .models import Repository
+from .transport import git_environ
+
+POOL_DIR = '.objects'
+
+
+class ObjectPool:
+    """Bare repositories holding objects of whole fork networks.
+
+    Every fork network gets a pool named after its upstream repository.
+    Repositories of the network fetch their refs into a dedicated namespace
+    of the pool and are cloned with ``--reference`` to it, so objects they
+    share are downloaded and stored only once. Keeping the refs in the pool
+    protects objects used by the clones from being garbage collected.
+
+    :param str base_path: Base target to sync repositories
+    """
+
+    def __init__(self, base_path: str):
+        self.directory = os.path.join(base_path, POOL_DIR)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def network(repo: Repository) -> str:
+        """Get the name of the fork network of a repository."""
+        return repo.parent or f'{repo.org.login}/{repo.name}'
+
+    def path(self, repo: Repository) -> str:
+        """Get path to the pool of a repository."""
+        owner, _, name = self.network(repo).partition('/')
+        return os.path.join(self.directory, owner, f'{name}.git')
+
+    def update(self, repo: Repository, url: str) -> str | None:
+        """Fetch refs of a repository into its pool.
+
+        Refs of different repositories do not overlap, so the pool can be
+        updated by several workers at once.
+
+        :param Repository repo: Repository to fetch
+        :param str url: URL of the remote repository
+        :return: Path to the pool or None if it could not be updated
+        :rtype: str or None
+        """
+        path = self.path(repo)
+        namespace = f'refs/pool/{repo.org.login}/{repo.name}'
+
+        try:
+            pool = git.Repo.init(path, mkdir=True, bare=True)
+            pool.git.update_environment(**git_environ())
+            pool.git.fetch([
+                '--prune',
+                '--quiet',
+                url,
+                f'+refs/heads/*:{namespace}/heads/*',
+                f'+refs/tags/*:{namespace}/tags/*',
+            ])
+        except git.GitCommandError as exception:
+            self.logger.warning(
+                'Unable to update object pool %s for %s/%s',
+                path,
+                repo.org.login,
+                repo.name,
+            )
+            for msg in parse_git_errors(exception):
+                self.logger.warning(msg)
+            return None
+
+        return path
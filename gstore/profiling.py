@@ -0,0 +1,245 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Profiling of sync runs across the main process and the workers."""
+
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+from .report import SyncResult
+
+# pylint: disable=invalid-name
+_active: 'Profiler | None' = None
+
+
+class _Stats:
+    """Stats of a worker in the form :class:`pstats.Stats` loads."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        """Nothing to do, the stats were created by the worker."""
+
+
+def _event(name: str, category: str, started: float, wall: float,
+           pid: int, tid: int, **args) -> dict:
+    return {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': round(started * 1e6),
+        'dur': round(wall * 1e6),
+        'pid': pid,
+        'tid': tid,
+        'args': args,
+    }
+
+
+class Profiler:
+    """Profile of a sync run.
+
+    A path ending with ``.json`` gets a Chrome trace event file, to open in
+    ``chrome://tracing`` or Perfetto: a span per repository and per phase
+    of its sync, and per GitHub API request, with wall and CPU time. Any
+    other path gets :mod:`cProfile` stats of the main process merged with
+    those of the workers, to read with :mod:`pstats`.
+
+    :param str path: Path to the profile file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.trace = path.lower().endswith('.json')
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._events = []
+        self._workers = []
+        self._profiler = None
+
+    @property
+    def collects_stats(self) -> bool:
+        """Whether workers should profile repositories with cProfile."""
+        return not self.trace
+
+    def start(self):
+        """Start profiling the current process."""
+        # pylint: disable=global-statement
+        global _active
+        _active = self
+
+        if self.collects_stats:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        """Stop profiling and save the profile."""
+        # pylint: disable=global-statement
+        global _active
+        _active = None
+
+        if self._profiler is not None:
+            self._profiler.disable()
+
+        try:
+            self.save()
+        except OSError as error:
+            self.logger.error(
+                'Unable to write profile to %s: %s', self.path, error)
+        else:
+            self.logger.info('Profile saved to %s', self.path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add_span(self, event: dict):
+        """Add a trace event recorded in this process."""
+        with self._lock:
+            self._events.append(event)
+
+    def add_result(self, result: SyncResult):
+        """Add spans or stats collected while syncing a repository."""
+        with self._lock:
+            if result.profile is not None:
+                self._workers.append(_Stats(result.profile))
+
+            if not self.trace:
+                return
+
+            self._events.append(_event(
+                result.name,
+                'repo',
+                result.started,
+                result.duration,
+                result.pid,
+                result.thread,
+                action=result.action,
+                ok=result.ok,
+                cpu=round(result.cpu, 6),
+            ))
+            for name, started, wall, cpu in result.spans:
+                self._events.append(_event(
+                    name,
+                    'phase',
+                    started,
+                    wall,
+                    result.pid,
+                    result.thread,
+                    cpu=round(cpu, 6),
+                ))
+
+    def save(self):
+        """Write the profile file."""
+        if self.trace:
+            main = {
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': os.getpid(),
+                'args': {'name': 'gstore'},
+            }
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump(
+                    {
+                        'traceEvents': [main, *self._events],
+                        'displayTimeUnit': 'ms',
+                    },
+                    file,
+                )
+            return
+
+        stats = pstats.Stats(self._profiler)
+        if self._workers:
+            stats.add(*self._workers)
+        stats.dump_stats(self.path)
+
+
+@contextlib.contextmanager
+def span(name: str, category='gstore', **args):
+    """Record a span of the main process, if a trace is being profiled."""
+    profiler = _active
+    if profiler is None or not profiler.trace:
+        yield
+        return
+
+    started = time.time()
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        profiler.add_span(_event(
+            name,
+            category,
+            started,
+            time.perf_counter() - start,
+            os.getpid(),
+            threading.get_ident(),
+            cpu=round(time.thread_time() - cpu, 6),
+            **args,
+        ))
+
+
+def detach():
+    """Drop the profile a worker process inherited when it was forked."""
+    # pylint: disable=global-statement,protected-access
+    global _active
+    if _active is not None and _active._profiler is not None:
+        _active._profiler.disable()
+    _active = None
+
+
+def add_result(result: SyncResult):
+    """Add a result to the active profile, if any."""
+    if _active is not None:
+        _active.add_result(result)
+
+
+def collects_stats() -> bool:
+    """Whether workers should profile repositories with cProfile."""
+    return _active is not None and _active.collects_stats
+
+
+@contextlib.contextmanager
+def profiled(result: SyncResult, enabled: bool):
+    """Profile the block with cProfile and keep the stats in a result."""
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Since Python 3.12 a single profiler sees every thread, so worker
+        # threads are covered by the profiler of the main thread.
+        yield
+        return
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.create_stats()
+        result.profile = profiler.stats
@@ -0,0 +1,153 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Rate limit governor for GitHub API requests."""
+
+import logging
+import random
+import threading
+import time
+
+DEFAULT_RESERVE = 50
+DEFAULT_RETRIES = 5
+
+# Requests are paced only when less than this share of the budget is left.
+PACE_THRESHOLD = 0.5
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+
+
+def _number(value):
+    """Convert a header value to a number, if possible."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """A request budget shared by all threads performing API requests.
+
+    The governor tracks ``X-RateLimit-*`` response headers. While most of
+    the budget is left requests are not delayed, then they are spread evenly
+    until the budget is reset. Once GitHub answers with ``403`` or ``429``
+    due to primary or secondary rate limit, every request is paused for the
+    time GitHub asked for, or with an exponential backoff otherwise.
+
+    :param int reserve: Number of requests to keep for other API clients
+    :param int max_retries: Number of retries of a rate limited request
+    """
+
+    def __init__(
+            self,
+            reserve=DEFAULT_RESERVE,
+            max_retries=DEFAULT_RETRIES,
+            clock=time.time,
+            sleep=time.sleep,
+    ):
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.logger = logging.getLogger(__name__)
+
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+
+    def _interval(self, now: float) -> float:
+        """Get pause between requests to stay within the budget."""
+        if self.remaining is None or self.reset is None or not self.limit:
+            return 0.0
+
+        if self.remaining > self.limit * PACE_THRESHOLD:
+            return 0.0
+
+        window = max(self.reset - now, 0.0)
+        budget = self.remaining - self.reserve
+
+        if budget <= 0:
+            return window
+
+        return window / budget
+
+    def acquire(self):
+        """Block until the next request may be sent."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next_request)
+            self._next_request = start + self._interval(start)
+
+        delay = start - now
+        if delay > 0:
+            self.logger.debug('Delay API request for %.2fs', delay)
+            self._sleep(delay)
+
+    def update(self, headers: dict):
+        """Update the budget from response headers."""
+        limit = _number(headers.get('x-ratelimit-limit'))
+        remaining = _number(headers.get('x-ratelimit-remaining'))
+        reset = _number(headers.get('x-ratelimit-reset'))
+
+        with self._lock:
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None:
+                self.remaining = remaining
+            if reset is not None:
+                self.reset = reset
+
+    def backoff(self, status: int, headers: dict, body, attempt: int):
+        """Calculate the pause before retrying a rate limited request.
+
+        The pause applies to every request sent through the governor, so
+        that concurrent tasks do not keep hitting the limit.
+
+        :param int status: Response status
+        :param dict headers: Response headers
+        :param body: Response body
+        :param int attempt: Number of retries made so far
+        :return: Number of seconds to wait or None if the request should not
+            be retried
+        :rtype: float or None
+        """
+        if status not in (403, 429) or attempt >= self.max_retries:
+            return None
+
+        now = self._clock()
+        retry_after = _number(headers.get('retry-after'))
+        remaining = _number(headers.get('x-ratelimit-remaining'))
+        reset = _number(headers.get('x-ratelimit-reset'))
+
+        if retry_after is not None:
+            delay = retry_after
+        elif remaining == 0 and reset is not None:
+            delay = max(reset - now, 0.0) + 1.0
+        elif status == 429 or 'rate limit' in str(body).lower():
+            # Secondary rate limit without a hint from GitHub.
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+            delay += random.uniform(0, delay / 2)
+        else:
+            # Forbidden for a reason other than rate limiting.
+            return None
+
+        with self._lock:
+            self._next_request = max(self._next_request, now + delay)
+
+        return delay
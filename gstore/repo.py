@@ -15,17 +15,64 @@
 
 """Repository classes used to wrap git classes for gstore."""
 
+import collections
+import contextlib
+import functools
+import itertools
 import logging
 import multiprocessing
+import multiprocessing.pool
 import os
+import re
 import shutil
-from dataclasses import dataclass
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 import git
 
+# The engine is built on top of this module, so both refer to each other
+# through module objects, which import in any order.
+from . import engine
+from .adaptive import JOBS_AUTO, MAX_JOBS, AdaptiveLimit
+from .backend import Backend
 from .exceptions import parse_git_errors
+from .local import CORRUPTION_RE, has_alternates, is_bare
 from .logger import setup_logger
-from .models import Organization, Repository
+from .metrics import Metrics
+from .models import Repository
+from .pool import ObjectPool
+from .profiling import add_result, collects_stats, detach, profiled, span
+from .report import Report, Summary, SyncResult, phase, record
+from .state import State
+from .strategy import CloneRule, CloneStrategy, select
+from .throttle import Budget
+from .transport import (
+    TRANSPORT_SSH,
+    SSHMultiplexer,
+    Transport,
+    environment,
+    git_environ,
+)
+
+MODE_PULL = "pull"
+MODE_FETCH_ONLY = "fetch-only"
+MODES = (MODE_PULL, MODE_FETCH_ONLY)
+
+EXECUTOR_PROCESS = "process"
+EXECUTOR_THREAD = "thread"
+EXECUTOR_ASYNC = "async"
+EXECUTORS = (EXECUTOR_PROCESS, EXECUTOR_THREAD, EXECUTOR_ASYNC)
+
+REPAIR_ATTEMPTS = 3
+
+# Ref checks mostly wait for the network, so many of them run at once.
+REF_CHECK_CONCURRENCY = 16
+
+# Loose objects reported by git fsck as corrupt.
+_CORRUPT_OBJECT_RE = re.compile(
+    r"object corrupt or missing: (\S+)|\(stored in (\S+)\) is corrupt"
+)
 
 
 @dataclass
@@ -34,157 +81,846 @@ class Context:
 
     base_path: str
     logger: logging.Logger
+    mode: str = MODE_PULL
+    mirror: bool = False
+    strategy: CloneStrategy = field(default_factory=CloneStrategy)
+    rules: tuple[CloneRule, ...] = ()
+    object_pool: bool = False
+    backend: Backend = field(default_factory=Backend)
+    transport: Transport = field(default_factory=Transport)
+    budget: Budget | None = None
+    profile: bool = False
+    count_objects: bool = False
+
+    def strategy_for(self, repo: Repository) -> CloneStrategy:
+        """Get the clone strategy for a repository."""
+        return select(repo, self.strategy, self.rules)
+
+    def throttle(self, repo_path: str, result: SyncResult):
+        """Keep git operations on a repository within the budget.
+
+        :param SyncResult result: Result of the planned action
+        """
+        if self.budget is None:
+            return contextlib.nullcontext()
+
+        return self.budget.track(repo_path, result)
 
 
 # pylint: disable=invalid-name
 _proc_ctx: Context | None = None
 
 
-def clone(repo: Repository, ctx: Context):
-    """Clone a repository to the target directory."""
+def clone(repo: Repository, ctx: Context) -> bool:
+    """Clone a repository to the target directory.
+
+    :return: True if the repository was cloned successfully
+    :rtype: bool
+    """
     ctx.logger.info("Clone repository to %s/%s", repo.org.login, repo.name)
     repo_path = os.path.join(ctx.base_path, repo.org.login, repo.name)
 
     if os.path.exists(repo_path):
         shutil.rmtree(repo_path, ignore_errors=True)
 
-    git_url = f"git@github.com:{repo.org.login}/{repo.name}.git"
+    git_url = ctx.transport.url(repo)
+
+    # A mirror has no working tree and tracks every remote ref, which
+    # halves disk usage and skips the checkout of large repositories.
+    options = {"mirror": True} if ctx.mirror else {}
+
+    strategy = ctx.strategy_for(repo)
+    multi_options = strategy.clone_options()
+    if multi_options:
+        options["multi_options"] = multi_options
+
+    environ = git_environ()
+    if environ:
+        options["env"] = environ
+
+    # A pool holds whole repositories, so partial clones skip it rather
+    # than download what their strategy leaves out.
+    if ctx.object_pool and not strategy.partial:
+        # Objects already known to the pool are not downloaded again.
+        with phase("pool"):
+            pool_path = ObjectPool(ctx.base_path).update(repo, git_url)
+        if pool_path:
+            options["reference"] = pool_path
 
     try:
-        git.Repo.clone_from(git_url, repo_path)
+        with phase("network"):
+            git.Repo.clone_from(git_url, repo_path, **options)
     except git.GitCommandError as exception:
         ctx.logger.error("Failed to clone %s/%s", repo.org.login, repo.name)
         for msg in parse_git_errors(exception):
             ctx.logger.error(msg)
+        return False
 
+    return True
 
-def fetch(repo: Repository, ctx: Context):
-    """Sync a repository in the target directory."""
+
+def fetch(repo: Repository, ctx: Context) -> bool:
+    """Sync a repository in the target directory.
+
+    :return: True if the repository was updated successfully
+    :rtype: bool
+    """
     ctx.logger.info("Update %s/%s repository", repo.org.login, repo.name)
     repo_path = os.path.join(ctx.base_path, repo.org.login, repo.name)
-    local_repo = git.Repo(repo_path)
 
-    if not local_repo.heads:
+    try:
+        with phase("open"):
+            local_repo = ctx.backend.open(repo_path)
+    except git.InvalidGitRepositoryError:
+        return repair(repo, ctx)
+
+    options = ctx.strategy_for(repo).fetch_options()
+
+    if not local_repo.has_heads():
         ctx.logger.info(
             "No remote branches for %s/%s, skip fetching",
             repo.org.login,
             repo.name,
         )
-        return
+        return True
+
+    if ctx.object_pool and has_alternates(repo_path):
+        with phase("pool"):
+            ObjectPool(ctx.base_path).update(repo, ctx.transport.url(repo))
 
     try:
+        # Follows changes of the transport or the host.
+        local_repo.set_origin(ctx.transport.url(repo))
+
         ctx.logger.debug(
             "Download objects and refs from %s/%s", repo.org.login, repo.name
         )
-        local_repo.git.fetch(["--prune", "--quiet"])
+        if is_bare(repo_path):
+            # Mirrors have no working tree, updating the refs is enough.
+            with phase("network"):
+                local_repo.update_mirror(options)
+            return True
+
+        if ctx.mode == MODE_FETCH_ONLY:
+            # A single round-trip for all refs, the working tree is left
+            # as is.
+            with phase("network"):
+                local_repo.fetch(options, all_remotes=True)
+            return True
+
+        with phase("network"):
+            local_repo.fetch(options)
 
         ctx.logger.debug(
             "Pulling all branches from %s/%s", repo.org.login, repo.name
         )
-        local_repo.git.pull(["--all", "--quiet"])
+        with phase("pull"):
+            local_repo.pull(options)
     except git.GitCommandError as exception:
+        if CORRUPTION_RE.search(str(exception.stderr)):
+            return repair(repo, ctx)
+
         ctx.logger.error("Failed to update %s/%s", repo.org.login, repo.name)
         for msg in parse_git_errors(exception):
             ctx.logger.error(msg)
+        return False
 
+    return True
 
-def _do_sync(repos: list[Repository]):
-    """Perform repos synchronisation. Intended for internal usage."""
-    assert _proc_ctx is not None, "Context not initialized in this process"
 
-    ctx = _proc_ctx
+def _map_ref(name: str, refspecs: list) -> str | None:
+    """Get the local ref a remote ref is fetched to, if any."""
+    mapped = None
+    for refspec in refspecs:
+        spec = refspec.lstrip("+")
+        negative = spec.startswith("^")
+        source, _, destination = spec.lstrip("^").partition(":")
 
-    for repo in repos:
-        org_path = os.path.join(ctx.base_path, repo.org.login)
-        repo_path = os.path.join(org_path, repo.name)
-        git_path = os.path.join(repo_path, ".git")
-
-        if os.path.exists(repo_path):
-            if os.path.isfile(repo_path):
-                ctx.logger.error(
-                    "Unable to sync %s. The path %s is a regular file",
-                    repo.name,
-                    repo_path,
-                )
-                continue
+        prefix, wildcard, suffix = source.partition("*")
+        if not wildcard:
+            match = name == source
+        else:
+            match = name.startswith(prefix) and name.endswith(suffix) and \
+                len(name) >= len(prefix) + len(suffix)
 
-            if not os.access(repo_path, os.W_OK | os.X_OK):
-                ctx.logger.error(
-                    "Unable to sync %s. The path %s is not writeable",
-                    repo.name,
-                    repo_path,
-                )
-                continue
+        if match and negative:
+            return None
+        if match and mapped is None:
+            matched = name[len(prefix):len(name) - len(suffix)]
+            mapped = destination.replace("*", matched, 1)
+
+    return mapped
+
+
+def _expected_refs(remote_refs: dict, refspecs: list, local: dict,
+                   bare: bool) -> dict:
+    """Map refs advertised by the remote to local refs they are fetched to.
 
-            # We're going to run a Git command, but weren't inside a
-            # local Git repository.
-            if not os.path.exists(git_path):
-                ctx.logger.debug(
-                    "Remove wrong formed local repo from %s", repo_path
+    Refs are mapped with the fetch refspecs of the local repository, so a
+    single-branch clone expects its only branch. Tags not covered by the
+    refspecs are those git fetches along with the branches. All of them
+    are expected when every branch is fetched; otherwise only those which
+    exist locally are compared, since which ones are reachable from the
+    fetched branches is not known without fetching.
+    """
+    if not refspecs:
+        refspecs = [
+            "+refs/*:refs/*" if bare
+            else "+refs/heads/*:refs/remotes/origin/*"
+        ]
+    all_branches = any(
+        refspec.lstrip("+").startswith("refs/heads/*:")
+        for refspec in refspecs
+    )
+
+    expected = {}
+    for name, sha in remote_refs.items():
+        if name == "HEAD" or name.endswith("^{}"):
+            continue
+
+        mapped = _map_ref(name, refspecs)
+        if mapped is not None:
+            expected[mapped] = sha
+        elif name.startswith("refs/tags/") and (all_branches or name in local):
+            expected[name] = sha
+
+    return expected
+
+
+def refs_unchanged(repo: Repository, ctx: Context) -> bool:
+    """Check whether a local repository is level with the remote one.
+
+    Refs advertised by the remote are compared with the local ones, which
+    costs a single round-trip without any negotiation of objects. Any
+    doubt is resolved in favour of updating the repository.
+
+    :return: True if updating the repository would not change anything
+    :rtype: bool
+    """
+    repo_path = os.path.join(ctx.base_path, repo.org.login, repo.name)
+    if not _is_repo(repo_path):
+        return False
+
+    bare = is_bare(repo_path)
+
+    try:
+        local_repo = ctx.backend.open(repo_path)
+        local = local_repo.local_refs()
+        expected = _expected_refs(
+            local_repo.remote_refs(), local_repo.fetch_refspecs(), local, bare
+        )
+        level = ctx.mode == MODE_FETCH_ONLY or bare or \
+            local_repo.head_matches_upstream()
+    except git.GitError as exception:
+        ctx.logger.debug(
+            "Unable to compare refs of %s/%s: %s",
+            repo.org.login,
+            repo.name,
+            exception,
+        )
+        return False
+
+    if bare:
+        tracked = local
+    else:
+        # Tags removed from the remote are not pruned locally, only
+        # branches are.
+        tracked = {
+            name: sha
+            for name, sha in local.items()
+            if name.startswith("refs/remotes/origin/")
+            and name != "refs/remotes/origin/HEAD"
+            or name in expected
+        }
+
+    return level and tracked == expected
+
+
+def _check_refs(items: Iterable[Repository], ctx: Context):
+    """Check refs of repositories concurrently.
+
+    The repositories are consumed lazily and yielded in the same order
+    along with the result of :func:`refs_unchanged`.
+    """
+    window = collections.deque()
+
+    with ThreadPoolExecutor(max_workers=REF_CHECK_CONCURRENCY) as executor:
+        for repo in items:
+            window.append((repo, executor.submit(refs_unchanged, repo, ctx)))
+            if len(window) >= REF_CHECK_CONCURRENCY:
+                checked, future = window.popleft()
+                yield checked, future.result()
+
+        while window:
+            checked, future = window.popleft()
+            yield checked, future.result()
+
+
+def _skip_fresh(items, state: State, base_path: str, counts):
+    """Yield repositories which were pushed since the last sync."""
+    for repo in items:
+        if state.is_fresh(repo, base_path):
+            counts["fresh"] += 1
+        else:
+            yield repo
+
+
+def _skip_unchanged(items, ctx: Context, state: State | None, counts):
+    """Yield repositories whose refs differ from the remote ones."""
+    for repo, same in _check_refs(items, ctx):
+        if not same:
+            yield repo
+            continue
+
+        counts["unchanged"] += 1
+        if state is not None:
+            state.update(repo)
+
+
+def _git_dir(repo_path: str) -> str | None:
+    """Find objects which may be salvaged from a damaged repository."""
+    for git_dir in (os.path.join(repo_path, ".git"), repo_path):
+        if os.path.isdir(os.path.join(git_dir, "objects")):
+            return git_dir
+
+    return None
+
+
+def _salvage_objects(local_repo: git.Repo, ctx: Context):
+    """Remove corrupt objects and refs whose history is not complete.
+
+    Fetch would treat objects reachable from such refs as present and
+    never download them again.
+    """
+    try:
+        local_repo.git.fsck(["--connectivity-only", "--no-dangling"])
+        return
+    except git.GitCommandError:
+        ctx.logger.debug("Look for corrupt objects and broken refs")
+
+    # Git may stop at the first corrupt object, so check again until
+    # nothing else is removed.
+    removed = True
+    while removed:
+        removed = False
+        try:
+            local_repo.git.fsck(["--full", "--no-dangling"])
+        except git.GitCommandError as exception:
+            for match in _CORRUPT_OBJECT_RE.finditer(str(exception.stderr)):
+                path = os.path.join(
+                    local_repo.working_dir, match.group(1) or match.group(2)
                 )
-                shutil.rmtree(repo_path, ignore_errors=True)
+                if os.path.isfile(path):
+                    ctx.logger.debug("Remove corrupt object %s", path)
+                    os.unlink(path)
+                    removed = True
+
+    refs = local_repo.git.for_each_ref(["--format=%(refname)"]).split()
+    for ref in refs:
+        try:
+            local_repo.git.rev_list(["--objects", "--quiet", ref])
+        except git.GitCommandError:
+            ctx.logger.debug("Drop broken ref %s", ref)
+            local_repo.git.update_ref(["-d", "--no-deref", ref])
+
+
+def _default_branch(local_repo: git.Repo, repo: Repository) -> str | None:
+    """Get the default branch of a repository."""
+    if repo.default_branch:
+        return repo.default_branch
+
+    output = local_repo.git.ls_remote(["--symref", "origin", "HEAD"])
+    match = re.search(r"^ref: refs/heads/(\S+)\s+HEAD", output, re.MULTILINE)
+
+    return match.group(1) if match else None
+
+
+def _refetch(local_repo: git.Repo, ctx: Context):
+    """Download objects missing from a salvaged repository."""
+    # Objects behind a missing one are not checked by git, so they
+    # show up only once the missing one is downloaded.
+    for attempt in range(1, REPAIR_ATTEMPTS + 1):
+        _salvage_objects(local_repo, ctx)
+        try:
+            local_repo.git.fetch(["--prune", "--quiet", "origin"])
+            return
+        except git.GitCommandError as exception:
+            corrupt = CORRUPTION_RE.search(str(exception.stderr))
+            if not corrupt or attempt == REPAIR_ATTEMPTS:
+                raise
+
+
+def _restore(repo: Repository, ctx: Context, repo_path: str, bare: bool):
+    """Re-initialize a repository over its objects and download the rest.
+
+    :raises git.GitError: If the repository cannot be restored
+    """
+    git_url = ctx.transport.url(repo)
+
+    # Recreates HEAD, refs and config if they are lost, keeps objects.
+    local_repo = git.Repo.init(repo_path, bare=bare)
+    local_repo.git.update_environment(**git_environ())
+
+    if "origin" in [remote.name for remote in local_repo.remotes]:
+        local_repo.git.remote(["set-url", "origin", git_url])
+    else:
+        mirror = ["--mirror=fetch"] if bare else []
+        local_repo.git.remote(["add", *mirror, "origin", git_url])
+
+    index_path = os.path.join(local_repo.git_dir, "index")
+    if not bare and os.path.exists(index_path):
+        os.unlink(index_path)
+
+    _refetch(local_repo, ctx)
+
+    branch = _default_branch(local_repo, repo)
+    if branch and bare:
+        local_repo.git.symbolic_ref(["HEAD", f"refs/heads/{branch}"])
+    elif branch and f"origin/{branch}" in local_repo.refs:
+        local_repo.git.checkout(["--force", "-B", branch, f"origin/{branch}"])
+
+
+def _is_corruption(exception: Exception) -> bool:
+    """Check whether a failed repair is due to the repository itself."""
+    if isinstance(exception, git.GitCommandError):
+        return bool(CORRUPTION_RE.search(str(exception.stderr)))
+
+    return not isinstance(exception, OSError)
+
+
+def repair(repo: Repository, ctx: Context) -> bool:
+    """Restore a damaged local repository reusing its objects.
 
-        if os.path.exists(git_path):
-            fetch(repo, ctx)
+    The repository is re-initialized over existing objects, its index is
+    rebuilt and refs with incomplete history are dropped, so only missing
+    objects are downloaded. A fresh clone is made as the last resort, when
+    the repository is still corrupt. Other failures, such as the remote
+    being unreachable, leave the repository as is.
+
+    :return: True if the repository was repaired or cloned successfully
+    :rtype: bool
+    """
+    ctx.logger.warning("Repair %s/%s repository", repo.org.login, repo.name)
+    repo_path = os.path.join(ctx.base_path, repo.org.login, repo.name)
+    git_dir = _git_dir(repo_path)
+
+    if git_dir is None:
+        return clone(repo, ctx)
+
+    try:
+        with phase("repair"):
+            _restore(repo, ctx, repo_path, bare=git_dir == repo_path)
+    except (git.GitError, OSError, ValueError) as exception:
+        corrupt = _is_corruption(exception)
+        ctx.logger.error(
+            "Failed to repair %s/%s%s",
+            repo.org.login,
+            repo.name,
+            ", clone it again" if corrupt else "",
+        )
+        if isinstance(exception, git.GitCommandError):
+            for msg in parse_git_errors(exception):
+                ctx.logger.error(msg)
         else:
-            clone(repo, ctx)
+            ctx.logger.error(exception)
+        # Cloning removes the directory, so it is kept unless recloning
+        # is the only way to get a working repository.
+        return clone(repo, ctx) if corrupt else False
+
+    return True
 
 
-def _init_process(verbose=False, quiet=False, base_path=None):
+def _is_repo(path: str) -> bool:
+    """Check whether a path holds a local repository.
+
+    Both repositories with a working tree and bare ones are recognized.
+    """
+    return os.path.exists(os.path.join(path, ".git")) or is_bare(path)
+
+
+def plan(repo: Repository, ctx: Context) -> str | None:
+    """Decide how to sync a repository and prepare its directory.
+
+    :return: One of ``clone``, ``fetch`` and ``repair``, or None if the
+        repository cannot be synced
+    :rtype: str or None
+    """
+    org_path = os.path.join(ctx.base_path, repo.org.login)
+    repo_path = os.path.join(org_path, repo.name)
+
+    if not os.path.exists(org_path):
+        ctx.logger.debug("Creating directory %s", org_path)
+        os.makedirs(org_path, exist_ok=True)
+
+    if os.path.exists(repo_path):
+        if os.path.isfile(repo_path):
+            ctx.logger.error(
+                "Unable to sync %s. The path %s is a regular file",
+                repo.name,
+                repo_path,
+            )
+            return None
+
+        if not os.access(repo_path, os.W_OK | os.X_OK):
+            ctx.logger.error(
+                "Unable to sync %s. The path %s is not writeable",
+                repo.name,
+                repo_path,
+            )
+            return None
+
+        # We're going to run a Git command, but weren't inside a
+        # local Git repository. Objects left there are still worth
+        # keeping.
+        if not _is_repo(repo_path) and _git_dir(repo_path):
+            return "repair"
+
+        if not _is_repo(repo_path):
+            ctx.logger.debug(
+                "Remove wrong formed local repo from %s", repo_path
+            )
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+    if _is_repo(repo_path):
+        return "fetch"
+
+    return "clone"
+
+
+def _do_sync(repo: Repository) -> SyncResult:
+    """Perform repo synchronisation. Intended for internal usage.
+
+    :return: What happened to the repository
+    :rtype: :class:`gstore.report.SyncResult`
+    """
+    assert _proc_ctx is not None, "Context not initialized in this process"
+
+    ctx = _proc_ctx
+    actions = {"clone": clone, "fetch": fetch, "repair": repair}
+    repo_path = os.path.join(ctx.base_path, repo.org.login, repo.name)
+
+    with record(repo, repo_path, ctx.count_objects) as result, \
+            profiled(result, ctx.profile):
+        with phase("plan"):
+            result.action = plan(repo, ctx)
+
+        if result.action is not None:
+            with ctx.throttle(repo_path, result):
+                result.ok = actions[result.action](repo, ctx)
+
+    return result
+
+
+def _init_process(
+        verbose=False,
+        quiet=False,
+        base_path=None,
+        options=None,
+        multiplexer=None,
+        threaded=False,
+):
     """Call when new processes start.
 
     This function is used as a initializer on a per-process basis due
     to 'spawn' process strategy (at least on Windows and macOS).
+
+    :param dict options: Extra :class:`Context` fields
+    :param SSHMultiplexer multiplexer: Shared SSH connections, if any
+    :param bool threaded: Whether the worker is a thread of the main
+        process, which has its logger and environment set up already
     """
     assert isinstance(base_path, str) and base_path
 
-    # Setup logger for use within multiprocessing pool
-    setup_logger(verbose, quiet)
+    if threaded:
+        if multiplexer is not None:
+            multiplexer.assign()
+    else:
+        detach()
+        if multiplexer is not None:
+            multiplexer.apply()
+
+        # Setup logger for use within multiprocessing pool
+        setup_logger(verbose, quiet)
+
     logger = logging.getLogger(__name__)
     logger.info("Initializing process")
 
     # pylint: disable=global-statement
     global _proc_ctx
-    _proc_ctx = Context(base_path=base_path, logger=logger)
+    _proc_ctx = Context(base_path=base_path, logger=logger, **(options or {}))
 
+    if not threaded:
+        os.environ.update(_proc_ctx.transport.environ())
 
-def sync(org: Organization, repos: list[Repository], base_path: str, **kwargs):
-    """Sync repositories for an organization.
 
-    :param Organization org: Organization to sync
-    :param list repos: Repository list to sync
+def _run_workers(tasks, jobs: int, executor: str, initargs, callback,
+                 limit: AdaptiveLimit | None = None):
+    """Sync repositories with a pool of processes or threads."""
+    logger = logging.getLogger(__name__)
+
+    threaded = executor == EXECUTOR_THREAD
+    if threaded:
+        # Workers mostly wait for git and the network, threads do it
+        # at a fraction of the memory and startup cost of processes.
+        logger.info("Threads to be started: %s", jobs)
+        pool_class = multiprocessing.pool.ThreadPool
+    else:
+        logger.info("Processes to be spawned: %s", jobs)
+        pool_class = multiprocessing.Pool
+
+    with span("start workers"):
+        pool = pool_class(
+            processes=jobs,
+            initializer=_init_process,
+            initargs=(*initargs, threaded),
+        )
+
+    with pool:
+        try:
+            for result in pool.imap_unordered(_do_sync, tasks, chunksize=1):
+                callback(result)
+        finally:
+            # The pool joins its task handler on exit, which may be waiting
+            # for the limit to hand out a repository.
+            if limit is not None:
+                limit.close()
+
+
+def _run_engine(tasks, ctx: Context, jobs: int, disk_jobs, callback,
+                limit: AdaptiveLimit | None = None,
+                multiplexer: SSHMultiplexer | None = None):
+    """Sync repositories with :class:`gstore.engine.AsyncEngine`."""
+    runner = engine.AsyncEngine(
+        ctx, jobs, disk_jobs or engine.DEFAULT_DISK_JOBS, multiplexer)
+    ctx.logger.info(
+        "Git commands to be run at once: %s network, %s disk",
+        runner.network_jobs,
+        runner.disk_jobs,
+    )
+    runner.sync(tasks, callback, limit)
+
+
+def _collect(result: SyncResult, summary: Summary, report: Report | None,
+             limit: AdaptiveLimit | None, state: State | None,
+             metrics: Metrics | None):
+    """Account for the result of a repository."""
+    summary.add(result)
+    if report is not None:
+        report.add(result)
+    if metrics is not None:
+        metrics.observe_result(result)
+    add_result(result)
+    if limit is not None:
+        limit.release(result.repo, result.ok, result.growth)
+    if result.ok and state is not None:
+        state.update(result.repo)
+
+
+def _summarize(summary: Summary, report: Report | None):
+    """Log the summary of a run and complete its report."""
+    summary.log()
+    if report is not None:
+        report.close(summary)
+        logging.getLogger(__name__).info(
+            "Sync report saved to %s", report.path
+        )
+
+
+def _finish(state: State | None, counts: collections.Counter,
+            skip_unchanged: bool):
+    """Report skipped repositories and save the sync state."""
+    logger = logging.getLogger(__name__)
+
+    if skip_unchanged:
+        logger.info(
+            "Skipped %s repos whose refs did not change",
+            counts["unchanged"],
+        )
+    if state is not None:
+        logger.info(
+            "Skipped %s repos not pushed since the last sync",
+            counts["fresh"],
+        )
+        state.save()
+
+
+def _schedule(candidates: Iterable[Repository], ordered: bool, jobs: int):
+    """Get the tasks to dispatch and the number of workers they need."""
+    logger = logging.getLogger(__name__)
+
+    if ordered:
+        # Each repository is dispatched as a separate task, so a worker
+        # that finished its job picks up the next repository right away.
+        # Largest repositories go first to keep them from being the tail
+        # of the run.
+        tasks = sorted(candidates, key=lambda repo: repo.size, reverse=True)
+        orgs = {repo.org.login for repo in tasks}
+        logger.info(
+            "Sync %s repos for %s organization(s)", len(tasks), len(orgs)
+        )
+        return tasks, min(len(tasks), jobs)
+
+    # Workers are started once there is a repository for each of them, or
+    # the stream has ended, so a short stream does not start idle workers.
+    head = list(itertools.islice(candidates, jobs))
+    logger.info("Sync repos as they are discovered")
+    if not head:
+        return [], 0
+
+    return itertools.chain(head, candidates), len(head)
+
+
+def _max_jobs(jobs) -> int:
+    """Get the highest number of workers for the ``jobs`` option."""
+    if jobs == JOBS_AUTO:
+        return MAX_JOBS
+
+    return jobs or multiprocessing.cpu_count()
+
+
+def sync(repos: Iterable[Repository], base_path: str, **kwargs):
+    """Sync repositories of one or more organizations.
+
+    All repositories are dispatched to a single worker pool regardless of
+    the organization they belong to, so that one organization does not
+    have to wait for the slowest repository of another one.
+
+    A list of repositories is dispatched largest first. Any other iterable
+    is consumed lazily, so workers may start while the repositories are
+    still being discovered: once there is a repository for each of them,
+    or the iterable is exhausted.
+
+    :param repos: Repositories to sync
+    :type repos: list or iterable of :class:`gstore.models.Repository`
     :param string base_path: Base target to sync repositories
     :keyword bool verbose: Enable debug logging
     :keyword bool quiet: Disable info logging
-    :keyword int jobs: The number of worker processes to use
+    :keyword jobs: The number of workers to use, or :data:`JOBS_AUTO`
+        to adapt it to the observed throughput, see
+        :class:`gstore.adaptive.AdaptiveLimit`
+    :keyword str executor: Whether workers are processes, threads or
+        asyncio subprocesses, one of :data:`EXECUTORS`
+    :keyword bool incremental: Skip repositories which were not pushed
+        since the last successful sync
+    :keyword str mode: How to update existing repositories, one of
+        :data:`MODES`
+    :keyword bool mirror: Store new clones as bare mirrors
+    :keyword CloneStrategy strategy: Default clone strategy
+    :keyword list rules: Clone strategies for repositories matching
+        a pattern, see :class:`gstore.strategy.CloneRule`
+    :keyword bool object_pool: Share objects of related repositories
+        through pools, see :class:`gstore.pool.ObjectPool`
+    :keyword Backend backend: Backend used to update repositories
+    :keyword bool skip_unchanged: Skip repositories whose refs match the
+        remote ones, see :func:`refs_unchanged`
+    :keyword Transport transport: How git talks to remote repositories
+    :keyword bool ssh_multiplex: Share SSH connections between git
+        operations, see :class:`gstore.transport.SSHMultiplexer`
+    :keyword int disk_jobs: Number of disk-bound git commands run at once
+        by the ``async`` executor
+    :keyword Budget budget: Bandwidth and disk limits shared by all
+        workers, see :class:`gstore.throttle.Budget`
+    :keyword str report: Path to save a report of the run to, see
+        :class:`gstore.report.Report`
+    :keyword Metrics metrics: Metrics to account results in, see
+        :class:`gstore.metrics.Metrics`
     """
+    transport = kwargs.get("transport") or Transport()
+
+    with contextlib.ExitStack() as stack:
+        # Ref checks run git in this process too.
+        stack.enter_context(environment(transport.environ()))
+
+        multiplexer = None
+        if kwargs.get("ssh_multiplex") and transport.kind == TRANSPORT_SSH:
+            jobs = _max_jobs(kwargs.get("jobs"))
+            multiplexer = stack.enter_context(SSHMultiplexer(jobs))
+
+        _sync(repos, base_path, multiplexer, **kwargs)
+
+
+def _sync(
+        repos: Iterable[Repository],
+        base_path: str,
+        multiplexer: SSHMultiplexer | None,
+        **kwargs,
+):
+    """Sync repositories, see :func:`sync` for the arguments."""
     verbose = kwargs.get("verbose") or False
     quiet = kwargs.get("quiet") or False
-    requested_jobs = kwargs.get("jobs") or multiprocessing.cpu_count()
+    requested_jobs = _max_jobs(kwargs.get("jobs"))
+    incremental = kwargs.get("incremental") or False
+    skip_unchanged = kwargs.get("skip_unchanged") or False
+    executor = kwargs.get("executor") or EXECUTOR_PROCESS
+    options = {
+        "mode": kwargs.get("mode") or MODE_PULL,
+        "mirror": kwargs.get("mirror") or False,
+        "strategy": kwargs.get("strategy") or CloneStrategy(),
+        "rules": tuple(kwargs.get("rules") or ()),
+        "object_pool": kwargs.get("object_pool") or False,
+        "backend": kwargs.get("backend") or Backend(),
+        "transport": kwargs.get("transport") or Transport(),
+        "budget": kwargs.get("budget"),
+        "profile": collects_stats(),
+        # Counting objects runs git twice per repository, so it is done
+        # only for the report and the metrics.
+        "count_objects": bool(kwargs.get("report") or kwargs.get("metrics")),
+    }
 
     logger = logging.getLogger(__name__)
-    logger.info("Sync repos for %s", org.login)
 
-    # Calculate the number of processes to use
-    jobs = min(len(repos), requested_jobs)
-    if jobs == 0:
-        logger.warning("No repositories to sync")
-        return
+    state = State.load(base_path) if incremental else None
+    counts = collections.Counter()
 
-    org_path = os.path.join(base_path, org.login)
-    if not os.path.exists(org_path):
-        logger.debug("Creating directory %s", org_path)
-        os.makedirs(org_path)
-
-    def chunks(tasks: list, n: int):
-        """Yield successive n-sized chunks from tasks list."""
-        for i in range(0, len(tasks), n):
-            yield tasks[i : i + n]
-
-    logger.info("Processes to be spawned: %s", jobs)
-    with multiprocessing.Pool(
-        processes=jobs,
-        initializer=_init_process,
-        initargs=(verbose, quiet, base_path),
-    ) as pool:
-        pool.map(_do_sync, chunks(repos, jobs))
+    candidates = iter(repos)
+    if state is not None:
+        candidates = _skip_fresh(candidates, state, base_path, counts)
+    if skip_unchanged:
+        ctx = Context(base_path=base_path, logger=logger, **options)
+        candidates = _skip_unchanged(candidates, ctx, state, counts)
+
+    summary = Summary(options["count_objects"])
+    report = Report(kwargs["report"]) if kwargs.get("report") else None
+
+    tasks, jobs = _schedule(
+        candidates, isinstance(repos, list), requested_jobs
+    )
+
+    limit = None
+    try:
+        if jobs == 0:
+            logger.warning("No repositories to sync")
+            return
+
+        if kwargs.get("jobs") == JOBS_AUTO:
+            # Workers are started for the highest limit, the adaptive limit
+            # decides how many of them get a repository.
+            limit = AdaptiveLimit(multiprocessing.cpu_count(), maximum=jobs)
+            logger.info(
+                "Adapt the number of jobs between %s and %s",
+                limit.minimum,
+                limit.maximum,
+            )
+            tasks = limit.gate(tasks)
+
+        collect = functools.partial(
+            _collect,
+            summary=summary,
+            report=report,
+            limit=limit,
+            state=state,
+            metrics=kwargs.get("metrics"),
+        )
+
+        if executor == EXECUTOR_ASYNC:
+            ctx = Context(base_path=base_path, logger=logger, **options)
+            disk_jobs = kwargs.get("disk_jobs")
+            _run_engine(
+                tasks, ctx, jobs, disk_jobs, collect, limit, multiplexer
+            )
+        else:
+            initargs = (verbose, quiet, base_path, options, multiplexer)
+            _run_workers(tasks, jobs, executor, initargs, collect, limit)
+    finally:
+        _finish(state, counts, skip_unchanged)
+        _summarize(summary, report)
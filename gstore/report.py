@@ -0,0 +1,335 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Per-repository results of a sync run, their summary and reports."""
+
+import contextlib
+import contextvars
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import git
+
+from .exceptions import Error
+from .models import Repository
+
+# Number of slowest repositories listed in the summary.
+SLOWEST = 5
+
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    'gstore_result', default=None)
+
+
+@dataclass
+class SyncResult:
+    """What happened to a repository during a sync.
+
+    Phase durations are in seconds, keyed by phase:
+
+    * ``plan``: checking the local directory;
+    * ``open``: opening the local repository;
+    * ``throttle``: waiting for the bandwidth and disk budget;
+    * ``pool``: updating the shared object pool;
+    * ``network``: cloning or fetching;
+    * ``disk``: checking out or merging, with the ``async`` executor;
+    * ``pull``: merging remote changes, which may fetch as well;
+    * ``repair``: restoring a damaged repository.
+
+    Every phase is also kept as a span with its start time, wall time and
+    CPU time of the thread running it, see :mod:`gstore.profiling`.
+
+    :param Repository repo: Synced repository
+    """
+
+    repo: Repository
+    action: str | None = None
+    ok: bool = False
+    started: float = field(default_factory=time.time)
+    duration: float = 0.0
+    cpu: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+    bytes_received: int = 0
+    objects_received: int = 0
+    growth: int | None = None
+    error: str | None = None
+    pid: int = field(default_factory=os.getpid)
+    thread: int = field(default_factory=threading.get_ident)
+    spans: list[tuple[str, float, float, float]] = field(default_factory=list)
+    profile: dict | None = None
+
+    @property
+    def name(self) -> str:
+        """Repository name in the ``org/repo`` form."""
+        return f'{self.repo.org.login}/{self.repo.name}'
+
+    def received(self, before: tuple[int, int], after: tuple[int, int]):
+        """Record objects and bytes added between two :func:`object_stats`.
+        """
+        self.objects_received = max(0, after[0] - before[0])
+        self.bytes_received = max(0, after[1] - before[1])
+
+    def to_dict(self) -> dict:
+        """Get the result as a JSON serializable dict."""
+        return {
+            'repo': self.name,
+            'action': self.action,
+            'ok': self.ok,
+            'started': self.started,
+            'duration': round(self.duration, 3),
+            'cpu': round(self.cpu, 3),
+            'phases': {
+                name: round(seconds, 3)
+                for name, seconds in self.phases.items()
+            },
+            'bytes_received': self.bytes_received,
+            'objects_received': self.objects_received,
+            'error': self.error,
+        }
+
+
+class _ErrorHandler(logging.Handler):
+    """Copies error messages into the result being recorded, if any."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record: logging.LogRecord):
+        result = _current.get()
+        if result is None:
+            return
+
+        message = record.getMessage()
+        result.error = message if result.error is None \
+            else f'{result.error}\n{message}'
+
+
+_handler = _ErrorHandler()
+
+
+def activate(result: SyncResult):
+    """Make a result collect phases and errors of the current thread or
+    asyncio task.
+
+    :return: Token to pass to :func:`deactivate`
+    """
+    root = logging.getLogger('gstore')
+    if _handler not in root.handlers:
+        root.addHandler(_handler)
+
+    return _current.set(result)
+
+
+def deactivate(token):
+    """Stop collecting into the result set by :func:`activate`."""
+    result = _current.get()
+    if result is not None and result.ok:
+        # Errors that were recovered from are not the outcome.
+        result.error = None
+
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Add the duration of the block to a phase of the current result."""
+    started = time.time()
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        result = _current.get()
+        if result is not None:
+            elapsed = time.perf_counter() - start
+            result.phases[name] = result.phases.get(name, 0.0) + elapsed
+            result.spans.append(
+                (name, started, elapsed, time.thread_time() - cpu))
+
+
+def object_stats(repo_path: str) -> tuple[int, int]:
+    """Get the number of objects in a repository and their size in bytes.
+
+    A missing or broken repository counts as empty.
+    """
+    if not os.path.isdir(repo_path):
+        return 0, 0
+
+    try:
+        output = git.Git(repo_path).count_objects('-v')
+    except git.GitCommandError:
+        return 0, 0
+
+    stats = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(':')
+        if value.strip().isdigit():
+            stats[key.strip()] = int(value)
+
+    objects = stats.get('count', 0) + stats.get('in-pack', 0)
+    size = stats.get('size', 0) + stats.get('size-pack', 0)
+
+    # Sizes are reported in KiB
+    return objects, size * 1024
+
+
+@contextlib.contextmanager
+def record(repo: Repository, repo_path: str, count_objects=True):
+    """Collect the result of syncing a repository in the block.
+
+    :param bool count_objects: Count objects received, which runs git
+        before and after the block
+    """
+    result = SyncResult(repo)
+    token = activate(result)
+    before = object_stats(repo_path) if count_objects else None
+    start = time.perf_counter()
+    cpu = time.thread_time()
+
+    try:
+        yield result
+    finally:
+        result.duration = time.perf_counter() - start
+        result.cpu = time.thread_time() - cpu
+        if before is not None:
+            result.received(before, object_stats(repo_path))
+        deactivate(token)
+
+
+class Summary:
+    """Totals of a sync run.
+
+    :param bool count_objects: Whether objects received are counted
+    """
+
+    def __init__(self, count_objects=True):
+        self.count_objects = count_objects
+        self.logger = logging.getLogger(__name__)
+        self.started = time.time()
+        self.outcomes = Counter()
+        self.actions = Counter()
+        self.phases = Counter()
+        self.bytes_received = 0
+        self.objects_received = 0
+        self.slowest = []
+
+    def add(self, result: SyncResult):
+        """Account for the result of a repository."""
+        self.outcomes['synced' if result.ok else 'failed'] += 1
+        self.actions[result.action or 'none'] += 1
+        self.phases.update(result.phases)
+        self.bytes_received += result.bytes_received
+        self.objects_received += result.objects_received
+
+        entry = (result.duration, result.name)
+        if len(self.slowest) < SLOWEST:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def to_dict(self) -> dict:
+        """Get the summary as a JSON serializable dict."""
+        return {
+            'started': self.started,
+            'duration': round(time.time() - self.started, 3),
+            'synced': self.outcomes['synced'],
+            'failed': self.outcomes['failed'],
+            'actions': dict(self.actions),
+            'phases': {
+                name: round(seconds, 3)
+                for name, seconds in self.phases.items()
+            },
+            'bytes_received': self.bytes_received,
+            'objects_received': self.objects_received,
+            'slowest': [
+                {'repo': name, 'duration': round(duration, 3)}
+                for duration, name in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def log(self):
+        """Log the summary."""
+        if not self.outcomes:
+            return
+
+        if self.count_objects:
+            self.logger.info(
+                'Synced %s repos, %s failed, received %s objects (%.1f MiB)',
+                self.outcomes['synced'],
+                self.outcomes['failed'],
+                self.objects_received,
+                self.bytes_received / 1024 ** 2,
+            )
+        else:
+            self.logger.info(
+                'Synced %s repos, %s failed',
+                self.outcomes['synced'],
+                self.outcomes['failed'],
+            )
+        for duration, name in sorted(self.slowest, reverse=True):
+            self.logger.debug('Slow repo %s: %.1fs', name, duration)
+
+
+class Report:
+    """A report file of a sync run.
+
+    A ``.json`` file gets a single document with the summary and every
+    result, written at the end of the run. Any other file gets a JSON line
+    per result as soon as it is known, followed by a summary line (NDJSON),
+    so that a report of an interrupted run is still usable.
+
+    :param str path: Path to the report file
+    :raises Error: If the file cannot be written
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ndjson = not path.lower().endswith('.json')
+        self._results = []
+        try:
+            # pylint: disable=consider-using-with
+            self._file = open(path, 'w', encoding='utf-8')
+        except OSError as error:
+            raise Error(
+                f'Unable to write report to {path}: {error}'
+            ) from error
+
+    def add(self, result: SyncResult):
+        """Add the result of a repository."""
+        if self.ndjson:
+            self._file.write(json.dumps(result.to_dict()) + '\n')
+            self._file.flush()
+        else:
+            self._results.append(result.to_dict())
+
+    def close(self, summary: Summary):
+        """Write the summary and close the file."""
+        try:
+            if self.ndjson:
+                self._file.write(
+                    json.dumps({'summary': summary.to_dict()}) + '\n')
+            else:
+                json.dump(
+                    {'summary': summary.to_dict(), 'repos': self._results},
+                    self._file,
+                    indent=2,
+                )
+        finally:
+            self._file.close()
@@ -0,0 +1,109 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Local sync state used to skip repositories that did not change."""
+
+import json
+import logging
+import os
+import tempfile
+
+from .models import Repository
+
+STATE_FILE = '.gstore-state.json'
+
+
+class State:
+    """Upstream timestamps of the repositories synced so far.
+
+    The state is kept as a JSON file in the base target directory and maps
+    ``org/repo`` keys to the ``pushed_at`` timestamp reported by the GitHub
+    API at the time of the last successful sync.
+
+    :param str path: Path to the state file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._data = {}
+
+    @classmethod
+    def load(cls, base_path: str):
+        """Load the state stored in the base target directory.
+
+        A missing or unreadable state file results in an empty state.
+
+        :param str base_path: Base target to sync repositories
+        :rtype: :class:`gstore.state.State`
+        """
+        state = cls(os.path.join(base_path, STATE_FILE))
+
+        try:
+            with open(state.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return state
+        except (OSError, ValueError) as error:
+            state.logger.warning(
+                'Unable to read sync state from %s: %s', state.path, error)
+            return state
+
+        if isinstance(data, dict):
+            state._data = data.get('repos', {})
+
+        return state
+
+    @staticmethod
+    def key(repo: Repository) -> str:
+        """Get the state key of a repository."""
+        return f'{repo.org.login}/{repo.name}'
+
+    def is_fresh(self, repo: Repository, base_path: str) -> bool:
+        """Check whether a local copy of a repository is up to date.
+
+        :param Repository repo: Repository to check
+        :param str base_path: Base target to sync repositories
+        :rtype: bool
+        """
+        if not repo.pushed_at:
+            return False
+
+        if self._data.get(self.key(repo)) != repo.pushed_at:
+            return False
+
+        return os.path.isdir(
+            os.path.join(base_path, repo.org.login, repo.name))
+
+    def update(self, repo: Repository):
+        """Record upstream timestamp of a successfully synced repository."""
+        if repo.pushed_at:
+            self._data[self.key(repo)] = repo.pushed_at
+
+    def save(self):
+        """Write the state to disk atomically."""
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'repos': self._data}, file, indent=2,
+                          sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            self.logger.error(
+                'Unable to write sync state to %s: %s', self.path, error)
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
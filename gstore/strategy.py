@@ -0,0 +1,156 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Partial and shallow clone strategies."""
+
+import fnmatch
+import re
+from dataclasses import dataclass, field
+
+from .models import Repository
+
+_FILTER_RE = re.compile(r'^(blob:none|blob:limit=\d+[kmg]?|tree:\d+)$')
+
+
+@dataclass(frozen=True)
+class CloneStrategy:
+    """How much of the history and objects of a repository to clone.
+
+    :param str filter: Partial clone filter spec, e.g. ``blob:none``
+    :param int depth: Number of commits to keep in a shallow clone
+    :param bool single_branch: Clone only the default branch
+    """
+
+    filter: str | None = None
+    depth: int | None = None
+    single_branch: bool = False
+
+    @property
+    def partial(self) -> bool:
+        """Whether only a part of the repository is cloned."""
+        return bool(self.filter or self.depth or self.single_branch)
+
+    def clone_options(self) -> list[str]:
+        """Get ``git clone`` options for the strategy."""
+        options = []
+
+        if self.filter:
+            options.append(f'--filter={self.filter}')
+        if self.depth:
+            options.append(f'--depth={self.depth}')
+        if self.single_branch:
+            options.append('--single-branch')
+
+        return options
+
+    def fetch_options(self) -> list[str]:
+        """Get ``git fetch`` options to keep the clone as it was made.
+
+        Git stores the filter of a partial clone in the remote config and
+        applies it on every fetch, so only the depth has to be repeated.
+        """
+        if self.depth:
+            return [f'--depth={self.depth}']
+
+        return []
+
+
+@dataclass(frozen=True)
+class CloneRule:
+    """A clone strategy for repositories matching a pattern.
+
+    :param str pattern: Shell-style pattern matched against ``org/repo``.
+        A pattern without a slash matches every repository of an
+        organization
+    :param CloneStrategy strategy: Strategy to use
+    """
+
+    pattern: str
+    strategy: CloneStrategy = field(default_factory=CloneStrategy)
+
+    def matches(self, repo: Repository) -> bool:
+        """Check whether the rule applies to a repository."""
+        pattern = self.pattern if '/' in self.pattern else f'{self.pattern}/*'
+        return fnmatch.fnmatch(f'{repo.org.login}/{repo.name}', pattern)
+
+
+def validate_filter(spec: str) -> str:
+    """Validate a partial clone filter spec.
+
+    :raises ValueError: If the filter is not supported
+    """
+    if not _FILTER_RE.match(spec):
+        raise ValueError(f'unsupported filter "{spec}"')
+
+    return spec
+
+
+def validate_depth(value) -> int:
+    """Validate a shallow clone depth.
+
+    :raises ValueError: If the depth is not a positive number
+    """
+    depth = int(value)
+    if depth < 1:
+        raise ValueError(f'depth must be positive, got {depth}')
+
+    return depth
+
+
+def parse_rule(value: str) -> CloneRule:
+    """Parse a clone rule given as ``PATTERN=OPTION[,OPTION...]``.
+
+    Supported options are ``filter=SPEC``, ``depth=N``, ``single-branch``
+    and ``full``, the latter stands for a regular clone.
+
+    :raises ValueError: If the rule is malformed
+    """
+    pattern, sep, spec = value.partition('=')
+    if not sep or not pattern.strip() or not spec.strip():
+        raise ValueError(f'expected PATTERN=OPTIONS, got "{value}"')
+
+    options = {}
+    for option in spec.split(','):
+        name, _, arg = option.strip().partition('=')
+        if name == 'filter':
+            options['filter'] = validate_filter(arg)
+        elif name == 'depth':
+            options['depth'] = validate_depth(arg)
+        elif name == 'single-branch' and not arg:
+            options['single_branch'] = True
+        elif name == 'full' and not arg:
+            options.clear()
+        else:
+            raise ValueError(f'unknown clone option "{option.strip()}"')
+
+    return CloneRule(pattern.strip(), CloneStrategy(**options))
+
+
+def select(
+        repo: Repository,
+        default: CloneStrategy,
+        rules: list[CloneRule] | tuple = (),
+) -> CloneStrategy:
+    """Select the strategy for a repository.
+
+    The first matching rule wins, the default strategy is used otherwise.
+
+    :rtype: CloneStrategy
+    """
+    for rule in rules:
+        if rule.matches(repo):
+            return rule.strategy
+
+    return default
@@ -0,0 +1,187 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Bandwidth and disk budgets shared by all workers of a sync run."""
+
+import contextlib
+import logging
+import multiprocessing
+import os
+import re
+import time
+
+from .models import Repository
+from .report import SyncResult, phase
+
+_RATE_RE = re.compile(r'^(\d+(?:\.\d+)?)([kmg]?)$', re.IGNORECASE)
+
+_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_rate(value: str) -> int:
+    """Parse a rate in bytes per second, e.g. ``512k`` or ``10M``.
+
+    :raises ValueError: If the rate is invalid
+    """
+    match = _RATE_RE.match(value.strip())
+    rate = int(float(match.group(1)) * _UNITS[match.group(2).lower()]) \
+        if match else 0
+
+    if rate < 1:
+        raise ValueError(
+            f'Invalid rate "{value}", expected bytes per second '
+            'with an optional k, M or G suffix'
+        )
+
+    return rate
+
+
+class TokenBucket:
+    """A token bucket shared by worker processes and threads.
+
+    Git cannot be slowed down in the middle of a transfer, so the bucket
+    runs into debt: an operation reserves an estimate of its bytes before
+    it starts, the difference to what it actually took is settled once it
+    finishes, and the next operations wait until the debt is paid off.
+    This keeps the average rate within the limit, with bursts of a single
+    operation.
+
+    :param int rate: Bytes per second
+    """
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        # Available tokens and time of the last refill. The monotonic
+        # clock is system-wide, so processes can share the timestamp.
+        self._state = multiprocessing.Array('d', [rate, time.monotonic()])
+
+    def _refill(self):
+        now = time.monotonic()
+        tokens, last = self._state[0], self._state[1]
+        self._state[0] = min(self.rate, tokens + (now - last) * self.rate)
+        self._state[1] = now
+
+    def consume(self, amount: int):
+        """Take tokens for bytes transferred or written.
+
+        A negative amount gives back tokens reserved in excess.
+        """
+        with self._state.get_lock():
+            self._refill()
+            self._state[0] = min(self.rate, self._state[0] - amount)
+
+    def delay(self) -> float:
+        """Get seconds to wait until the debt is paid off."""
+        with self._state.get_lock():
+            self._refill()
+            return max(0.0, -self._state[0] / self.rate)
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(OSError):
+                total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def estimate(repo: Repository, action: str | None) -> int:
+    """Guess the bytes an action on a repository is going to take.
+
+    A clone takes about the size GitHub reports for the repository. What
+    a fetch brings in is not known in advance, so it is charged only once
+    measured.
+    """
+    # GitHub reports sizes in KiB
+    return repo.size * 1024 if action == 'clone' else 0
+
+
+class Budget:
+    """Bandwidth and disk write limits of a sync run.
+
+    Both bytes received by git and bytes written are estimated from the
+    growth of the object database. The working tree is left out, walking
+    it would cost more than most fetches.
+
+    :param int bandwidth: Bytes per second received from remotes
+    :param int disk: Bytes per second written to the target directory
+    """
+
+    def __init__(self, bandwidth: int | None = None, disk: int | None = None):
+        self.bandwidth = TokenBucket(bandwidth) if bandwidth else None
+        self.disk = TokenBucket(disk) if disk else None
+        self.logger = logging.getLogger(__name__)
+
+    def _buckets(self):
+        return [bucket for bucket in (self.bandwidth, self.disk) if bucket]
+
+    def delay(self) -> float:
+        """Get seconds to wait before the next operation."""
+        return max([bucket.delay() for bucket in self._buckets()], default=0)
+
+    def wait(self):
+        """Block until the next operation fits in the budget."""
+        delay = self.delay()
+        while delay > 0:
+            self.logger.debug('Throttle for %.1fs', delay)
+            time.sleep(delay)
+            delay = self.delay()
+
+    def usage(self, path: str) -> int:
+        """Get the size of the object database of a repository."""
+        if not self._buckets():
+            return 0
+
+        objects = os.path.join(path, '.git', 'objects')
+        if not os.path.isdir(objects):
+            # Bare repository
+            objects = os.path.join(path, 'objects')
+
+        return _tree_size(objects)
+
+    def reserve(self, amount: int):
+        """Take an estimate of an operation before it starts."""
+        for bucket in self._buckets():
+            bucket.consume(amount)
+
+    def settle(self, reserved: int, before: int, after: int) -> int:
+        """Charge the growth of a repository between two :meth:`usage`
+        calls, less what was reserved for it.
+
+        :return: The growth in bytes
+        """
+        growth = max(0, after - before)
+        for bucket in self._buckets():
+            bucket.consume(growth - reserved)
+        return growth
+
+    @contextlib.contextmanager
+    def track(self, path: str, result: SyncResult):
+        """Wait for the budget and reserve an estimate, then settle what
+        the block actually downloaded and wrote to a repository.
+
+        :param SyncResult result: Result of the action performed in the
+            block, its ``growth`` is set to the measured bytes
+        """
+        with phase('throttle'):
+            self.wait()
+        reserved = estimate(result.repo, result.action)
+        self.reserve(reserved)
+        before = self.usage(path)
+        try:
+            yield
+        finally:
+            result.growth = self.settle(reserved, before, self.usage(path))
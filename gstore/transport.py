@@ -0,0 +1,281 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Transport settings for git operations."""
+
+import contextlib
+import contextvars
+import glob
+import logging
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from .models import Repository
+
+TRANSPORT_SSH = 'ssh'
+TRANSPORT_HTTPS = 'https'
+TRANSPORTS = (TRANSPORT_SSH, TRANSPORT_HTTPS)
+
+DEFAULT_GIT_HOST = 'github.com'
+
+# Environment variable passing the token to the credential helper, so that
+# it never shows up in command lines or repository config.
+TOKEN_VARIABLE = 'GSTORE_GIT_TOKEN'
+
+CREDENTIAL_HELPER = (
+    '!f() { test "$1" = get || exit 0; '
+    'echo username=x-access-token; '
+    f'echo "password=${TOKEN_VARIABLE}"; '
+    '}; f'
+)
+
+# Number of git operations sharing a single SSH connection.
+SESSIONS_PER_CONNECTION = 8
+
+# Seconds an idle SSH connection is kept open.
+CONTROL_PERSIST = 60
+
+# Longest path of a Unix socket (sun_path is 104 bytes on macOS and BSD,
+# 108 on Linux).
+CONTROL_PATH_MAX = 104
+
+# Directory of the sockets, short so that their paths fit in the limit.
+CONTROL_BASE = '/tmp'
+
+# Length of the %C hash, plus the random suffix ssh appends to a socket
+# path while creating it.
+_CONTROL_NAME_EXTRA = 40 + len('.0123456789abcdef')
+
+# SSH command of the connection slot of a worker thread or asyncio task,
+# which cannot have an environment of their own.
+_ssh_command = contextvars.ContextVar('ssh_command', default=None)
+
+
+def git_environ() -> dict:
+    """Get environment variables for git commands of the current worker.
+
+    Variables of a worker process are set in its environment, so this is
+    only needed by worker threads and asyncio tasks.
+    """
+    command = _ssh_command.get()
+    if command is None:
+        return {}
+
+    return {'GIT_SSH_COMMAND': command}
+
+
+def git_host(api_host: str | None) -> str:
+    """Get the git host serving repositories of a GitHub API host.
+
+    ``api.github.com`` is served by ``github.com``, and GitHub Enterprise
+    hosts like ``ghe.example.com/api/v3`` by ``ghe.example.com``.
+    """
+    if not api_host:
+        return DEFAULT_GIT_HOST
+
+    host = api_host.split('://')[-1].split('/')[0]
+    if host.startswith('api.'):
+        host = host[len('api.'):]
+
+    return host
+
+
+class Transport:
+    """How git talks to the remote repositories.
+
+    Over HTTPS the token is handed to git by a credential helper defined
+    through ``GIT_CONFIG_*`` environment variables (git 2.31 or newer), so
+    the user config and the repository config are left untouched.
+
+    :param str kind: Transport, one of :data:`TRANSPORTS`
+    :param str host: Git host serving the repositories
+    :param str token: Token to authenticate HTTPS requests
+    """
+
+    def __init__(self, kind=TRANSPORT_SSH, host=DEFAULT_GIT_HOST, token=None):
+        self.kind = kind
+        self.host = host or DEFAULT_GIT_HOST
+        self.token = token
+
+    def url(self, repo: Repository) -> str:
+        """Get URL of a remote repository."""
+        if self.kind == TRANSPORT_HTTPS:
+            return f'https://{self.host}/{repo.org.login}/{repo.name}.git'
+
+        return f'git@{self.host}:{repo.org.login}/{repo.name}.git'
+
+    def environ(self) -> dict:
+        """Get environment variables git needs for the transport."""
+        if self.kind != TRANSPORT_HTTPS or not self.token:
+            return {}
+
+        config = [
+            # An empty value drops helpers configured by the user.
+            (f'credential.https://{self.host}.helper', ''),
+            (f'credential.https://{self.host}.helper', CREDENTIAL_HELPER),
+            # Reuse connections and multiplex requests where possible.
+            ('http.version', 'HTTP/2'),
+        ]
+
+        environ = {TOKEN_VARIABLE: self.token}
+        environ['GIT_CONFIG_COUNT'] = str(len(config))
+        for index, (key, value) in enumerate(config):
+            environ[f'GIT_CONFIG_KEY_{index}'] = key
+            environ[f'GIT_CONFIG_VALUE_{index}'] = value
+
+        return environ
+
+
+@contextlib.contextmanager
+def environment(variables: dict):
+    """Set environment variables for the duration of the context."""
+    saved = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class SSHMultiplexer:
+    """Shared SSH connections for git operations of all workers.
+
+    Git is told to run ``ssh`` with ``ControlMaster``, so the first
+    operation of a worker opens a connection and the following ones reuse
+    it instead of doing a new handshake. Workers are spread over several
+    connections to stay within the number of sessions a server allows per
+    connection.
+
+    Use it as a context manager in the main process, and call
+    :meth:`apply` in every worker process, or :meth:`assign` in every worker
+    thread or asyncio task. The latter share the environment of the main
+    process, so their git commands have to be run with :func:`git_environ`.
+
+    :param int jobs: Number of workers running git operations
+    """
+
+    def __init__(self, jobs=1):
+        self.connections = max(1, math.ceil(jobs / SESSIONS_PER_CONNECTION))
+        self.control_dir = None
+        self.logger = logging.getLogger(__name__)
+        self._user_command = os.environ.get('GIT_SSH_COMMAND')
+        self._lock = threading.Lock()
+        self._next_slot = 0
+
+    def command(self, slot=0) -> str:
+        """Get the SSH command for a connection slot.
+
+        Options of a ``GIT_SSH_COMMAND`` set by the user are kept.
+        """
+        base = self._user_command or 'ssh'
+        control_path = os.path.join(self.control_dir, f'{slot}-%C')
+
+        return (
+            f'{base} -o ControlMaster=auto'
+            f' -o "ControlPath={control_path}"'
+            f' -o ControlPersist={CONTROL_PERSIST}'
+        )
+
+    def apply(self):
+        """Make git operations of this process use a shared connection."""
+        if self.control_dir is None:
+            return
+
+        slot = os.getpid() % self.connections
+        os.environ['GIT_SSH_COMMAND'] = self.command(slot)
+
+    def assign(self):
+        """Make git operations of this thread or task use a shared
+        connection.
+
+        Slots are handed out in turn, so workers are spread evenly over the
+        connections.
+        """
+        if self.control_dir is None:
+            return
+
+        with self._lock:
+            slot = self._next_slot % self.connections
+            self._next_slot += 1
+
+        _ssh_command.set(self.command(slot))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if os.name == 'nt':
+            self.logger.warning(
+                'SSH connection multiplexing is not supported on Windows')
+            return self
+
+        base = CONTROL_BASE if os.path.isdir(CONTROL_BASE) else None
+        self.control_dir = tempfile.mkdtemp(prefix='gs-', dir=base)
+
+        longest = os.path.join(
+            self.control_dir, f'{self.connections - 1}-')
+        if len(longest.encode()) + _CONTROL_NAME_EXTRA > CONTROL_PATH_MAX:
+            self.logger.warning(
+                'Path of SSH control sockets in %s would be too long, '
+                'connections are not shared',
+                self.control_dir,
+            )
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+            self.control_dir = None
+            return self
+
+        os.environ['GIT_SSH_COMMAND'] = self.command()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.control_dir is None:
+            return
+
+        if self._user_command is None:
+            os.environ.pop('GIT_SSH_COMMAND', None)
+        else:
+            os.environ['GIT_SSH_COMMAND'] = self._user_command
+
+        for socket in glob.glob(os.path.join(self.control_dir, '*')):
+            self.logger.debug('Close SSH connection %s', socket)
+            command = ['ssh', '-O', 'exit', '-o', f'ControlPath={socket}']
+            try:
+                subprocess.run(
+                    [*command, 'git'],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    check=False,
+                )
+            except OSError as error:
+                self.logger.debug('Unable to close %s: %s', socket, error)
+
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+        self.control_dir = None
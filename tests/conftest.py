@@ -13,14 +13,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this file.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
+from datetime import datetime, timezone
 from unittest.mock import MagicMock
 
+import git
 import pytest
 from github import Github
 from github.GithubException import UnknownObjectException
 
 from gstore.client import Client
-from gstore.repo import Context, Organization, Repository
+from gstore.models import Organization, Repository
+from gstore.repo import Context
 
 
 class MicroMock:
@@ -34,7 +38,14 @@ class MicroMock:
 class MockOrganization:
     @staticmethod
     def get_repo(name):
-        return MicroMock(name=name)
+        return MicroMock(
+            name=name,
+            size=0,
+            pushed_at=None,
+            updated_at=None,
+            default_branch='main',
+            archived=False,
+        )
 
     @staticmethod
     def get_repos(*args, **kwargs):
@@ -110,7 +121,24 @@ def mock_repos_iter(monkeypatch):
     """MicroMock.__iter__() mocked to return fake list of repositories."""
     def mock_get_repos(*args, **kwargs):
         return iter(
-            [MicroMock(name='repo1'), MicroMock(name='repo2')]
+            [
+                MicroMock(
+                    name='repo1',
+                    size=512,
+                    pushed_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    updated_at=None,
+                    default_branch='main',
+                    archived=False,
+                ),
+                MicroMock(
+                    name='repo2',
+                    size=1024,
+                    pushed_at=None,
+                    updated_at=None,
+                    default_branch='master',
+                    archived=True,
+                ),
+            ]
         )
 
     monkeypatch.setattr(
@@ -161,3 +189,22 @@ def repository(organization):
 def test_context(tmpdir):
     context = Context(base_path=tmpdir, logger=MagicMock())
     return context
+
+
+@pytest.fixture
+def upstream(mocker, tmpdir):
+    """Return a local repository with a single commit to sync from."""
+    path = str(tmpdir.join('upstream'))
+    repo = git.Repo.init(path, mkdir=True)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'gstore')
+        config.set_value('user', 'email', 'gstore@example.com')
+    with open(os.path.join(path, 'README'), 'w', encoding='utf-8') as file:
+        file.write('gstore\n')
+    repo.index.add(['README'])
+    repo.index.commit('Initial commit')
+
+    # Local clones hardlink objects unless the URL is given.
+    mocker.patch(
+        'gstore.transport.Transport.url', return_value=f'file://{path}')
+    return repo
@@ -0,0 +1,150 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+
+import pytest
+
+from gstore.adaptive import JOBS_AUTO, AdaptiveLimit, parse_jobs
+from gstore.models import Organization, Repository
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _window(limit, clock, duration=1.0, size=99, ok=True, growth=None):
+    org = Organization('acme')
+    repos = [
+        Repository(f'repo{i}', org, size=size) for i in range(limit.limit)
+    ]
+    for repo in repos:
+        assert limit.acquire(repo)
+    clock.now += duration
+    for repo in repos:
+        limit.release(repo, ok, growth)
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [('auto', JOBS_AUTO), ('8', 8), ('0', 0)],
+)
+def test_parse_jobs(value, expected):
+    assert parse_jobs(value) == expected
+
+
+@pytest.mark.parametrize('value', ['-1', 'many', ''])
+def test_parse_jobs_invalid(value):
+    with pytest.raises(ValueError, match='Invalid number of jobs'):
+        parse_jobs(value)
+
+
+def test_bounds():
+    assert AdaptiveLimit(100, maximum=8).limit == 8
+    assert AdaptiveLimit(0, maximum=8).limit == 1
+
+
+def test_additive_increase():
+    clock = Clock()
+    limit = AdaptiveLimit(4, maximum=6, clock=clock)
+
+    _window(limit, clock)
+    assert limit.limit == 5
+    _window(limit, clock)
+    assert limit.limit == 6
+    _window(limit, clock)
+    assert limit.limit == 6
+
+
+def test_decrease_on_failures():
+    clock = Clock()
+    limit = AdaptiveLimit(8, clock=clock)
+
+    _window(limit, clock, ok=False)
+
+    assert limit.limit == 4
+
+
+def test_decrease_on_congestion():
+    clock = Clock()
+    limit = AdaptiveLimit(4, clock=clock)
+
+    _window(limit, clock, duration=1.0)
+    assert limit.limit == 5
+    # Same work per repository, but it takes much longer
+    _window(limit, clock, duration=4.0)
+
+    assert limit.limit == 2
+
+
+def test_slower_without_congestion():
+    clock = Clock()
+    limit = AdaptiveLimit(4, clock=clock)
+
+    _window(limit, clock, duration=1.0, size=99)
+    # Smaller repositories, so less throughput at the same latency
+    _window(limit, clock, duration=1.0, size=9)
+
+    assert limit.limit == 6
+
+
+def test_measured_growth():
+    clock = Clock()
+    limit = AdaptiveLimit(4, clock=clock)
+
+    _window(limit, clock, duration=1.0)
+    assert limit.limit == 5
+    # Reported sizes are unknown, but the measured growth keeps up
+    _window(limit, clock, duration=4.0, size=0, growth=4 * 99 * 1024)
+
+    assert limit.limit == 6
+
+
+def test_gate_blocks():
+    limit = AdaptiveLimit(2)
+    org = Organization('acme')
+    repos = [Repository(f'repo{i}', org) for i in range(3)]
+    gate = limit.gate(repos)
+
+    assert [next(gate), next(gate)] == repos[:2]
+    assert limit.in_flight == 2
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(next(gate)))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    limit.release(repos[0], True)
+    thread.join(1)
+    assert result == [repos[2]]
+
+
+def test_close():
+    limit = AdaptiveLimit(1)
+    org = Organization('acme')
+    gate = limit.gate([Repository('foo', org), Repository('bar', org)])
+    next(gate)
+
+    thread = threading.Thread(target=lambda: list(gate))
+    thread.start()
+    limit.close()
+    thread.join(1)
+
+    assert not thread.is_alive()
@@ -0,0 +1,87 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import git
+import pytest
+
+from gstore import backend
+from gstore.backend import (
+    BACKEND_LIBGIT2,
+    Backend,
+    BackendUnavailableError,
+    GitRepository,
+)
+from gstore.transport import TOKEN_VARIABLE
+
+
+@pytest.fixture
+def clone_path(upstream, tmpdir):
+    clone = str(tmpdir.join('clone'))
+    git.Repo.clone_from(f'file://{upstream.working_dir}', clone)
+    return clone
+
+
+def test_unknown_backend():
+    with pytest.raises(BackendUnavailableError):
+        Backend('svn')
+
+
+def test_libgit2_unavailable(monkeypatch):
+    monkeypatch.setattr(backend, 'pygit2', None)
+
+    with pytest.raises(BackendUnavailableError):
+        Backend(BACKEND_LIBGIT2)
+
+
+def test_open_invalid(tmpdir):
+    with pytest.raises(git.InvalidGitRepositoryError):
+        Backend().open(str(tmpdir))
+
+
+def test_git_repository(clone_path):
+    local_repo = Backend().open(clone_path)
+
+    assert isinstance(local_repo, GitRepository)
+    assert local_repo.has_heads()
+    local_repo.fetch([], all_remotes=True)
+    local_repo.pull([])
+
+
+def test_libgit2_repository(clone_path):
+    pytest.importorskip('pygit2')
+    local_repo = Backend(BACKEND_LIBGIT2).open(clone_path)
+
+    assert local_repo.has_heads()
+    local_repo.fetch([])
+
+
+def test_libgit2_credentials(monkeypatch):
+    pygit2 = pytest.importorskip('pygit2')
+    userpass = pygit2.enums.CredentialType.USERPASS_PLAINTEXT
+    ssh_key = pygit2.enums.CredentialType.SSH_KEY
+    url = 'https://github.com/acme/foo.git'
+
+    monkeypatch.setenv(TOKEN_VARIABLE, 'secret')
+    credentials = backend._credentials(url, None, userpass)
+    assert isinstance(credentials, pygit2.UserPass)
+    assert credentials.credential_tuple == ('x-access-token', 'secret')
+
+    credentials = backend._credentials(url, 'git', ssh_key)
+    assert isinstance(credentials, pygit2.KeypairFromAgent)
+
+    monkeypatch.delenv(TOKEN_VARIABLE)
+    credentials = backend._credentials(url, None, userpass)
+    assert not isinstance(credentials, pygit2.UserPass)
@@ -0,0 +1,79 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+from gstore.cache import ResponseCache
+
+
+def test_key_depends_on_parts():
+    """Cache keys are stable and depend on every request part."""
+    key = ResponseCache.key('scope', '/orgs/Acme/repos', {'page': 1})
+
+    assert key == ResponseCache.key('scope', '/orgs/Acme/repos', {'page': 1})
+    assert key != ResponseCache.key('scope', '/orgs/Acme/repos', {'page': 2})
+    assert key != ResponseCache.key('other', '/orgs/Acme/repos', {'page': 1})
+
+
+def test_put_and_get(tmpdir):
+    """Stored entries can be read back."""
+    cache = ResponseCache(str(tmpdir))
+    key = ResponseCache.key('/orgs/Acme')
+
+    assert cache.get(key) is None
+
+    cache.put(key, {'etag': 'W/"abc"'}, '{"login": "Acme"}')
+    entry = cache.get(key)
+
+    assert entry['headers'] == {'etag': 'W/"abc"'}
+    assert entry['body'] == '{"login": "Acme"}'
+
+
+def test_broken_entry(tmpdir):
+    """Broken entries are ignored."""
+    cache = ResponseCache(str(tmpdir))
+    key = ResponseCache.key('/orgs/Acme')
+
+    cache.put(key, {}, '')
+    with open(cache._path(key), 'w', encoding='utf-8') as file:
+        file.write('{')
+
+    assert cache.get(key) is None
+
+
+def test_is_fresh(tmpdir):
+    """Entries are fresh only within TTL."""
+    entry = {'stored_at': 0, 'headers': {}, 'body': ''}
+
+    assert not ResponseCache(str(tmpdir)).is_fresh(entry)
+    assert not ResponseCache(str(tmpdir), ttl=60).is_fresh(entry)
+
+    cache = ResponseCache(str(tmpdir), ttl=60)
+    cache.put('key', {}, '')
+    assert cache.is_fresh(cache.get('key'))
+
+
+def test_validators():
+    """Conditional request headers are built from response headers."""
+    entry = {
+        'headers': {
+            'etag': 'W/"abc"',
+            'last-modified': 'Mon, 01 Jan 2024 00:00:00 GMT',
+        },
+    }
+
+    assert ResponseCache.validators(entry) == {
+        'If-None-Match': 'W/"abc"',
+        'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+    }
+    assert ResponseCache.validators({'headers': {}}) == {}
@@ -13,18 +13,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this file.  If not, see <https://www.gnu.org/licenses/>.
 
+import asyncio
+import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from unittest import mock
 
 import pytest
 from github.GithubException import UnknownObjectException
+from github.Requester import Requester
 
+from gstore.cache import ResponseCache
 from gstore.client import (
     DEFAULT_HOST,
+    STREAM_BUFFER,
+    AsyncClient,
     Client,
     InvalidCredentialsError,
     ValidationError,
 )
+from gstore.metrics import Metrics
 from gstore.models import Organization, Repository
 
 
@@ -238,3 +247,362 @@ def test_get_repos(mock_organization, mock_repos_iter, client):
     assert isinstance(repos[1], Repository)
     assert repos[0].name == 'repo1'
     assert repos[1].name == 'repo2'
+    assert repos[0].size == 512
+    assert repos[1].size == 1024
+    assert repos[0].pushed_at == '2024-01-01T00:00:00+00:00'
+    assert repos[1].pushed_at is None
+    assert repos[0].default_branch == 'main'
+    assert repos[1].archived is True
+
+
+def test_async_resolve_orgs(mock_micro_organization, client):
+    """Call AsyncClient.resolve_orgs() resolves organizations concurrently
+    preserving the order of provided names.
+    """
+    discovery = AsyncClient(client, concurrency=2)
+    orgs = asyncio.run(discovery.resolve_orgs(['awesome', 'company', 'x']))
+
+    assert [org.login for org in orgs] == ['awesome', 'company', 'x']
+
+
+def test_async_discover(mock_micro_organization, client):
+    """Call AsyncClient.discover() lists repositories of every organization
+    and returns them as a flat list.
+    """
+    def mock_get_repos(org):
+        return [Repository(f'{org.login}-repo', org)]
+
+    discovery = AsyncClient(client)
+
+    with mock.patch.object(client, 'get_repos', mock_get_repos):
+        repos = asyncio.run(discovery.discover(['awesome', 'company']))
+
+    assert [repo.name for repo in repos] == ['awesome-repo', 'company-repo']
+    assert repos[1].org == Organization('company')
+
+
+def test_async_discover_resolve_repos(
+        mock_user, mock_orgs_iter, mock_organization, client):
+    """Call AsyncClient.discover() with repo patterns resolves repositories
+    within organizations of the user.
+    """
+    discovery = AsyncClient(client)
+    repos = asyncio.run(discovery.discover(repos=['company:foo']))
+
+    assert len(repos) == 1
+    assert repos[0].name == 'foo'
+    assert repos[0].org == Organization('company')
+
+
+def test_async_stream(mock_micro_organization, client):
+    """Call AsyncClient.stream() yields repositories of every organization
+    while they are being listed.
+    """
+    def mock_iter_repos(org):
+        yield Repository(f'{org.login}-1', org)
+        yield Repository(f'{org.login}-2', org)
+
+    discovery = AsyncClient(client)
+
+    with mock.patch.object(client, 'iter_repos', mock_iter_repos):
+        repos = list(discovery.stream(['awesome', 'company']))
+
+    assert sorted(repo.name for repo in repos) == [
+        'awesome-1', 'awesome-2', 'company-1', 'company-2']
+
+
+def test_async_stream_close(mock_micro_organization, client):
+    """Call AsyncClient.stream() stops listing repositories once the
+    iterator is closed.
+    """
+    listed = []
+
+    def mock_iter_repos(org):
+        for number in itertools.count():
+            listed.append(number)
+            yield Repository(f'{org.login}-{number}', org)
+
+    discovery = AsyncClient(client)
+
+    with mock.patch.object(client, 'iter_repos', mock_iter_repos):
+        stream = discovery.stream(['awesome'])
+        assert next(stream).name == 'awesome-0'
+        stream.close()
+
+    assert len(listed) <= STREAM_BUFFER + 2
+
+
+def test_async_stream_error(client):
+    """Call AsyncClient.stream() re-raises discovery errors."""
+    def mock_get_orgs():
+        raise InvalidCredentialsError()
+
+    discovery = AsyncClient(client)
+
+    with mock.patch.object(client, 'get_orgs', mock_get_orgs):
+        with pytest.raises(InvalidCredentialsError):
+            list(discovery.stream())
+
+
+def test_resolve_repos_reuses_organization(client, organization):
+    """Call Client.resolve_repos() requests the organization only once."""
+    def mock_get_repo(name):
+        return SimpleNamespace(
+            name=name, size=0, pushed_at=None, updated_at=None,
+            default_branch='main', archived=False)
+
+    github_org = mock.MagicMock()
+    github_org.get_repo.side_effect = mock_get_repo
+
+    with mock.patch.object(
+            client.github,
+            'get_organization',
+            return_value=github_org) as mock_get_organization:
+        repos = client.resolve_repos(['Acme:foo', 'Acme:bar'], organization)
+
+    assert [repo.name for repo in repos] == ['foo', 'bar']
+    mock_get_organization.assert_called_once_with('Acme')
+
+
+def test_resolve_repos_graphql(organization):
+    """Call Client.resolve_repos() with GraphQL enabled validates all
+    repositories with a single query.
+    """
+    client = Client('secret', graphql=True)
+    response = {
+        'data': {
+            'r0': {
+                'name': 'foo',
+                'diskUsage': 42,
+                'pushedAt': '2024-01-01T00:00:00Z',
+                'updatedAt': '2024-01-02T00:00:00Z',
+            },
+            'r1': None,
+        },
+        'errors': [{'type': 'NOT_FOUND', 'path': ['r1']}],
+    }
+
+    with mock.patch.object(
+            client.github.requester,
+            'requestJsonAndCheck',
+            return_value=({}, response)) as mock_request:
+        with mock.patch.object(client.logger, 'error') as mock_logger:
+            repos = client.resolve_repos(
+                ['Acme:foo', 'Acme:missing'], organization)
+
+    mock_request.assert_called_once()
+    variables = mock_request.call_args.kwargs['input']['variables']
+    assert variables == {'owner': 'Acme', 'r0': 'foo', 'r1': 'missing'}
+
+    assert repos == [
+        Repository('foo', organization, size=42,
+                   pushed_at='2024-01-01T00:00:00+00:00'),
+    ]
+    mock_logger.assert_called_once_with(
+        'Invalid repository name "%s"', 'missing')
+
+
+def test_resolve_repos_graphql_fallback(mock_organization, organization):
+    """Call Client.resolve_repos() falls back to REST API when GraphQL
+    query fails.
+    """
+    client = Client('secret', graphql=True)
+    response = {'data': None, 'errors': [{'type': 'FORBIDDEN'}]}
+
+    with mock.patch.object(
+            client.github.requester,
+            'requestJsonAndCheck',
+            return_value=({}, response)):
+        with mock.patch.object(client.logger, 'warning') as mock_logger:
+            repos = client.resolve_repos(['Acme:foo'], organization)
+
+    assert [repo.name for repo in repos] == ['foo']
+    mock_logger.assert_called_once()
+
+
+def test_get_repos_graphql(organization):
+    """Call Client.get_repos() with GraphQL enabled lists repositories page
+    by page following the cursor.
+    """
+    def page(names, cursor):
+        return {
+            'data': {
+                'organization': {
+                    'repositories': {
+                        'totalCount': 3,
+                        'pageInfo': {
+                            'hasNextPage': cursor is not None,
+                            'endCursor': cursor,
+                        },
+                        'nodes': [
+                            {
+                                'name': name,
+                                'diskUsage': 1,
+                                'pushedAt': None,
+                                'updatedAt': '2024-01-01T00:00:00Z',
+                                'isArchived': False,
+                                'defaultBranchRef': {'name': 'main'},
+                            }
+                            for name in names
+                        ],
+                    }
+                }
+            }
+        }
+
+    client = Client('secret', graphql=True)
+    responses = [({}, page(['a', 'b'], 'c1')), ({}, page(['c'], None))]
+
+    with mock.patch.object(
+            client.github.requester,
+            'requestJsonAndCheck',
+            side_effect=responses) as mock_request:
+        repos = client.get_repos(organization)
+
+    assert [repo.name for repo in repos] == ['a', 'b', 'c']
+    assert repos[0].default_branch == 'main'
+    assert repos[0].pushed_at == '2024-01-01T00:00:00+00:00'
+    assert mock_request.call_count == 2
+    cursor = mock_request.call_args.kwargs['input']['variables']['cursor']
+    assert cursor == 'c1'
+
+
+def test_get_repos_graphql_fallback(
+        mock_organization, mock_repos_iter, organization):
+    """Call Client.get_repos() falls back to REST API when GraphQL listing
+    fails.
+    """
+    client = Client('secret', graphql=True)
+    response = {'data': {'organization': None},
+                'errors': [{'type': 'FORBIDDEN'}]}
+
+    with mock.patch.object(
+            client.github.requester,
+            'requestJsonAndCheck',
+            return_value=({}, response)):
+        repos = client.get_repos(organization)
+
+    assert [repo.name for repo in repos] == ['repo1', 'repo2']
+
+
+def test_request_without_cache(client):
+    """API requests are passed through when cache is disabled."""
+    send = mock.MagicMock(return_value=(200, {}, '{}'))
+
+    assert client._request(send, 'GET', '/orgs/Acme') == (200, {}, '{}')
+    send.assert_called_once_with('GET', '/orgs/Acme', None, None)
+
+
+def test_request_cache_revalidation(tmpdir):
+    """Cached responses are revalidated with conditional requests and
+    reused when they are not modified.
+    """
+    client = Client('secret', cache=ResponseCache(str(tmpdir)))
+    body = '{"login": "Acme"}'
+    send = mock.MagicMock(return_value=(200, {'etag': 'W/"abc"'}, body))
+
+    assert client._request(send, 'GET', '/orgs/Acme') == (
+        200, {'etag': 'W/"abc"'}, body)
+
+    send.return_value = (304, {'x-ratelimit-remaining': '4999'}, '')
+    status, headers, cached = client._request(send, 'GET', '/orgs/Acme')
+
+    assert status == 200
+    assert cached == body
+    assert headers == {'etag': 'W/"abc"', 'x-ratelimit-remaining': '4999'}
+    send.assert_called_with(
+        'GET', '/orgs/Acme', None, {'If-None-Match': 'W/"abc"'})
+
+
+def test_request_cache_ttl(tmpdir):
+    """Cached responses are used without requests within TTL."""
+    client = Client('secret', cache=ResponseCache(str(tmpdir), ttl=60))
+    send = mock.MagicMock(return_value=(200, {}, '[]'))
+
+    client._request(send, 'GET', '/user/orgs', {'per_page': 100})
+    client._request(send, 'GET', '/user/orgs', {'per_page': 100})
+    client._request(send, 'POST', '/graphql', None, None, {'query': ''})
+
+    assert send.call_count == 2
+
+
+def test_github_per_thread():
+    """Threads do not share PyGithub connections, but share the hook."""
+    responses = []
+
+    def mock_request_json(self, verb, url, *args, **kwargs):
+        responses.append(url)
+        return 200, {}, '{"login": "Acme"}'
+
+    with mock.patch.object(Requester, 'requestJson', mock_request_json):
+        client = Client('secret')
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            github = executor.submit(lambda: client.github).result()
+            login = executor.submit(
+                lambda: client.github.get_organization('Acme').login)
+
+            assert login.result() == 'Acme'
+
+    assert github is not client.github
+    assert github.requester is not client.github.requester
+    assert client.github is client.github
+    assert responses == ['/orgs/Acme']
+
+
+def test_request_cache_hook(tmpdir):
+    """PyGithub requests go through the client cache."""
+    body = '{"login": "Acme"}'
+    responses = [(200, {'etag': 'W/"abc"'}, body), (304, {}, '')]
+
+    def mock_request_json(self, verb, url, *args, **kwargs):
+        return responses.pop(0)
+
+    with mock.patch.object(Requester, 'requestJson', mock_request_json):
+        client = Client('secret', cache=ResponseCache(str(tmpdir)))
+
+        assert client.github.get_organization('Acme').login == 'Acme'
+        assert client.github.get_organization('Acme').login == 'Acme'
+
+    assert not responses
+
+
+def test_request_rate_limit_retry():
+    """Rate limited API requests are retried after a pause."""
+    limiter = mock.MagicMock()
+    limiter.backoff.side_effect = [5.0, None]
+    client = Client('secret', rate_limiter=limiter)
+
+    send = mock.MagicMock(side_effect=[
+        (429, {'retry-after': '5'}, ''),
+        (200, {'x-ratelimit-remaining': '10'}, '{}'),
+    ])
+
+    with mock.patch.object(client.logger, 'warning') as mock_logger:
+        assert client._request(send, 'GET', '/user') == (
+            200, {'x-ratelimit-remaining': '10'}, '{}')
+
+    assert send.call_count == 2
+    assert limiter.acquire.call_count == 2
+    limiter.update.assert_called_with({'x-ratelimit-remaining': '10'})
+    mock_logger.assert_called_once_with(
+        'GitHub API rate limit exceeded, retry %s in %.1fs', 1, 5.0)
+
+
+def test_request_metrics(tmpdir):
+    """API requests sent to GitHub are accounted in metrics."""
+    metrics = Metrics()
+    client = Client(
+        'secret', cache=ResponseCache(str(tmpdir), ttl=60), metrics=metrics)
+    send = mock.MagicMock(return_value=(
+        200, {'x-ratelimit-limit': '5000', 'x-ratelimit-remaining': '4999'},
+        '{}'))
+
+    client._request(send, 'GET', '/orgs/Acme')
+    client._request(send, 'GET', '/orgs/Acme')
+
+    output = metrics.render()
+    assert 'gstore_api_requests_total{method="GET",status="200"} 1' \
+        in output
+    assert 'gstore_api_request_duration_seconds_count 1' in output
+    assert 'gstore_api_rate_limit 5000.0' in output
+    assert 'gstore_api_rate_limit_remaining 4999.0' in output
@@ -0,0 +1,214 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import git
+import pytest
+
+from gstore.engine import AsyncEngine
+from gstore.models import Organization, Repository
+from gstore.repo import MODE_FETCH_ONLY, Context, sync
+from gstore.throttle import Budget
+
+
+def _commit(repo, name):
+    with open(os.path.join(repo.working_dir, name), 'w',
+              encoding='utf-8') as file:
+        file.write(name)
+    repo.index.add([name])
+    repo.index.commit(f'Add {name}')
+
+
+def _run(engine, repos):
+    results = []
+    engine.sync(
+        repos, lambda result: results.append((result.repo.name, result.ok)))
+    return sorted(results)
+
+
+def test_clone(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(base_path=base_path, logger=mocker.MagicMock())
+    org = Organization('acme')
+    repos = [Repository(name, org) for name in ('foo', 'bar', 'baz')]
+
+    assert _run(AsyncEngine(ctx, 2, 1), repos) == \
+        [('bar', True), ('baz', True), ('foo', True)]
+
+    for name in ('foo', 'bar', 'baz'):
+        path = os.path.join(base_path, 'acme', name)
+        assert os.path.isfile(os.path.join(path, 'README'))
+        assert git.Repo(path).head.commit == upstream.head.commit
+        assert not git.Repo(path).is_dirty()
+
+
+def test_results(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(
+        base_path=base_path, logger=mocker.MagicMock(), count_objects=True)
+    results = []
+
+    AsyncEngine(ctx, 1).sync(
+        [Repository('foo', Organization('acme'))], results.append)
+
+    assert [(result.action, result.ok) for result in results] == \
+        [('clone', True)]
+    assert set(results[0].phases) == {'plan', 'network', 'disk'}
+    assert results[0].objects_received == 3
+
+
+def test_clone_mirror(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(base_path=base_path, logger=mocker.MagicMock(), mirror=True)
+
+    repo = Repository('foo', Organization('acme'))
+
+    assert _run(AsyncEngine(ctx, 1), [repo]) == [('foo', True)]
+    assert git.Repo(os.path.join(base_path, 'acme', 'foo')).bare
+
+
+def test_update(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(base_path=base_path, logger=mocker.MagicMock())
+    repo = Repository('foo', Organization('acme'))
+    engine = AsyncEngine(ctx, 1)
+
+    _run(engine, [repo])
+    _commit(upstream, 'CHANGES')
+
+    assert _run(engine, [repo]) == [('foo', True)]
+    path = os.path.join(base_path, 'acme', 'foo')
+    assert git.Repo(path).head.commit == upstream.head.commit
+    assert os.path.isfile(os.path.join(path, 'CHANGES'))
+
+
+def test_update_fetch_only(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(
+        base_path=base_path, logger=mocker.MagicMock(), mode=MODE_FETCH_ONLY)
+    repo = Repository('foo', Organization('acme'))
+    engine = AsyncEngine(ctx, 1)
+
+    _run(engine, [repo])
+    first = upstream.head.commit
+    _commit(upstream, 'CHANGES')
+
+    assert _run(engine, [repo]) == [('foo', True)]
+    local_repo = git.Repo(os.path.join(base_path, 'acme', 'foo'))
+    assert local_repo.head.commit == first
+    assert local_repo.remotes.origin.refs[0].commit == upstream.head.commit
+
+
+def test_clone_failed(mocker, tmpdir):
+    mocker.patch(
+        'gstore.transport.Transport.url',
+        return_value=f'file://{tmpdir.join("missing")}')
+    logger = mocker.MagicMock()
+    ctx = Context(base_path=str(tmpdir.join('base')), logger=logger)
+
+    repo = Repository('foo', Organization('acme'))
+
+    assert _run(AsyncEngine(ctx, 1), [repo]) == [('foo', False)]
+    logger.error.assert_any_call('Failed to clone %s/%s', 'acme', 'foo')
+
+
+def test_limits(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(base_path=base_path, logger=mocker.MagicMock())
+    engine = AsyncEngine(ctx, 2, 1)
+    running = {'network': 0, 'disk': 0}
+    peak = {'network': 0, 'disk': 0}
+    git_command = AsyncEngine._git
+
+    async def track(self, semaphore, *args, cwd=None):
+        kind = 'network' if semaphore is self._network else 'disk'
+        async with semaphore:
+            running[kind] += 1
+            peak[kind] = max(peak[kind], running[kind])
+            try:
+                await git_command(self, _Unlimited(), *args, cwd=cwd)
+            finally:
+                running[kind] -= 1
+
+    mocker.patch.object(AsyncEngine, '_git', track)
+    org = Organization('acme')
+
+    _run(engine, [Repository(f'repo{i}', org) for i in range(6)])
+
+    assert 1 <= peak['network'] <= 2
+    assert peak['disk'] == 1
+
+
+class _Unlimited:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def test_throttle(mocker, upstream, tmpdir):
+    budget = Budget(bandwidth=1, disk=1)
+    ctx = Context(
+        base_path=str(tmpdir.join('base')),
+        logger=mocker.MagicMock(),
+        budget=budget,
+    )
+    repo = Repository('foo', Organization('acme'))
+
+    assert _run(AsyncEngine(ctx, 1), [repo]) == [('foo', True)]
+    assert budget.disk.delay() > budget.bandwidth.delay() > 0
+
+
+def test_sync_async(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    org = Organization('acme')
+    repos = [Repository(name, org) for name in ('foo', 'bar')]
+
+    sync(repos, base_path, jobs=2, executor='async', disk_jobs=1)
+
+    for name in ('foo', 'bar'):
+        assert os.path.isfile(os.path.join(base_path, 'acme', name, 'README'))
+
+
+def test_errors(mocker, upstream, tmpdir):
+    base_path = str(tmpdir.join('base'))
+    ctx = Context(base_path=base_path, logger=mocker.MagicMock())
+    results = []
+
+    def mock_plan(repo, _ctx):
+        if repo.name == 'repo3':
+            raise PermissionError('denied')
+        return 'clone'
+
+    mocker.patch('gstore.repo.plan', side_effect=mock_plan)
+    org = Organization('acme')
+
+    with pytest.raises(PermissionError, match='denied'):
+        AsyncEngine(ctx, 2).sync(
+            [Repository(f'repo{i}', org) for i in range(10)], results.append)
+
+    assert 'repo3' not in [result.repo.name for result in results]
+
+
+def test_sync_async_auto_jobs_error(mocker, tmpdir):
+    mocker.patch('multiprocessing.cpu_count', return_value=1)
+    mocker.patch('gstore.repo.plan', side_effect=OSError('disk full'))
+    org = Organization('acme')
+    repos = [Repository(f'repo{i}', org) for i in range(5)]
+
+    with pytest.raises(OSError, match='disk full'):
+        sync(repos, str(tmpdir.join('base')), jobs='auto', executor='async')
@@ -0,0 +1,124 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import urllib.request
+
+import pytest
+
+from gstore.exceptions import Error
+from gstore.metrics import Metrics, MetricsServer
+from gstore.models import Organization, Repository
+from gstore.report import SyncResult
+
+
+def _result(name, action, ok, duration):
+    result = SyncResult(Repository(name, Organization('acme')), action, ok)
+    result.duration = duration
+    result.phases = {'network': duration}
+    result.bytes_received = 2048
+    result.objects_received = 3
+    return result
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics()
+    metrics.observe_result(_result('foo', 'clone', True, 0.5))
+    metrics.observe_result(_result('bar', 'fetch', True, 3.0))
+    metrics.observe_result(_result('baz', 'fetch', False, 0.25))
+    metrics.observe_request('GET', 200, 0.3, 5000.0, 4990.0)
+    return metrics
+
+
+def test_render(metrics):
+    lines = metrics.render().splitlines()
+
+    assert '# TYPE gstore_repos_synced_total counter' in lines
+    assert 'gstore_repos_synced_total{action="clone"} 1' in lines
+    assert 'gstore_repos_synced_total{action="fetch"} 1' in lines
+    assert 'gstore_repos_failed_total{action="fetch"} 1' in lines
+    assert 'gstore_received_bytes_total 6144' in lines
+    assert 'gstore_received_objects_total 9' in lines
+    assert 'gstore_phase_seconds_total{phase="network"} 3.75' in lines
+    assert 'gstore_api_rate_limit_remaining 4990.0' in lines
+    assert '# EOF' not in lines
+
+
+def test_render_histogram(metrics):
+    lines = metrics.render().splitlines()
+
+    assert '# TYPE gstore_sync_duration_seconds histogram' in lines
+    assert 'gstore_sync_duration_seconds_bucket{action="fetch",le="0.5"} 1' \
+        in lines
+    assert 'gstore_sync_duration_seconds_bucket{action="fetch",le="2.5"} 1' \
+        in lines
+    assert 'gstore_sync_duration_seconds_bucket{action="fetch",le="5"} 2' \
+        in lines
+    assert 'gstore_sync_duration_seconds_bucket{action="fetch",le="+Inf"} 2' \
+        in lines
+    assert 'gstore_sync_duration_seconds_count{action="fetch"} 2' in lines
+    assert 'gstore_sync_duration_seconds_sum{action="fetch"} 3.25' in lines
+
+
+def test_render_openmetrics(metrics):
+    lines = metrics.render(openmetrics=True).splitlines()
+
+    assert '# TYPE gstore_repos_synced counter' in lines
+    assert 'gstore_repos_synced_total{action="clone"} 1' in lines
+    assert lines[-1] == '# EOF'
+
+
+def test_render_escape():
+    metrics = Metrics()
+    metrics.observe_request('GET "x"\n', 200, 0.1)
+
+    assert '{method="GET \\"x\\"\\n",status="200"} 1' in metrics.render()
+
+
+def test_write_textfile(metrics, tmpdir):
+    path = str(tmpdir.join('gstore.prom'))
+    metrics.finish()
+
+    metrics.write_textfile(path)
+
+    with open(path, encoding='utf-8') as file:
+        content = file.read()
+
+    assert 'gstore_run_duration_seconds ' in content
+    assert os.listdir(str(tmpdir)) == ['gstore.prom']
+
+
+def test_server(metrics):
+    with MetricsServer(metrics, 0) as server:
+        host, port = server.address
+        url = f'http://{host}:{port}/metrics'
+
+        with urllib.request.urlopen(url) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert b'gstore_repos_synced_total' in response.read()
+
+        request = urllib.request.Request(
+            url, headers={'Accept': 'application/openmetrics-text'})
+        with urllib.request.urlopen(request) as response:
+            assert response.headers['Content-Type'].startswith(
+                'application/openmetrics-text')
+            assert response.read().endswith(b'# EOF\n')
+
+
+def test_server_address_in_use(metrics):
+    with MetricsServer(metrics, 0) as server:
+        with pytest.raises(Error, match='Unable to serve metrics'):
+            MetricsServer(metrics, server.address[1])
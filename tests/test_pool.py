@@ -0,0 +1,52 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import git
+
+from gstore.models import Organization, Repository
+from gstore.pool import POOL_DIR, ObjectPool
+
+
+def test_path(tmpdir):
+    org = Organization('acme')
+    pool = ObjectPool(str(tmpdir))
+
+    assert pool.path(Repository('api', org)) == \
+        os.path.join(str(tmpdir), POOL_DIR, 'acme', 'api.git')
+    assert pool.path(Repository('api', org, parent='upstream/api')) == \
+        os.path.join(str(tmpdir), POOL_DIR, 'upstream', 'api.git')
+
+
+def test_update(tmpdir, upstream):
+    repo = Repository('api', Organization('acme'))
+    pool = ObjectPool(str(tmpdir.join('target')))
+
+    path = pool.update(repo, upstream.working_dir)
+
+    assert path == pool.path(repo)
+    pool_repo = git.Repo(path)
+    assert pool_repo.bare
+    assert pool_repo.git.rev_parse('refs/pool/acme/api/heads/' +
+                                   upstream.active_branch.name) == \
+        upstream.head.commit.hexsha
+
+
+def test_update_failure(tmpdir):
+    repo = Repository('api', Organization('acme'))
+    pool = ObjectPool(str(tmpdir))
+
+    assert pool.update(repo, str(tmpdir.join('missing'))) is None
@@ -0,0 +1,144 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import pstats
+
+from gstore import profiling
+from gstore.models import Organization, Repository
+from gstore.profiling import (
+    Profiler,
+    add_result,
+    collects_stats,
+    detach,
+    profiled,
+    span,
+)
+from gstore.repo import sync
+from gstore.report import SyncResult
+
+
+def _result():
+    result = SyncResult(Repository('foo', Organization('acme')), 'fetch', True)
+    result.duration = 2.0
+    result.cpu = 0.5
+    result.spans = [('network', result.started, 1.5, 0.25)]
+    return result
+
+
+def _work():
+    return sum(range(1000))
+
+
+def test_trace(tmpdir):
+    path = str(tmpdir.join('profile.json'))
+
+    with Profiler(path) as profiler:
+        assert not collects_stats()
+        with span('sync', repos=1):
+            add_result(_result())
+
+    assert profiling._active is None  # pylint: disable=protected-access
+    assert profiler.trace
+
+    with open(path, encoding='utf-8') as file:
+        events = json.load(file)['traceEvents']
+
+    by_name = {event['name']: event for event in events}
+    assert by_name['process_name']['ph'] == 'M'
+    assert by_name['sync']['cat'] == 'gstore'
+    assert by_name['sync']['args']['repos'] == 1
+    assert by_name['acme/foo']['cat'] == 'repo'
+    assert by_name['acme/foo']['dur'] == 2000000
+    assert by_name['acme/foo']['args']['cpu'] == 0.5
+    assert by_name['network']['cat'] == 'phase'
+    assert by_name['network']['dur'] == 1500000
+    assert by_name['network']['pid'] == by_name['acme/foo']['pid']
+
+
+def test_span_without_profiler():
+    with span('sync'):
+        pass
+
+    assert not collects_stats()
+
+
+def test_profiled():
+    result = _result()
+    with profiled(result, True):
+        _work()
+
+    assert any(name == '_work' for _, _, name in result.profile)
+
+    result = _result()
+    with profiled(result, False):
+        _work()
+
+    assert result.profile is None
+
+
+def test_stats_merge_workers(tmpdir):
+    path = str(tmpdir.join('gstore.prof'))
+    worker = _result()
+    with profiled(worker, True):
+        _work()
+
+    with Profiler(path):
+        assert collects_stats()
+        add_result(worker)
+
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    assert '_work' in functions
+
+
+def test_detach(tmpdir):
+    profiler = Profiler(str(tmpdir.join('gstore.prof')))
+    profiler.start()
+    detach()
+
+    assert profiling._active is None  # pylint: disable=protected-access
+    assert not collects_stats()
+
+    profiler.stop()
+    assert os.path.exists(profiler.path)
+
+
+def test_save_error(caplog, tmpdir):
+    path = str(tmpdir.join('missing', 'profile.json'))
+
+    with Profiler(path):
+        pass
+
+    assert f'Unable to write profile to {path}' in caplog.text
+
+
+def test_sync_trace(mocker, upstream, tmpdir):
+    mocker.patch('gstore.repo.setup_logger')
+    path = str(tmpdir.join('profile.json'))
+
+    with Profiler(path):
+        sync(
+            [Repository('foo', Organization('acme'))],
+            str(tmpdir.join('base')),
+            jobs=1,
+            executor='thread',
+        )
+
+    with open(path, encoding='utf-8') as file:
+        events = json.load(file)['traceEvents']
+
+    names = {event['name'] for event in events}
+    assert {'acme/foo', 'plan', 'network', 'start workers'} <= names
@@ -0,0 +1,107 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from gstore.ratelimit import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(reserve=10, clock=clock, sleep=clock.sleep)
+
+
+def test_no_delay_with_plenty_budget(limiter, clock):
+    """Requests are not delayed while most of the budget is left."""
+    limiter.update({
+        'x-ratelimit-limit': '5000',
+        'x-ratelimit-remaining': '4000',
+        'x-ratelimit-reset': '4600',
+    })
+
+    for _ in range(3):
+        limiter.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_spread_requests(limiter, clock):
+    """Requests are spread evenly when the budget is low."""
+    limiter.update({
+        'x-ratelimit-limit': '5000',
+        'x-ratelimit-remaining': '110',
+        'x-ratelimit-reset': '2000',
+    })
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert clock.sleeps == [pytest.approx(10.0)]
+
+
+def test_backoff_retry_after(limiter, clock):
+    """Retry-After header defines the pause for all requests."""
+    delay = limiter.backoff(403, {'retry-after': '60'}, '', 0)
+
+    assert delay == 60
+    limiter.acquire()
+    assert clock.sleeps == [60]
+
+
+def test_backoff_exhausted_budget(limiter):
+    """Primary rate limit pauses requests until the budget reset."""
+    headers = {'x-ratelimit-remaining': '0', 'x-ratelimit-reset': '1100'}
+
+    assert limiter.backoff(403, headers, '', 0) == 101
+
+
+def test_backoff_secondary_limit(limiter):
+    """Secondary rate limit without hints uses exponential backoff."""
+    body = '{"message": "You have exceeded a secondary rate limit"}'
+
+    assert 1 <= limiter.backoff(403, {}, body, 0) <= 1.5
+    assert 4 <= limiter.backoff(403, {}, body, 2) <= 6
+
+
+@pytest.mark.parametrize(
+    'status,body,attempt',
+    [
+        (200, '', 0),
+        (404, '', 0),
+        (403, '{"message": "Resource not accessible"}', 0),
+        (429, '', 5),
+    ]
+)
+def test_no_backoff(limiter, status, body, attempt):
+    """Requests which failed for other reasons are not retried."""
+    assert limiter.backoff(status, {}, body, attempt) is None
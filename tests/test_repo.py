@@ -13,13 +13,35 @@
 # You should have received a copy of the GNU General Public License
 # along with this file.  If not, see <https://www.gnu.org/licenses/>.
 
+import contextvars
+import json
 import logging
 import os
 from unittest.mock import MagicMock
 
+import git
+import pytest
 from git import GitCommandError
 
-from gstore.repo import _do_sync, clone, fetch, sync
+from gstore.backend import BACKEND_GIT, BACKEND_LIBGIT2, Backend
+from gstore.metrics import Metrics
+from gstore.models import Organization, Repository
+from gstore.repo import (
+    MODE_FETCH_ONLY,
+    _do_sync,
+    _init_process,
+    _map_ref,
+    clone,
+    fetch,
+    refs_unchanged,
+    repair,
+    sync,
+)
+from gstore.report import SyncResult
+from gstore.state import State
+from gstore.strategy import CloneStrategy, parse_rule
+from gstore.throttle import Budget
+from gstore.transport import SSHMultiplexer
 
 
 def test_clone_success(mocker, repository, test_context):
@@ -94,6 +116,109 @@ def test_fetch_success(mocker, repository, test_context):
     mock_local_repo.git.pull.assert_called_once_with(['--all', '--quiet'])
 
 
+def test_fetch_only(mocker, repository, test_context):
+    test_context.mode = MODE_FETCH_ONLY
+    mock_repo = mocker.patch('git.Repo')
+    mock_local_repo = MagicMock()
+    mock_repo.return_value = mock_local_repo
+    mock_local_repo.heads = ['master']
+
+    assert fetch(repository, test_context)
+
+    mock_local_repo.git.fetch.assert_called_once_with(
+        ['--all', '--prune', '--quiet'])
+    mock_local_repo.git.pull.assert_not_called()
+
+
+def test_clone_mirror(mocker, repository, test_context):
+    test_context.mirror = True
+    mock_clone_from = mocker.patch('git.Repo.clone_from')
+
+    assert clone(repository, test_context)
+
+    mock_clone_from.assert_called_once_with(
+        f'git@github.com:{repository.org.login}/{repository.name}.git',
+        os.path.join(
+            test_context.base_path, repository.org.login, repository.name),
+        mirror=True,
+    )
+
+
+def test_fetch_mirror(mocker, repository, test_context):
+    repo_path = os.path.join(
+        test_context.base_path, repository.org.login, repository.name)
+    os.makedirs(os.path.join(repo_path, 'objects'))
+    os.makedirs(os.path.join(repo_path, 'refs'))
+    open(os.path.join(repo_path, 'HEAD'), 'w').close()
+
+    mock_repo = mocker.patch('git.Repo')
+    mock_local_repo = MagicMock()
+    mock_repo.return_value = mock_local_repo
+    mock_local_repo.heads = ['master']
+
+    assert fetch(repository, test_context)
+
+    mock_local_repo.git.remote.assert_called_once_with(['update', '--prune'])
+    mock_local_repo.git.fetch.assert_not_called()
+    mock_local_repo.git.pull.assert_not_called()
+
+
+def test_clone_partial(mocker, repository, test_context):
+    test_context.rules = (
+        parse_rule(f'{repository.org.login}=filter=blob:none,depth=1'),
+    )
+    mock_clone_from = mocker.patch('git.Repo.clone_from')
+
+    assert clone(repository, test_context)
+
+    _, kwargs = mock_clone_from.call_args
+    assert kwargs == {'multi_options': ['--filter=blob:none', '--depth=1']}
+
+
+def test_fetch_shallow(mocker, repository, test_context):
+    test_context.strategy = CloneStrategy(depth=1)
+    mock_repo = mocker.patch('git.Repo')
+    mock_local_repo = MagicMock()
+    mock_repo.return_value = mock_local_repo
+    mock_local_repo.heads = ['master']
+
+    assert fetch(repository, test_context)
+
+    mock_local_repo.git.fetch.assert_called_once_with(
+        ['--prune', '--quiet', '--depth=1'])
+    mock_local_repo.git.pull.assert_called_once_with(
+        ['--all', '--quiet', '--depth=1'])
+
+
+def test_clone_object_pool(mocker, repository, test_context):
+    test_context.object_pool = True
+    mock_update = mocker.patch(
+        'gstore.pool.ObjectPool.update', return_value='/pool/acme/api.git')
+    mock_clone_from = mocker.patch('git.Repo.clone_from')
+
+    assert clone(repository, test_context)
+
+    mock_update.assert_called_once_with(
+        repository,
+        f'git@github.com:{repository.org.login}/{repository.name}.git',
+    )
+    _, kwargs = mock_clone_from.call_args
+    assert kwargs == {'reference': '/pool/acme/api.git'}
+
+
+def test_clone_partial_object_pool(mocker, repository, test_context):
+    test_context.object_pool = True
+    test_context.strategy = CloneStrategy(filter='blob:none')
+    mock_update = mocker.patch('gstore.pool.ObjectPool.update')
+    mock_clone_from = mocker.patch('git.Repo.clone_from')
+
+    assert clone(repository, test_context)
+
+    mock_update.assert_not_called()
+    _, kwargs = mock_clone_from.call_args
+    assert kwargs == {'multi_options': ['--filter=blob:none']}
+
+
 def test_fetch_failure(mocker, repository, test_context):
     mocker.patch('gstore.repo._proc_ctx', test_context)
     mock_repo = mocker.patch('git.Repo')
@@ -108,18 +233,203 @@ def test_fetch_failure(mocker, repository, test_context):
     test_context.logger.error.assert_called()
 
 
+def test_repair_corrupt_index(mocker, upstream, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(f'file://{upstream.working_dir}', repo_path)
+    with open(os.path.join(repo_path, '.git', 'index'), 'wb') as file:
+        file.write(b'garbage')
+    mock_clone = mocker.patch('gstore.repo.clone')
+
+    assert repair(repository, test_context)
+
+    mock_clone.assert_not_called()
+    local_repo = git.Repo(repo_path)
+    assert local_repo.head.commit == upstream.head.commit
+    assert not local_repo.is_dirty()
+
+
+def test_repair_remote_unreachable(mocker, upstream, repository,
+                                   test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(f'file://{upstream.working_dir}', repo_path)
+    with open(os.path.join(repo_path, '.git', 'index'), 'wb') as file:
+        file.write(b'garbage')
+    mocker.patch(
+        'gstore.transport.Transport.url', return_value='file:///nonexistent')
+    mock_clone = mocker.patch('gstore.repo.clone')
+
+    assert not repair(repository, test_context)
+
+    mock_clone.assert_not_called()
+    assert os.path.isdir(os.path.join(repo_path, '.git', 'objects'))
+
+
+def test_repair_auth_failure(mocker, upstream, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(f'file://{upstream.working_dir}', repo_path)
+    mocker.patch('gstore.repo._restore', side_effect=git.GitCommandError(
+        ['git', 'fetch'], 128,
+        "fatal: unable to read askpass response from '/usr/bin/askpass'"))
+    mock_clone = mocker.patch('gstore.repo.clone')
+
+    assert not repair(repository, test_context)
+
+    mock_clone.assert_not_called()
+    assert os.path.isdir(os.path.join(repo_path, '.git', 'objects'))
+
+
+def test_repair_missing_objects(mocker, upstream, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(f'file://{upstream.working_dir}', repo_path)
+    pack_dir = os.path.join(repo_path, '.git', 'objects', 'pack')
+    for name in os.listdir(pack_dir):
+        os.unlink(os.path.join(pack_dir, name))
+    mock_clone = mocker.patch('gstore.repo.clone')
+
+    assert fetch(repository, test_context)
+
+    mock_clone.assert_not_called()
+    local_repo = git.Repo(repo_path)
+    local_repo.git.fsck()
+    assert local_repo.head.commit == upstream.head.commit
+
+
+def test_do_sync_salvage(mocker, upstream, repository, test_context):
+    mocker.patch('gstore.repo._proc_ctx', test_context)
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(
+        f'file://{upstream.working_dir}', repo_path, mirror=True)
+    os.unlink(os.path.join(repo_path, 'HEAD'))
+    mock_clone = mocker.patch('gstore.repo.clone')
+
+    result = _do_sync(repository)
+
+    assert (result.action, result.ok) == ('repair', True)
+    mock_clone.assert_not_called()
+    assert git.Repo(repo_path).head.commit == upstream.head.commit
+
+
+def test_refs_unchanged(upstream, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(f'file://{upstream.working_dir}', repo_path)
+    upstream.create_tag('v1.0.0')
+
+    assert not refs_unchanged(repository, test_context)
+
+    git.Repo(repo_path).git.fetch(['--tags'])
+    assert refs_unchanged(repository, test_context)
+
+    upstream.index.commit('Empty commit')
+    assert not refs_unchanged(repository, test_context)
+
+
+def test_refs_unchanged_mirror(upstream, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    git.Repo.clone_from(
+        f'file://{upstream.working_dir}', repo_path, mirror=True)
+
+    assert refs_unchanged(repository, test_context)
+
+    upstream.create_head('feature')
+    assert not refs_unchanged(repository, test_context)
+
+
+@pytest.mark.parametrize("backend", [BACKEND_GIT, BACKEND_LIBGIT2])
+def test_refs_unchanged_single_branch(upstream, repository, test_context,
+                                      backend):
+    if backend == BACKEND_LIBGIT2:
+        pytest.importorskip("pygit2")
+    test_context.backend = Backend(backend)
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    upstream.create_head("feature")
+    upstream.create_tag("v1.0.0", ref="feature")
+    git.Repo.clone_from(
+        f"file://{upstream.working_dir}",
+        repo_path,
+        multi_options=["--single-branch", "--no-tags"],
+    )
+
+    assert refs_unchanged(repository, test_context)
+
+    upstream.index.commit("Empty commit")
+    assert not refs_unchanged(repository, test_context)
+
+
+def test_map_ref():
+    refspecs = [
+        "+refs/heads/*:refs/remotes/origin/*",
+        "^refs/heads/wip/*",
+        "+refs/notes/commits:refs/notes/origin",
+    ]
+
+    assert _map_ref("refs/heads/main", refspecs) == \
+        "refs/remotes/origin/main"
+    assert _map_ref("refs/heads/wip/foo", refspecs) is None
+    assert _map_ref("refs/notes/commits", refspecs) == "refs/notes/origin"
+    assert _map_ref("refs/tags/v1.0.0", refspecs) is None
+
+
+def test_refs_unchanged_missing(repository, test_context):
+    assert not refs_unchanged(repository, test_context)
+
+
+def test_repair_nothing_to_salvage(mocker, repository, test_context):
+    repo_path = os.path.join(
+        str(test_context.base_path), repository.org.login, repository.name)
+    os.makedirs(repo_path)
+    mock_clone = mocker.patch('gstore.repo.clone', return_value=True)
+
+    assert repair(repository, test_context)
+
+    mock_clone.assert_called_once_with(repository, test_context)
+
+
 def test_do_sync(mocker, repository, test_context):
     mocker.patch('gstore.repo._proc_ctx', test_context)
     mock_clone = mocker.patch('gstore.repo.clone')
     mock_fetch = mocker.patch('gstore.repo.fetch')
-    repos_list = [repository]
+    mock_clone.return_value = True
 
-    _do_sync(repos_list)
+    result = _do_sync(repository)
 
+    assert (result.repo, result.action, result.ok) == \
+        (repository, 'clone', True)
+    assert set(result.phases) == {'plan'}
     mock_clone.assert_called_once_with(repository, test_context)
+    assert os.path.isdir(
+        os.path.join(test_context.base_path, repository.org.login))
     mock_fetch.assert_not_called()
 
 
+def test_do_sync_bare(mocker, repository, test_context):
+    mocker.patch('gstore.repo._proc_ctx', test_context)
+    mock_clone = mocker.patch('gstore.repo.clone')
+    mock_fetch = mocker.patch('gstore.repo.fetch')
+    mock_fetch.return_value = True
+
+    repo_path = os.path.join(
+        test_context.base_path, repository.org.login, repository.name)
+    os.makedirs(os.path.join(repo_path, 'objects'))
+    os.makedirs(os.path.join(repo_path, 'refs'))
+    open(os.path.join(repo_path, 'HEAD'), 'w').close()
+
+    result = _do_sync(repository)
+
+    assert (result.repo, result.action, result.ok) == \
+        (repository, 'fetch', True)
+    mock_fetch.assert_called_once_with(repository, test_context)
+    mock_clone.assert_not_called()
+    assert os.path.isdir(os.path.join(repo_path, 'objects'))
+
+
 def test_sync(mocker, caplog, organization, repository, test_context):
     mocker.patch("gstore.repo._proc_ctx", test_context)
     mocker.patch("multiprocessing.cpu_count", return_value=4)
@@ -131,13 +441,276 @@ def test_sync(mocker, caplog, organization, repository, test_context):
     repos = [repository]
     base_path = str(test_context.base_path)
 
-    sync(organization, repos, base_path)
+    sync(repos, base_path)
 
     assert caplog.record_tuples == [
-        ("gstore.repo", logging.INFO, "Sync repos for " + organization.login),
-        ("gstore.repo", logging.DEBUG,
-         "Creating directory " + os.path.join(base_path, organization.login)),
+        ("gstore.repo", logging.INFO,
+         "Sync 1 repos for 1 organization(s)"),
         ("gstore.repo", logging.INFO, "Processes to be spawned: 1"),
     ]
 
-    mock_pool.map.assert_called_once()
+    mock_pool.imap_unordered.assert_called_once()
+
+
+def test_sync_single_pool_for_many_orgs(mocker, test_context):
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mock_pool = MagicMock()
+    mock_pool.__enter__.return_value = mock_pool
+    pool_factory = mocker.patch(
+        "multiprocessing.Pool", return_value=mock_pool)
+
+    repos = [
+        Repository("foo", Organization("Acme")),
+        Repository("bar", Organization("Acme")),
+        Repository("baz", Organization("Umbrella")),
+    ]
+    base_path = str(test_context.base_path)
+
+    sync(repos, base_path)
+
+    pool_factory.assert_called_once_with(
+        processes=3, initializer=mocker.ANY, initargs=mocker.ANY)
+    mock_pool.imap_unordered.assert_called_once()
+
+
+@pytest.mark.parametrize("count,processes", [(2, 2), (6, 4)])
+def test_sync_stream(mocker, test_context, count, processes):
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mock_pool = MagicMock()
+    mock_pool.__enter__.return_value = mock_pool
+    pool_factory = mocker.patch(
+        "multiprocessing.Pool", return_value=mock_pool)
+
+    org = Organization("Acme")
+    names = [f"repo{i}" for i in range(count)]
+    stream = (Repository(name, org) for name in names)
+
+    sync(stream, str(test_context.base_path))
+
+    pool_factory.assert_called_once_with(
+        processes=processes, initializer=mocker.ANY, initargs=mocker.ANY)
+    args, _ = mock_pool.imap_unordered.call_args
+    assert [repo.name for repo in args[1]] == names
+
+
+def test_init_process_options(mocker, tmpdir):
+    mocker.patch("gstore.repo.setup_logger")
+    mocker.patch("gstore.repo._proc_ctx", None)
+
+    _init_process(False, True, str(tmpdir), {"mode": MODE_FETCH_ONLY})
+
+    from gstore import repo
+
+    assert repo._proc_ctx.base_path == str(tmpdir)
+    assert repo._proc_ctx.mode == MODE_FETCH_ONLY
+
+
+def test_init_process_thread_ssh_slot(mocker, monkeypatch, repository,
+                                     tmpdir):
+    monkeypatch.delenv("GIT_SSH_COMMAND", raising=False)
+    mocker.patch("gstore.repo._proc_ctx", None)
+    mock_clone_from = mocker.patch("git.Repo.clone_from")
+
+    with SSHMultiplexer(16) as multiplexer:
+        main = os.environ["GIT_SSH_COMMAND"]
+        context = contextvars.Context()
+        context.run(
+            _init_process, False, True, str(tmpdir), None, multiplexer, True
+        )
+
+        from gstore import repo
+
+        assert context.run(clone, repository, repo._proc_ctx)
+        assert os.environ["GIT_SSH_COMMAND"] == main
+
+    _, kwargs = mock_clone_from.call_args
+    assert "ControlPath=" in kwargs["env"]["GIT_SSH_COMMAND"]
+
+
+def test_sync_empty_stream(mocker, caplog, test_context):
+    pool_factory = mocker.patch("multiprocessing.Pool")
+
+    sync(iter([]), str(test_context.base_path))
+
+    pool_factory.assert_not_called()
+    assert ("gstore.repo", logging.WARNING,
+            "No repositories to sync") in caplog.record_tuples
+
+
+def test_sync_largest_first(mocker, test_context):
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mock_pool = MagicMock()
+    mock_pool.__enter__.return_value = mock_pool
+    mocker.patch("multiprocessing.Pool", return_value=mock_pool)
+    mocker.patch("os.makedirs")
+
+    org = Organization("Acme")
+    repos = [
+        Repository("small", org, size=10),
+        Repository("huge", org, size=90000),
+        Repository("medium", org, size=500),
+    ]
+
+    sync(repos, str(test_context.base_path))
+
+    args, kwargs = mock_pool.imap_unordered.call_args
+    assert [repo.name for repo in args[1]] == ["huge", "medium", "small"]
+    assert kwargs == {"chunksize": 1}
+
+
+def test_sync_skip_unchanged(mocker, caplog, test_context):
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mock_pool = MagicMock()
+    mock_pool.__enter__.return_value = mock_pool
+    mock_pool.imap_unordered.side_effect = lambda func, tasks, **_: [
+        SyncResult(repo, "fetch", True) for repo in tasks]
+    mocker.patch("multiprocessing.Pool", return_value=mock_pool)
+    mocker.patch(
+        "gstore.repo.refs_unchanged",
+        side_effect=lambda repo, _: repo.name != "bar",
+    )
+
+    org = Organization("acme")
+    repos = [Repository(name, org) for name in ("foo", "bar", "baz")]
+
+    with caplog.at_level(logging.INFO, logger="gstore.repo"):
+        sync(repos, str(test_context.base_path), skip_unchanged=True)
+
+    args, _ = mock_pool.imap_unordered.call_args
+    assert [repo.name for repo in args[1]] == ["bar"]
+    assert "Skipped 2 repos whose refs did not change" in caplog.messages
+
+
+def test_sync_threads(mocker, caplog, test_context):
+    setup_logger = mocker.patch("gstore.repo.setup_logger")
+    mock_clone = mocker.patch("gstore.repo.clone", return_value=True)
+
+    org = Organization("acme")
+    repos = [Repository(name, org) for name in ("foo", "bar", "baz")]
+
+    with caplog.at_level(logging.INFO, logger="gstore.repo"):
+        sync(repos, str(test_context.base_path), jobs=2, executor="thread")
+
+    assert "Threads to be started: 2" in caplog.messages
+    assert sorted(call.args[0].name for call in mock_clone.call_args_list) \
+        == ["bar", "baz", "foo"]
+    setup_logger.assert_not_called()
+
+
+def test_sync_auto_jobs(mocker, caplog, test_context):
+    mocker.patch("gstore.repo.setup_logger")
+    mocker.patch("multiprocessing.cpu_count", return_value=2)
+    mock_clone = mocker.patch("gstore.repo.clone", return_value=True)
+
+    org = Organization("acme")
+    repos = [Repository(f"repo{i}", org) for i in range(5)]
+
+    with caplog.at_level(logging.INFO, logger="gstore.repo"):
+        sync(
+            repos, str(test_context.base_path), jobs="auto", executor="thread"
+        )
+
+    assert "Threads to be started: 5" in caplog.messages
+    assert "Adapt the number of jobs between 1 and 5" in caplog.messages
+    assert mock_clone.call_count == 5
+
+
+def test_sync_auto_jobs_error(mocker, test_context):
+    mocker.patch("gstore.repo.setup_logger")
+    mocker.patch("multiprocessing.cpu_count", return_value=1)
+    mocker.patch("gstore.repo.clone", side_effect=OSError("disk full"))
+
+    org = Organization("acme")
+    repos = [Repository(f"repo{i}", org) for i in range(5)]
+
+    with pytest.raises(OSError, match="disk full"):
+        sync(
+            repos, str(test_context.base_path), jobs="auto", executor="thread"
+        )
+
+
+def test_sync_budget(mocker, upstream, tmpdir):
+    mocker.patch("gstore.repo.setup_logger")
+    budget = Budget(bandwidth=1)
+    base_path = str(tmpdir.join("base"))
+
+    sync(
+        [Repository("foo", Organization("acme"))],
+        base_path,
+        jobs=1,
+        executor="thread",
+        budget=budget,
+    )
+
+    assert os.path.isdir(os.path.join(base_path, "acme", "foo", ".git"))
+    assert budget.bandwidth.delay() > 0
+
+
+def test_sync_without_report(mocker, upstream, tmpdir):
+    mocker.patch("gstore.repo.setup_logger")
+    mock_stats = mocker.patch("gstore.report.object_stats")
+
+    sync(
+        [Repository("foo", Organization("acme"))],
+        str(tmpdir.join("base")),
+        jobs=1,
+        executor="thread",
+    )
+
+    mock_stats.assert_not_called()
+
+
+def test_sync_report(mocker, upstream, tmpdir):
+    mocker.patch("gstore.repo.setup_logger")
+    base_path = str(tmpdir.join("base"))
+    report = str(tmpdir.join("report.json"))
+    metrics = Metrics()
+
+    sync(
+        [Repository("foo", Organization("acme"))],
+        base_path,
+        jobs=1,
+        executor="thread",
+        report=report,
+        metrics=metrics,
+    )
+
+    assert 'gstore_repos_synced_total{action="clone"} 1' in metrics.render()
+
+    with open(report, encoding="utf-8") as file:
+        data = json.load(file)
+
+    assert data["summary"]["synced"] == 1
+    assert data["repos"][0]["repo"] == "acme/foo"
+    assert data["repos"][0]["action"] == "clone"
+    assert data["repos"][0]["objects_received"] == 3
+    assert set(data["repos"][0]["phases"]) == {"plan", "network"}
+
+
+def test_sync_incremental(mocker, test_context):
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mock_pool = MagicMock()
+    mock_pool.__enter__.return_value = mock_pool
+    mocker.patch("multiprocessing.Pool", return_value=mock_pool)
+
+    base_path = str(test_context.base_path)
+    org = Organization("Acme")
+    old = Repository("old", org, pushed_at="2024-01-01T00:00:00+00:00")
+    new = Repository("new", org, pushed_at="2024-01-02T00:00:00+00:00")
+    os.makedirs(os.path.join(base_path, "Acme", "old"))
+
+    state = State.load(base_path)
+    state.update(old)
+    state.save()
+
+    mock_pool.imap_unordered.return_value = iter(
+        [SyncResult(new, "clone", True)])
+
+    sync([old, new], base_path, incremental=True)
+
+    args, _ = mock_pool.imap_unordered.call_args
+    assert args[1] == [new]
+    assert State.load(base_path).is_fresh(new, base_path) is False
+
+    os.makedirs(os.path.join(base_path, "Acme", "new"))
+    assert State.load(base_path).is_fresh(new, base_path)
@@ -0,0 +1,175 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import logging
+
+import git
+import pytest
+
+from gstore.exceptions import Error
+from gstore.models import Organization, Repository
+from gstore.report import (
+    Report,
+    Summary,
+    SyncResult,
+    object_stats,
+    phase,
+    record,
+)
+
+
+def _result(name, duration, ok=True, size=0):
+    result = SyncResult(Repository(name, Organization('acme')), 'fetch', ok)
+    result.duration = duration
+    result.bytes_received = size
+    result.objects_received = size // 10
+    result.phases = {'network': duration}
+    return result
+
+
+def test_object_stats(upstream, tmpdir):
+    # README blob, root tree and commit
+    assert object_stats(upstream.working_dir)[0] == 3
+    assert object_stats(str(tmpdir.join('missing'))) == (0, 0)
+    assert object_stats(str(tmpdir)) == (0, 0)
+
+
+def test_record(upstream, tmpdir):
+    repo = Repository('foo', Organization('acme'))
+    path = str(tmpdir.join('foo'))
+    url = f'file://{upstream.working_dir}'
+
+    with record(repo, path) as result:
+        with phase('network'):
+            git.Repo.clone_from(url, path)
+        result.ok = True
+
+    assert result.objects_received == 3
+    assert result.bytes_received > 0
+    assert result.duration >= result.phases['network'] > 0
+
+
+def test_record_error():
+    logger = logging.getLogger('gstore.repo')
+    repo = Repository('foo', Organization('acme'))
+
+    with record(repo, '') as failed:
+        logger.error('Failed to clone %s', 'acme/foo')
+        logger.error('fatal: repository not found')
+        logger.warning('Not an error')
+
+    with record(repo, '') as recovered:
+        logger.error('Failed to repair acme/foo, clone it again')
+        recovered.ok = True
+
+    logger.error('Outside of any record')
+
+    assert failed.error == \
+        'Failed to clone acme/foo\nfatal: repository not found'
+    assert recovered.error is None
+
+
+def test_phase_without_record():
+    with phase('network'):
+        pass
+
+
+def test_summary(caplog):
+    summary = Summary()
+    for index in range(8):
+        summary.add(_result(f'repo{index}', index, ok=index != 3, size=100))
+
+    data = summary.to_dict()
+
+    assert (data['synced'], data['failed']) == (7, 1)
+    assert data['actions'] == {'fetch': 8}
+    assert data['phases'] == {'network': 28}
+    assert (data['bytes_received'], data['objects_received']) == (800, 80)
+    assert [entry['repo'] for entry in data['slowest']] == [
+        f'acme/repo{index}' for index in (7, 6, 5, 4, 3)]
+
+    with caplog.at_level(logging.INFO, logger='gstore.report'):
+        summary.log()
+
+    assert caplog.messages == [
+        'Synced 7 repos, 1 failed, received 80 objects (0.0 MiB)']
+
+
+def test_summary_without_objects(caplog):
+    summary = Summary(count_objects=False)
+    summary.add(_result('foo', 1.5))
+
+    with caplog.at_level(logging.INFO, logger='gstore.report'):
+        summary.log()
+
+    assert caplog.messages == ['Synced 1 repos, 0 failed']
+
+
+def test_record_without_objects(mocker, upstream):
+    mock_stats = mocker.patch('gstore.report.object_stats')
+    repo = Repository('foo', Organization('acme'))
+
+    with record(repo, upstream.working_dir, count_objects=False) as result:
+        pass
+
+    mock_stats.assert_not_called()
+    assert result.objects_received == 0
+
+
+def test_report_json(tmpdir):
+    path = str(tmpdir.join('report.json'))
+    summary = Summary()
+    report = Report(path)
+
+    for result in (_result('foo', 1.5), _result('bar', 0.5, ok=False)):
+        summary.add(result)
+        report.add(result)
+    report.close(summary)
+
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+
+    assert data['summary']['synced'] == 1
+    assert [repo['repo'] for repo in data['repos']] == ['acme/foo', 'acme/bar']
+    assert data['repos'][0]['phases'] == {'network': 1.5}
+
+
+def test_report_unwritable(tmpdir):
+    path = str(tmpdir.join('missing', 'report.json'))
+
+    with pytest.raises(Error, match='Unable to write report'):
+        Report(path)
+
+
+def test_report_ndjson(tmpdir):
+    path = str(tmpdir.join('report.ndjson'))
+    summary = Summary()
+    report = Report(path)
+
+    result = _result('foo', 1.5)
+    summary.add(result)
+    report.add(result)
+
+    with open(path, encoding='utf-8') as file:
+        assert json.loads(file.readline())['repo'] == 'acme/foo'
+
+    report.close(summary)
+
+    with open(path, encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file]
+
+    assert len(lines) == 2
+    assert lines[1]['summary']['synced'] == 1
@@ -0,0 +1,74 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+from gstore.models import Organization, Repository
+from gstore.state import STATE_FILE, State
+
+
+def test_load_missing_state(tmpdir):
+    """Loading state from a directory without state file gives empty
+    state.
+    """
+    state = State.load(str(tmpdir))
+    repo = Repository('foo', Organization('Acme'), pushed_at='2024-01-01')
+
+    assert state.path == os.path.join(str(tmpdir), STATE_FILE)
+    assert not state.is_fresh(repo, str(tmpdir))
+
+
+def test_load_broken_state(tmpdir):
+    """Broken state file is ignored."""
+    tmpdir.join(STATE_FILE).write('{not a json')
+
+    state = State.load(str(tmpdir))
+    repo = Repository('foo', Organization('Acme'), pushed_at='2024-01-01')
+
+    assert not state.is_fresh(repo, str(tmpdir))
+
+
+def test_save_and_load(tmpdir):
+    """Recorded repositories are fresh while upstream timestamp is the same
+    and the local copy exists.
+    """
+    base_path = str(tmpdir)
+    org = Organization('Acme')
+    repo = Repository('foo', org, pushed_at='2024-01-01T00:00:00+00:00')
+    tmpdir.mkdir('Acme').mkdir('foo')
+
+    state = State.load(base_path)
+    state.update(repo)
+    state.save()
+
+    state = State.load(base_path)
+    assert state.is_fresh(repo, base_path)
+
+    pushed = Repository('foo', org, pushed_at='2024-02-01T00:00:00+00:00')
+    assert not state.is_fresh(pushed, base_path)
+
+    tmpdir.join('Acme').remove()
+    assert not state.is_fresh(repo, base_path)
+
+
+def test_unknown_timestamp_is_never_fresh(tmpdir):
+    """Repositories without upstream timestamp are always synced."""
+    repo = Repository('foo', Organization('Acme'))
+    tmpdir.mkdir('Acme').mkdir('foo')
+
+    state = State.load(str(tmpdir))
+    state.update(repo)
+
+    assert not state.is_fresh(repo, str(tmpdir))
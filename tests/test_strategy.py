@@ -0,0 +1,81 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from gstore.models import Organization, Repository
+from gstore.strategy import (
+    CloneRule,
+    CloneStrategy,
+    parse_rule,
+    select,
+    validate_filter,
+)
+
+
+def test_clone_options():
+    strategy = CloneStrategy(filter='blob:none', depth=1, single_branch=True)
+
+    assert strategy.clone_options() == [
+        '--filter=blob:none', '--depth=1', '--single-branch']
+    assert strategy.fetch_options() == ['--depth=1']
+    assert CloneStrategy().clone_options() == []
+    assert CloneStrategy(filter='blob:none').fetch_options() == []
+
+
+def test_partial():
+    assert not CloneStrategy().partial
+    assert CloneStrategy(filter='blob:none').partial
+    assert CloneStrategy(depth=1).partial
+    assert CloneStrategy(single_branch=True).partial
+
+
+@pytest.mark.parametrize('spec', ['blob:none', 'blob:limit=1m', 'tree:0'])
+def test_validate_filter(spec):
+    assert validate_filter(spec) == spec
+
+
+def test_validate_filter_unsupported():
+    with pytest.raises(ValueError):
+        validate_filter('sparse:oid=HEAD')
+
+
+def test_parse_rule():
+    rule = parse_rule('acme/assets-*=filter=blob:limit=10k,depth=5')
+
+    assert rule == CloneRule(
+        'acme/assets-*', CloneStrategy(filter='blob:limit=10k', depth=5))
+
+
+@pytest.mark.parametrize(
+    'value', ['acme', 'acme=', 'acme=depth=0', 'acme=depth=x', 'acme=bare'])
+def test_parse_rule_invalid(value):
+    with pytest.raises(ValueError):
+        parse_rule(value)
+
+
+def test_select():
+    org = Organization('acme')
+    default = CloneStrategy(single_branch=True)
+    rules = [
+        parse_rule('acme/assets-*=filter=blob:none'),
+        parse_rule('acme=full'),
+    ]
+
+    assert select(Repository('assets-web', org), default, rules) == \
+        CloneStrategy(filter='blob:none')
+    assert select(Repository('api', org), default, rules) == CloneStrategy()
+    assert select(
+        Repository('api', Organization('other')), default, rules) == default
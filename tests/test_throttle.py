@@ -0,0 +1,152 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import multiprocessing
+import os
+
+import pytest
+
+from gstore.report import SyncResult
+from gstore.throttle import Budget, TokenBucket, estimate, parse_rate
+
+
+def _consume(bucket, amount):
+    bucket.consume(amount)
+
+
+def _write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [
+        ('100', 100),
+        ('512k', 512 * 1024),
+        ('10M', 10 * 1024 ** 2),
+        ('1.5g', int(1.5 * 1024 ** 3)),
+    ],
+)
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+
+@pytest.mark.parametrize('value', ['0', '-1', '10x', 'fast', ''])
+def test_parse_rate_invalid(value):
+    with pytest.raises(ValueError, match='Invalid rate'):
+        parse_rate(value)
+
+
+def test_bucket_debt():
+    bucket = TokenBucket(1000)
+
+    assert bucket.delay() == 0
+
+    bucket.consume(3000)
+
+    assert 1.9 < bucket.delay() <= 2.0
+
+
+def test_bucket_shared_by_processes():
+    bucket = TokenBucket(1000)
+
+    process = multiprocessing.Process(target=_consume, args=(bucket, 5000))
+    process.start()
+    process.join()
+
+    assert bucket.delay() > 3.5
+
+
+def test_budget_usage(tmpdir):
+    path = str(tmpdir.join('repo'))
+    _write(os.path.join(path, '.git', 'objects', 'pack', 'a.pack'), 100)
+    _write(os.path.join(path, 'README'), 10)
+
+    assert Budget(bandwidth=1, disk=1).usage(path) == 100
+    assert Budget(disk=1).usage(path) == 100
+
+
+def test_budget_usage_bare(tmpdir):
+    path = str(tmpdir.join('repo.git'))
+    _write(os.path.join(path, 'objects', 'pack', 'a.pack'), 100)
+
+    assert Budget(bandwidth=1).usage(path) == 100
+
+
+def test_budget_track(tmpdir, repository):
+    path = str(tmpdir.join('repo'))
+    budget = Budget(bandwidth=1000, disk=2000)
+    result = SyncResult(repository, action='fetch')
+
+    with budget.track(path, result):
+        _write(os.path.join(path, '.git', 'objects', 'a'), 3000)
+        _write(os.path.join(path, 'README'), 3000)
+
+    assert result.growth == 3000
+    assert 1.9 < budget.bandwidth.delay() <= 2.0
+    assert 0.4 < budget.disk.delay() <= 0.5
+    assert 1.9 < budget.delay() <= 2.0
+
+
+def test_budget_track_reserved(tmpdir, repository):
+    path = str(tmpdir.join('repo'))
+    budget = Budget(bandwidth=1024)
+    repository.size = 5
+    result = SyncResult(repository, action='clone')
+
+    with budget.track(path, result):
+        # Concurrent operations wait for the estimate right away
+        assert 3.9 < budget.delay() <= 4.0
+        _write(os.path.join(path, '.git', 'objects', 'a'), 2048)
+
+    # The excess of the estimate is given back
+    assert result.growth == 2048
+    assert 0.9 < budget.delay() <= 1.0
+
+
+def test_bucket_refund_capped():
+    bucket = TokenBucket(1000)
+
+    bucket.consume(-5000)
+    bucket.consume(1500)
+
+    assert 0.4 < bucket.delay() <= 0.5
+
+
+def test_estimate(repository):
+    repository.size = 10
+
+    assert estimate(repository, 'clone') == 10 * 1024
+    assert estimate(repository, 'fetch') == 0
+    assert estimate(repository, None) == 0
+
+
+def test_budget_wait(mocker):
+    sleep = mocker.patch('time.sleep')
+    budget = Budget(bandwidth=1000)
+    mocker.patch.object(budget, 'delay', side_effect=[1.5, 0.5, 0])
+
+    budget.wait()
+
+    assert [call.args[0] for call in sleep.call_args_list] == [1.5, 0.5]
+
+
+def test_budget_unlimited(tmpdir):
+    budget = Budget()
+
+    assert budget.delay() == 0
+    assert budget.usage(str(tmpdir)) == 0
@@ -0,0 +1,153 @@
+# Copyright (C) 2020-2026 Serghei Iakovlev <gnu@serghei.pl>
+#
+# This file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# This file is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this file.  If not, see <https://www.gnu.org/licenses/>.
+
+import contextvars
+import os
+import pickle
+import subprocess
+
+import pytest
+
+from gstore.transport import (
+    TRANSPORT_HTTPS,
+    SSHMultiplexer,
+    Transport,
+    environment,
+    git_environ,
+    git_host,
+)
+
+
+def test_connections():
+    assert SSHMultiplexer(1).connections == 1
+    assert SSHMultiplexer(8).connections == 1
+    assert SSHMultiplexer(9).connections == 2
+
+
+def test_context(monkeypatch):
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+
+    with SSHMultiplexer(4) as multiplexer:
+        control_dir = multiplexer.control_dir
+        assert os.path.isdir(control_dir)
+        command = os.environ['GIT_SSH_COMMAND']
+        assert command.startswith('ssh -o ControlMaster=auto')
+        assert f'ControlPath={control_dir}' in command
+
+    assert 'GIT_SSH_COMMAND' not in os.environ
+    assert not os.path.exists(control_dir)
+
+
+def test_control_path_too_long(mocker, monkeypatch, tmpdir):
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+    base = str(tmpdir.join('x' * 100))
+    os.makedirs(base)
+    mocker.patch('gstore.transport.CONTROL_BASE', base)
+
+    with SSHMultiplexer(4) as multiplexer:
+        assert multiplexer.control_dir is None
+        assert 'GIT_SSH_COMMAND' not in os.environ
+
+    assert os.listdir(base) == []
+
+
+def test_control_path_length(monkeypatch):
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+
+    with SSHMultiplexer(200) as multiplexer:
+        path = os.path.join(multiplexer.control_dir, '24-') + 'f' * 40
+
+    assert len(path) + len('.0123456789abcdef') <= 104
+
+
+def test_keeps_user_command(monkeypatch):
+    monkeypatch.setenv('GIT_SSH_COMMAND', 'ssh -i ~/.ssh/backup')
+
+    with SSHMultiplexer() as multiplexer:
+        worker = pickle.loads(pickle.dumps(multiplexer))
+        worker.apply()
+        assert os.environ['GIT_SSH_COMMAND'].startswith(
+            'ssh -i ~/.ssh/backup -o ControlMaster=auto')
+
+    assert os.environ['GIT_SSH_COMMAND'] == 'ssh -i ~/.ssh/backup'
+
+
+def test_assign(monkeypatch):
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+
+    with SSHMultiplexer(16) as multiplexer:
+        main = os.environ['GIT_SSH_COMMAND']
+        control_dir = multiplexer.control_dir
+        worker = pickle.loads(pickle.dumps(multiplexer))
+
+        commands = []
+        for _ in range(4):
+            context = contextvars.Context()
+            context.run(worker.assign)
+            commands.append(context.run(git_environ)['GIT_SSH_COMMAND'])
+
+        assert os.environ['GIT_SSH_COMMAND'] == main
+        assert git_environ() == {}
+
+    assert commands[0] == commands[2] != commands[1] == commands[3]
+    assert os.path.join(control_dir, '0-') in commands[0]
+    assert os.path.join(control_dir, '1-') in commands[1]
+
+
+def test_apply_inactive(monkeypatch):
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+
+    SSHMultiplexer().apply()
+
+    assert 'GIT_SSH_COMMAND' not in os.environ
+
+
+@pytest.mark.parametrize('api_host,expected', [
+    (None, 'github.com'),
+    ('api.github.com', 'github.com'),
+    ('ghe.example.com/api/v3', 'ghe.example.com'),
+    ('https://api.acme.ghe.com', 'acme.ghe.com'),
+])
+def test_git_host(api_host, expected):
+    assert git_host(api_host) == expected
+
+
+def test_url(repository):
+    assert Transport().url(repository) == \
+        f'git@github.com:{repository.org.login}/{repository.name}.git'
+    assert Transport(TRANSPORT_HTTPS, 'ghe.example.com').url(repository) == \
+        f'https://ghe.example.com/{repository.org.login}/{repository.name}.git'
+
+
+def test_ssh_environ():
+    assert Transport(token='secret').environ() == {}
+
+
+def test_https_credentials(monkeypatch, tmpdir):
+    transport = Transport(TRANSPORT_HTTPS, 'ghe.example.com', 'secret')
+    monkeypatch.setenv('HOME', str(tmpdir))
+
+    with environment(transport.environ()):
+        result = subprocess.run(
+            ['git', 'credential', 'fill'],
+            input='protocol=https\nhost=ghe.example.com\n\n',
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    assert 'username=x-access-token' in result.stdout.splitlines()
+    assert 'password=secret' in result.stdout.splitlines()
+    assert 'GIT_CONFIG_COUNT' not in os.environ